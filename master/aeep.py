@@ -0,0 +1,86 @@
+# aeep.py - single entry point for the acquisition and analysis tools
+#
+#   python master/aeep.py acquire --id EA7                 log one rig (force_main)
+#   python master/aeep.py acquire stations.json            log several rigs (station.py)
+#   python master/aeep.py replay bootcamp_data/EA6         re-run a recorded session
+#   python master/aeep.py analyze <tool> [args]            offline tools, see `analyze --help`
+#   python master/aeep.py minimap                          PyVista minimap (main.py)
+#
+# Nothing heavy is imported here: each subcommand runs its script as __main__ with the rest
+# of the command line, so only that script's imports are paid for (headless commands never
+# load pyvista / matplotlib / pandas / serial). benchmarks/startup_bench.py keeps it that way.
+import os
+import runpy
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+ANALYZE_TOOLS = {
+    "archive": ("analysis/session_archive.py", "pack / unpack / inspect .aeep session archives"),
+    "features": ("analysis/skill_features.py", "windowed skill features + expert/student classifier"),
+    "sweep": ("analysis/param_sweep.py", "parallel parameter sweep over recorded trials"),
+    "compare": ("analysis/session_dtw.py", "DTW match of sessions against an expert reference, per phase"),
+    "phases": ("analysis/phase_segment.py", "change-point procedure phases + per-phase sensor stats"),
+    "tremor": ("analysis/spectral.py", "4-12 Hz tremor / oscillation band power per channel"),
+    "report": ("analysis/report.py", "headless PNG / PDF report pages per session, parallel, skips unchanged"),
+    "motion": ("imu/motion_metrics.py", "motion-economy metrics for IMU csvs"),
+    "smooth": ("imu/smoother.py", "drift-corrected offline IMU positions"),
+    "occupancy": ("imu/occupancy.py", "voxel dwell map of the instrument tip (minimap overlay)"),
+    "force-plot": ("force_sensing/force_process.py", "plot force sensor readings"),
+    "quadrant-plot": ("force_sensing/quadrant_process.py", "plot N/S/E/W and quadrant distribution"),
+    "bench": ("benchmarks/pipeline_bench.py", "per-stage pipeline throughput benchmark"),
+}
+
+USAGE = """usage: aeep.py <command> [args]
+
+commands:
+  acquire [stations.json] [force_main args]   log sensor data (one rig, or every rig in the json)
+  replay SESSION [args]                       replay a recorded session through classification
+  analyze TOOL [args]                         offline analysis tools
+  minimap                                     PyVista minimap (needs the hardware + pyvista)
+"""
+
+
+def run_script(relative_path, argv):
+    """ Runs master/<relative_path> as __main__ with argv, the way `python <path> argv` would """
+    path = os.path.join(HERE, relative_path)
+    for folder in ("force_sensing", "imu", "analysis"):
+        sys.path.append(os.path.join(HERE, folder))
+    sys.path.insert(0, os.path.dirname(path))
+    sys.argv = [path, *argv]
+    runpy.run_path(path, run_name="__main__")
+
+
+def analyze_usage():
+    lines = ["usage: aeep.py analyze TOOL [args]  (TOOL --help for its options)", "", "tools:"]
+    lines += [f"  {name:<15}{description}" for name, (_, description) in ANALYZE_TOOLS.items()]
+    return "\n".join(lines)
+
+
+def main(argv):
+    if not argv or argv[0] in ("-h", "--help"):
+        print(USAGE)
+        return 0
+    command, rest = argv[0], argv[1:]
+    if command == "acquire":
+        if rest and rest[0].endswith(".json"):
+            run_script("force_sensing/station.py", rest)
+        else:
+            run_script("force_sensing/force_main.py", rest)
+    elif command == "replay":
+        run_script("analysis/replay.py", rest)
+    elif command == "analyze":
+        if not rest or rest[0] in ("-h", "--help") or rest[0] not in ANALYZE_TOOLS:
+            print(analyze_usage())
+            return 0 if not rest or rest[0] in ("-h", "--help") else 2
+        run_script(ANALYZE_TOOLS[rest[0]][0], rest[1:])
+    elif command == "minimap":
+        run_script("main.py", rest)
+    else:
+        print(f"unknown command {command!r}\n\n{USAGE}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,331 @@
+# param_sweep.py - tunes the hand-picked filter / classifier constants against recorded trials
+#
+# Tunable parameters (defaults are the values hard-coded in the pipeline):
+#   beta                         MadgwickFilter gain                     0.1
+#   L                            rod length (m)                          0.0
+#   method                       orientation filter: madgwick | ekf      madgwick
+#   q_quat q_bias r_accmag r_yaw OrientationBiasEKF noise                1e-5 1e-9 1e-2 1e-3
+#   threshold                    determine_quadrant dead band            15
+#
+# Trials with a reference:
+#   --imu-trial CSV:METERS        IMU csv + known displacement of the rod tip, e.g.
+#                                 50cm_trial2_extracted.csv:0.5. Error = |est - ref| / ref,
+#                                 est from the drift-corrected trajectory (smoother.py)
+#   --quadrant-trial SESSION:CSV  session folder / .aeep and an annotation csv with hand-marked
+#                                 timestamp,quadrant rows. Error = 1 - accuracy of determine_quadrant.
+#                                 The csv is required: the session's own quadrant_log was written by
+#                                 the same classifier, so it would only measure agreement with itself
+#
+# Every configuration runs on a process pool. A configuration's score is the sum of its
+# trial errors; cheap trials run first and a configuration stops as soon as its partial sum
+# can no longer beat the best complete score (early stopping). Each (trial, relevant
+# parameters) result is cached in sweep_cache/, so the quadrant trials are not re-run for
+# every beta and an interrupted overnight sweep resumes where it stopped.
+#
+#   python master/analysis/param_sweep.py --imu-trial 50cm_trial2_extracted.csv:0.5 \
+#       --quadrant-trial bootcamp_data/EA6:ea6_quadrants.csv --param beta=0.02,0.05,0.1,0.2 --param threshold=10,15,20
+#   python master/analysis/param_sweep.py ... --param beta=0.01:0.5:log --param method=madgwick,ekf --random 200
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(HERE), "force_sensing"))
+sys.path.append(os.path.join(os.path.dirname(HERE), "imu"))
+
+from session_archive import load_session, session_hash
+
+SWEEP_VERSION = 1
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.dirname(HERE)), "sweep_cache")
+
+DEFAULTS = {
+    "beta": 0.1,
+    "L": 0.0,
+    "method": "madgwick",
+    "q_quat": 1e-5,
+    "q_bias": 1e-9,
+    "r_accmag": 1e-2,
+    "r_yaw": 1e-3,
+    "threshold": 15.0,
+}
+EKF_PARAMS = ("q_quat", "q_bias", "r_accmag", "r_yaw")
+
+
+# ——— search space ———
+def parse_param(spec):
+    """
+    name=v1,v2,... -> list of values (grid)
+    name=lo:hi[:log] -> (lo, hi, log) range (random search only)
+    """
+    name, _, values = spec.partition("=")
+    if name not in DEFAULTS:
+        raise ValueError(f"unknown parameter {name!r}, expected one of {list(DEFAULTS)}")
+    kind = type(DEFAULTS[name])
+    if ":" in values:
+        parts = values.split(":")
+        return name, (float(parts[0]), float(parts[1]), len(parts) > 2 and parts[2] == "log")
+    return name, [kind(v) for v in values.split(",")]
+
+
+def grid_configs(space):
+    names = list(space)
+    for values in itertools.product(*(space[n] for n in names)):
+        yield {**DEFAULTS, **dict(zip(names, values))}
+
+
+def random_configs(space, count, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        config = dict(DEFAULTS)
+        for name, choice in space.items():
+            if isinstance(choice, list):
+                config[name] = choice[rng.integers(len(choice))]
+            else:
+                lo, hi, log = choice
+                config[name] = float(np.exp(rng.uniform(np.log(lo), np.log(hi))) if log else rng.uniform(lo, hi))
+        yield config
+
+
+# ——— trials ———
+def _file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _split_spec(spec):
+    """ 'path:extra' -> (path, extra); paths that exist as a whole are taken as is """
+    if os.path.exists(spec) or ":" not in spec:
+        return spec, None
+    path, extra = spec.rsplit(":", 1)
+    return path, extra
+
+
+def make_trials(imu_specs, quadrant_specs):
+    """ Trial descriptions (small dicts, sent to the workers); quadrant trials first - they are cheap """
+    trials = []
+    for spec in quadrant_specs:
+        path, labels = _split_spec(spec)
+        if labels is None:
+            raise ValueError(f"{spec}: quadrant trials need an annotation csv, e.g. {spec}:annotations.csv")
+        content = session_hash(path) + _file_hash(labels)
+        trials.append({"kind": "quadrant", "path": path, "labels": labels, "hash": content})
+    for spec in imu_specs:
+        path, ref = _split_spec(spec)
+        if ref is None:
+            raise ValueError(f"{spec}: IMU trials need a reference displacement, e.g. {spec}:0.5")
+        trials.append({"kind": "imu", "path": path, "reference": float(ref), "hash": _file_hash(path)})
+    return trials
+
+
+def relevant_params(trial, config):
+    """ Only the parameters a trial depends on, so cached results are shared across the rest """
+    if trial["kind"] == "quadrant":
+        return {"threshold": config["threshold"]}
+    params = {"method": config["method"], "L": config["L"]}
+    if config["method"] == "ekf":
+        params.update({k: config[k] for k in EKF_PARAMS})
+    else:
+        params["beta"] = config["beta"]
+    return params
+
+
+def result_key(trial, config):
+    blob = json.dumps([SWEEP_VERSION, trial["kind"], trial["hash"], trial.get("reference"), relevant_params(trial, config)], sort_keys=True)
+    return hashlib.sha1(blob.encode()).hexdigest()
+
+
+_loaded = {}  # per worker process: trial path -> arrays, loaded once
+
+
+def _trial_data(trial):
+    key = (trial["kind"], trial["path"], trial.get("labels"))
+    if key not in _loaded:
+        if trial["kind"] == "imu":
+            from dof9_filter import load_imu_array
+            _loaded[key] = load_imu_array(trial["path"])
+        else:
+            session = load_session(trial["path"])
+            _loaded[key] = (session["nsew"], _annotation_labels(trial["labels"], session["quadrant_t"]))
+    return _loaded[key]
+
+
+def _annotation_labels(csv_path, t):
+    """ Annotated label in force at each timestamp (annotations mark where a label starts) """
+    import csv
+    with open(csv_path, newline='') as f:
+        rows = [r for r in csv.reader(f) if r and r[0] != "timestamp"]
+    times = np.array([float(r[0]) for r in rows])
+    labels = np.array([r[1] for r in rows])
+    return labels[np.clip(np.searchsorted(times, t, side="right") - 1, 0, len(labels) - 1)]
+
+
+def trial_error(trial, config):
+    if trial["kind"] == "quadrant":
+        from quadrant_detection import determine_quadrants
+        nsew, reference = _trial_data(trial)
+        predicted = determine_quadrants(*nsew.T, threshold=config["threshold"])
+        return float(1.0 - np.mean(predicted == reference)) if len(reference) else 0.0
+
+    from smoother import smooth_trajectory
+    data = _trial_data(trial)
+    ekf_args = {k: config[k] for k in EKF_PARAMS} if config["method"] == "ekf" else None
+    result = smooth_trajectory(data, config["beta"], config["L"], config["method"], ekf_args=ekf_args)
+    tip = result["rod_tip_position"]
+    estimate = float(np.linalg.norm(tip[-1] - tip[0]))
+    return abs(estimate - trial["reference"]) / trial["reference"]
+
+
+def evaluate(config, trials, known, bound):
+    """
+    Worker: errors for the trials not in `known` (cached errors). Stops early once the
+    partial score reaches `bound`. Returns (new errors {index: error}, pruned)
+    """
+    errors = {}
+    total = sum(known.values())
+    for i, trial in enumerate(trials):
+        if i in known:
+            continue
+        if total >= bound:
+            return errors, True
+        errors[i] = trial_error(trial, config)
+        total += errors[i]
+    return errors, False
+
+
+# ——— cache ———
+class ResultCache:
+    """ Append-only jsonl of result_key -> error, one file per cache dir """
+
+    def __init__(self, cache_dir):
+        self.path = os.path.join(cache_dir, "results.jsonl") if cache_dir else None
+        self.results = {}
+        if self.path and os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:  # a line cut short by an interrupted run
+                        continue
+                    self.results[entry["key"]] = entry["error"]
+        self._file = None
+
+    def get(self, key):
+        return self.results.get(key)
+
+    def put(self, key, error):
+        self.results[key] = error
+        if self.path:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "a")
+            self._file.write(json.dumps({"key": key, "error": error}) + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+# ——— sweep ———
+def sweep(configs, trials, workers=None, cache_dir=DEFAULT_CACHE, prune=True, progress=True):
+    """
+    Runs every configuration over every trial. Returns a list of
+    {"config", "score", "errors", "pruned"} sorted best first (pruned configs last).
+    """
+    cache = ResultCache(cache_dir)
+    results = []
+    best = float("inf")
+    configs = iter(configs)
+    started = time.monotonic()
+
+    def finish(config, errors, pruned):
+        nonlocal best
+        score = sum(errors.values())
+        if not pruned and score < best:
+            best = score
+        results.append({"config": config, "score": score, "errors": [errors.get(i) for i in range(len(trials))], "pruned": pruned})
+        if progress and len(results) % 10 == 0:
+            print(f"{len(results)} configs, best {best:.4f}, {time.monotonic() - started:.0f}s", file=sys.stderr)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        max_pending = 2 * (workers or os.cpu_count() or 1)
+        while True:
+            for config in configs:
+                keys = [result_key(trial, config) for trial in trials]
+                known = {i: cache.get(k) for i, k in enumerate(keys) if cache.get(k) is not None}
+                if len(known) == len(trials):
+                    finish(config, known, False)
+                    continue
+                bound = best if prune else float("inf")
+                future = pool.submit(evaluate, config, trials, known, bound)
+                pending[future] = (config, keys, known)
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                config, keys, known = pending.pop(future)
+                errors, pruned = future.result()
+                for i, error in errors.items():
+                    cache.put(keys[i], error)
+                finish(config, {**known, **errors}, pruned)
+    cache.close()
+    results.sort(key=lambda r: (r["pruned"], r["score"]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep for the filters and the quadrant classifier")
+    parser.add_argument("--imu-trial", action="append", default=[], help="IMU csv:reference displacement in meters")
+    parser.add_argument("--quadrant-trial", action="append", default=[], help="session folder or .aeep:annotation csv (timestamp,quadrant rows)")
+    parser.add_argument("--param", action="append", default=[], help="name=v1,v2,... (grid) or name=lo:hi[:log] (random)")
+    parser.add_argument("--random", type=int, help="sample this many random configurations instead of the full grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE, help="'' disables the result cache")
+    parser.add_argument("--no-prune", action="store_true", help="run every trial for every configuration")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--out", help="write the best configuration as json")
+    args = parser.parse_args()
+
+    space = dict(parse_param(p) for p in args.param)
+    try:
+        trials = make_trials(args.imu_trial, args.quadrant_trial)
+    except ValueError as e:
+        parser.error(str(e))
+    if not trials:
+        parser.error("give at least one --imu-trial or --quadrant-trial")
+    if args.random:
+        configs = random_configs(space, args.random, args.seed)
+    elif any(not isinstance(v, list) for v in space.values()):
+        parser.error("ranges (lo:hi) need --random N")
+    else:
+        configs = grid_configs(space)
+
+    results = sweep(configs, trials, args.workers, args.cache_dir or None, prune=not args.no_prune)
+    swept = list(space) or list(DEFAULTS)
+    print(f"\n{'score':>8}  " + "  ".join(f"{n:>10}" for n in swept))
+    for r in results[:args.top]:
+        values = "  ".join(f"{r['config'][n]:>10}" if isinstance(r['config'][n], str) else f"{r['config'][n]:>10.4g}" for n in swept)
+        print(f"{r['score']:>8.4f}  {values}{'  (pruned)' if r['pruned'] else ''}")
+    pruned = sum(r["pruned"] for r in results)
+    print(f"{len(results)} configurations, {pruned} stopped early")
+
+    if args.out and results:
+        best = results[0]
+        with open(args.out, "w") as f:
+            json.dump({"config": best["config"], "score": best["score"],
+                       "trials": [{"kind": t["kind"], "path": t["path"], "error": e} for t, e in zip(trials, best["errors"])]}, f, indent=2)
+        print(f"Best configuration saved to {args.out}")
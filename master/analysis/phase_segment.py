@@ -0,0 +1,332 @@
+# phase_segment.py - automatic procedure phases from the force and flex streams (change points)
+#
+# Replaces picking row ranges by eye and typing them into bootcamp_data/analzye_csv.py. The 14
+# force channels and N/S/E/W are scaled by their group's standard deviation (one for the force
+# sheet, one for the flex sensors - a quiet channel doesn't get its noise blown up) and split
+# where their mean level changes, with PELT (pruned exact linear time): the optimal segmentation under a squared
+# error cost + a penalty per change point (penalty x channels x log(samples), BIC-like), with
+# segment costs computed from cumulative sums in O(1) and candidates that can never win again
+# pruned, so the run time grows about linearly with the session length.
+#
+# Each phase then gets analzye_csv's statistics per sensor (min, max, mean, median,
+# max-min magnitude, std_dev, variance), written as sensor_stats_<first>_<last>.csv with the
+# same 1-based data line numbers, so the output folder reads like "EA6 Timestamp Data".
+#
+# OnlineSegmenter runs the same recursion one sample at a time for live sessions (force_main
+# --phases, "phases" in a station.py config). A boundary is final once every surviving candidate's history contains
+# it - no later data can move it - and is then written to phase_log.csv. That can take minutes
+# (on EA6 phases became final 3-12 min after they ended), so provisional() also gives the
+# current best guess for the phases since the last final boundary: station.py publishes the
+# running phase as the phase_provisional gauge and writes a "provisional" row to phase_log.csv
+# whenever a new phase starts (provisional boundaries jitter, so only new highs are written).
+#
+#   python master/analysis/phase_segment.py bootcamp_data/EA6                     (print phases)
+#   python master/analysis/phase_segment.py bootcamp_data/EA6 --out ea6_phases    (+ stats csvs)
+#   python master/analysis/phase_segment.py bootcamp_data/EA6 --online            (replay sample by sample)
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from session_archive import load_session
+from skill_features import CALIBRATION_THRESHOLD
+
+FORCE_CHANNELS = 14
+PENALTY = 1.0          # x channels x log(samples) per change point, higher = fewer phases
+MIN_SECONDS = 20.0     # shortest phase
+EXPECTED_SAMPLES = 3600  # live sessions don't know their length yet: ~30 min at 2 Hz
+STAT_NAMES = ["min", "max", "mean", "median", "max-min magnitude", "std_dev", "variance"]
+
+
+def session_streams(session):
+    """ load_session dict -> (t, (N, 18) force channels + N/S/E/W, channel names) on the force log's rows """
+    if "force_t" not in session or "quadrant_t" not in session or not len(session["force_t"]):
+        raise ValueError(f"{session['name']}: needs force_log.csv and quadrant_log.csv")
+    t, force = session["force_t"], session["force"][:, :FORCE_CHANNELS]
+    if force.shape[1] < FORCE_CHANNELS:
+        force = np.hstack([force, np.zeros((len(force), FORCE_CHANNELS - force.shape[1]))])
+    # both logs are written on the same tick; take the latest flex row at or before each force row
+    qi = np.clip(np.searchsorted(session["quadrant_t"], t, side="right") - 1, 0, len(session["quadrant_t"]) - 1)
+    names = [f"sensor A{i}" for i in range(FORCE_CHANNELS)] + ["N", "S", "E", "W"]
+    return t, np.hstack([force, session["nsew"][qi]]), names
+
+
+def live_values(force, nsew):
+    """ One logged force row + (N, S, E, W) -> the row session_streams would give for it """
+    force = np.asarray(force, dtype=float)[:FORCE_CHANNELS]
+    return np.concatenate([force, np.zeros(FORCE_CHANNELS - len(force)), np.asarray(nsew, dtype=float)])
+
+
+def channel_scale(x):
+    """ Per channel divisor: RMS standard deviation of the force channels / of N/S/E/W, 1 if a group never moves """
+    scale = np.ones(x.shape[1])
+    if len(x) > 1:
+        for group in (slice(0, FORCE_CHANNELS), slice(FORCE_CHANNELS, None)):
+            sd = np.sqrt(np.mean(x[:, group].var(axis=0)))
+            scale[group] = sd if sd > 0 else 1.0
+    return scale
+
+
+def reference_scale(path):
+    """ channel_scale of an earlier session on the same rig, to start OnlineSegmenter without a warm-up """
+    t, x, _, bounds = segment_session(load_session(path))
+    return channel_scale(x[bounds[0][0]:])
+
+
+def min_samples(t, min_seconds=MIN_SECONDS):
+    """ Shortest phase in samples at the log's average rate """
+    rate = (len(t) - 1) / (t[-1] - t[0]) if len(t) > 1 and t[-1] > t[0] else 1.0
+    return max(2, int(round(min_seconds * rate)))
+
+
+def change_penalty(n, channels, penalty=PENALTY):
+    """ Cost of one change point in unit variance squared error """
+    return penalty * channels * np.log(max(n, 2))
+
+
+def pelt(x, penalty, min_size=2):
+    """
+    Change points of x (N, C) minimizing sum of segment squared errors + penalty per change.
+    Returns the segment ends: sorted indices b with x[a:b] one segment, last one is N.
+    """
+    n = len(x)
+    if n < 2 * min_size:
+        return [n]
+    s1 = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(x, axis=0)])
+    s2 = np.concatenate([[0.0], np.cumsum(np.einsum("ij,ij->i", x, x))])
+    F = np.full(n + 1, np.inf)
+    F[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    R = np.array([0], dtype=np.int64)
+    for t in range(min_size, n + 1):
+        eligible = R[R <= t - min_size]
+        # squared error of x[r:t] around its mean, for every candidate start r at once
+        d = s1[t] - s1[eligible]
+        cost = s2[t] - s2[eligible] - np.einsum("ij,ij->i", d, d) / (t - eligible)
+        values = F[eligible] + cost
+        k = int(np.argmin(values))
+        F[t] = values[k] + penalty
+        last[t] = eligible[k]
+        # a start that can't beat F[t] now never will (splitting a segment never costs more)
+        keep = np.ones(len(R), dtype=bool)
+        keep[R <= t - min_size] = values <= F[t]
+        R = np.append(R[keep], t)
+    ends = [n]
+    while last[ends[-1]] > 0:
+        ends.append(int(last[ends[-1]]))
+    return ends[::-1]
+
+
+def segment_session(session, penalty=PENALTY, min_seconds=MIN_SECONDS):
+    """
+    Phases of a session after calibration -> (t, x, names, [(first row, end row), ...]), rows index
+    the force log (end exclusive)
+    """
+    t, x, names = session_streams(session)
+    active = np.flatnonzero(x[:, :FORCE_CHANNELS].sum(axis=1) > CALIBRATION_THRESHOLD)
+    start = int(active[0]) if len(active) else 0
+    y = x[start:] / channel_scale(x[start:])
+    ends = pelt(y, change_penalty(len(y), y.shape[1], penalty), min_samples(t, min_seconds))
+    bounds = [(start + a, start + b) for a, b in zip([0] + ends[:-1], ends)]
+    return t, x, names, bounds
+
+
+def phase_windows(session, penalty=PENALTY, min_seconds=MIN_SECONDS):
+    """ Phases as (name, start, end) in seconds after calibration - session_dtw's --phase format """
+    t, _, _, bounds = segment_session(session, penalty, min_seconds)
+    t0 = t[bounds[0][0]]
+    return [(f"phase{k + 1}", float(t[a] - t0), float(t[min(b, len(t) - 1)] - t0)) for k, (a, b) in enumerate(bounds)]
+
+
+def segment_stats(x, bounds):
+    """ analzye_csv statistics per segment -> (S, C, len(STAT_NAMES)), std / variance with ddof=1 like pandas """
+    out = np.zeros((len(bounds), x.shape[1], len(STAT_NAMES)))
+    for k, (a, b) in enumerate(bounds):
+        seg = x[a:b]
+        lo, hi = seg.min(axis=0), seg.max(axis=0)
+        var = seg.var(axis=0, ddof=1) if len(seg) > 1 else np.full(x.shape[1], np.nan)
+        out[k] = np.stack([lo, hi, seg.mean(axis=0), np.median(seg, axis=0), np.abs(hi - lo), np.sqrt(var), var], axis=1)
+    return out
+
+
+def write_stats(out_dir, names, x, bounds):
+    """ sensor_stats_<first>_<last>.csv per phase, line numbers 1-based over the data rows (analzye_csv) """
+    os.makedirs(out_dir, exist_ok=True)
+    stats = segment_stats(x, bounds)
+    paths = []
+    for (a, b), block in zip(bounds, stats):
+        path = os.path.join(out_dir, f"sensor_stats_{a + 1}_{b}.csv")
+        with open(path, "w", newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([""] + STAT_NAMES)
+            for name, row in zip(names, block):
+                writer.writerow([name, *row])
+        paths.append(path)
+    return paths
+
+
+class OnlineSegmenter:
+    """
+    PELT one sample at a time. update(values, timestamp) returns the phases that became final
+    with this sample as (start_ts, end_ts) pairs.
+
+    min_seconds : shortest phase, checked against the sample timestamps rather than a sample count
+            so it holds when the logging rate or mode changes during the session
+    scale : channel_scale to divide by, e.g. reference_scale(an earlier session on the rig);
+            None = estimate it from the first `warmup` samples, whose phases come out when it is known
+    Samples before the force channels first sum above CALIBRATION_THRESHOLD are dropped, like
+    segment_session does.
+    """
+
+    def __init__(self, channels=FORCE_CHANNELS + 4, penalty=PENALTY, min_seconds=MIN_SECONDS, scale=None, warmup=240,
+                 expected_samples=EXPECTED_SAMPLES):
+        penalty = change_penalty(expected_samples, channels, penalty)
+        self.penalty = penalty
+        self.min_seconds = min_seconds
+        self.scale = None if scale is None else np.asarray(scale, dtype=float)
+        self.warmup = warmup
+        self._pending = []  # raw samples while the scale is being estimated
+        self.t = []
+        self.s1 = None
+        self.s2 = [0.0]
+        self.F = [-penalty]
+        self.last = [0]
+        self.R = np.array([0], dtype=np.int64)
+        self.final = [0]  # confirmed phase boundaries (sample index), len(final) - 1 phases are final
+        self.started = False
+
+    def __len__(self):
+        return len(self.t)
+
+    def update(self, values, timestamp):
+        if not self.started:
+            self.started = np.sum(values[:FORCE_CHANNELS]) > CALIBRATION_THRESHOLD
+            if not self.started:
+                return []
+        if self.scale is None:
+            self._pending.append((np.asarray(values, dtype=float), timestamp))
+            if len(self._pending) < self.warmup:
+                return []
+            self.scale = channel_scale(np.array([v for v, _ in self._pending]))
+            pending, self._pending = self._pending, []
+            confirmed = []
+            for v, ts in pending:
+                confirmed += self._step(v, ts)
+            return confirmed
+        return self._step(np.asarray(values, dtype=float), timestamp)
+
+    def _step(self, values, timestamp):
+        y = values / self.scale
+        if self.s1 is None:
+            self.s1 = [np.zeros_like(y)]
+        self.t.append(timestamp)
+        self.s1.append(self.s1[-1] + y)
+        self.s2.append(self.s2[-1] + float(y @ y))
+        t = len(self.t)
+        R = self.R
+        # candidate starts r whose segment r..t-1 already spans min_seconds (and 2 samples)
+        long_enough = (np.array([self.t[r] for r in R]) <= timestamp - self.min_seconds) & (R <= t - 2)
+        eligible = R[long_enough]
+        if not len(eligible):
+            self.F.append(np.inf)
+            self.last.append(0)
+            return []
+        s1 = np.array([self.s1[r] for r in eligible])
+        d = self.s1[t] - s1
+        cost = self.s2[t] - np.array([self.s2[r] for r in eligible]) - np.einsum("ij,ij->i", d, d) / (t - eligible)
+        values = np.array([self.F[r] for r in eligible]) + cost
+        k = int(np.argmin(values))
+        self.F.append(values[k] + self.penalty)
+        self.last.append(int(eligible[k]))
+        keep = np.ones(len(R), dtype=bool)
+        keep[long_enough] = values <= self.F[t]
+        self.R = np.append(R[keep], t)
+        return self._confirm()
+
+    def _history(self, end):
+        starts = []
+        while end > 0:
+            end = self.last[end]
+            starts.append(end)
+        return starts[::-1]
+
+    def _confirm(self):
+        """ Segment starts shared by every surviving candidate's history can't change any more """
+        # pruned starts never come back, so every future segmentation runs through some candidate
+        # r still in R and keeps r's optimal history before it
+        histories = [set(self._history(r)) | {int(r)} for r in self.R]
+        common = sorted(set.intersection(*histories))
+        confirmed = []
+        for start in common:
+            if start > self.final[-1]:
+                confirmed.append((self.t[self.final[-1]], self.t[start - 1]))
+                self.final.append(start)
+        return confirmed
+
+    def finish(self):
+        """ Session over: the remaining (still provisional) phases as final (start_ts, end_ts) pairs """
+        if self._pending:
+            self.scale = channel_scale(np.array([v for v, _ in self._pending]))
+            pending, self._pending = self._pending, []
+            for v, ts in pending:
+                self._step(v, ts)
+        rest = [(a, b) for a, b in self.segments() if a >= self.final[-1] and b > a]
+        self.final += [b for _, b in rest]
+        return [(self.t[a], self.t[b - 1]) for a, b in rest]
+
+    def provisional(self):
+        """
+        Phases after the last final boundary as the data reads now, (start_ts, end_ts); the last one
+        is still running and later samples may move any of these boundaries
+        """
+        return [(self.t[a], self.t[b - 1]) for a, b in self.segments() if a >= self.final[-1] and b > a]
+
+    def running_phase(self):
+        """ (number from 1, start_ts) of the phase in progress as the data reads now, (0, None) before calibration """
+        provisional = self.provisional()
+        if not provisional:
+            return 0, None
+        return len(self.final) - 1 + len(provisional), provisional[-1][0]
+
+    def segments(self):
+        """ Current best segmentation (final + provisional) as (start index, end index) """
+        starts = self._history(len(self.t)) if self.t and np.isfinite(self.F[-1]) else [0]
+        ends = starts[1:] + [len(self.t)]
+        return list(zip(starts, ends))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split a session into phases at change points of the force / flex streams")
+    parser.add_argument("session", help="session folder or .aeep archive")
+    parser.add_argument("--penalty", type=float, default=PENALTY, help="cost of one more change point (higher = fewer phases)")
+    parser.add_argument("--min-seconds", type=float, default=MIN_SECONDS, help="shortest phase")
+    parser.add_argument("--out", help="write sensor_stats_<first>_<last>.csv per phase into this folder")
+    parser.add_argument("--online", action="store_true", help="feed the session sample by sample through OnlineSegmenter")
+    parser.add_argument("--reference", help="--online: scale from this earlier session instead of a warm-up")
+    args = parser.parse_args()
+
+    session = load_session(args.session)
+    t, x, names, bounds = segment_session(session, args.penalty, args.min_seconds)
+    print(f"{session['name']}: {len(bounds)} phases after calibration (row {bounds[0][0] + 1})")
+    print(f"{'rows':>12}{'start s':>9}{'length s':>10}{'total force':>13}")
+    for a, b in bounds:
+        print(f"{a + 1:>6}-{b:<5}{t[a] - t[bounds[0][0]]:>9.0f}{t[b - 1] - t[a]:>10.0f}{x[a:b, :FORCE_CHANNELS].sum(axis=1).mean():>13.1f}")
+    if args.out:
+        paths = write_stats(args.out, names, x, bounds)
+        print(f"wrote {len(paths)} stats files to {args.out}")
+    if args.online:
+        scale = reference_scale(args.reference) if args.reference else None
+        online = OnlineSegmenter(x.shape[1], args.penalty, args.min_seconds, scale=scale)
+        t0 = t[bounds[0][0]]
+        running = 0
+        for i in range(bounds[0][0], len(t)):
+            for start_ts, end_ts in online.update(x[i], t[i]):
+                print(f"  online: {start_ts - t0:>5.0f}-{end_ts - t0:<5.0f} s final at {t[i] - t0:>5.0f} s (lag {t[i] - end_ts:.0f} s)")
+            number, start_ts = online.running_phase()
+            if number > running:
+                running = number
+                print(f"  provisional: phase {number} from {start_ts - t0:>5.0f} s seen at {t[i] - t0:>5.0f} s (lag {t[i] - start_ts:.0f} s)")
+        for start_ts, end_ts in online.finish():
+            print(f"  online: {start_ts - t0:>5.0f}-{end_ts - t0:<5.0f} s at the end")
+        print(f"online: {len(online.final) - 1} phases")
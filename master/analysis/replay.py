@@ -0,0 +1,85 @@
+# replay.py - runs a recorded session back through the live classification step
+#
+# Feeds every logged (N, S, E, W) row of a session folder or .aeep archive through
+# determine_quadrant (as force_main / Station.run does live), compares the result to the
+# recorded label and reports time spent per quadrant. --speed paces the rows like the live
+# log (1 = real time) and prints them; --out writes the re-classified session as csv logs.
+#
+#   python master/aeep.py replay bootcamp_data/EA6 --threshold 20
+#   python master/aeep.py replay EA6.aeep --speed 10
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "force_sensing"))
+
+from session_archive import load_session
+
+
+def replay(session, threshold=15, speed=None, out=sys.stdout):
+    """ Re-classified labels for every quadrant row; speed=None runs as fast as possible """
+    from quadrant_detection import determine_quadrant
+    t = session["quadrant_t"]
+    labels = []
+    start = time.monotonic()
+    for i, (n, s, e, w) in enumerate(session["nsew"]):
+        quadrant = determine_quadrant(n, s, e, w, threshold)
+        labels.append(quadrant)
+        if speed:
+            delay = (t[i] - t[0]) / speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+            print(f"{t[i] - t[0]:8.1f}s  {quadrant:<11} N={n:g} S={s:g} E={e:g} W={w:g}", file=out)
+    return np.array(labels)
+
+
+def dwell_times(t, labels):
+    """ Seconds spent per label, each row lasting until the next one """
+    if len(t) == 0:
+        return {}
+    dt = np.diff(t, append=t[-1] + (np.median(np.diff(t)) if len(t) > 1 else 0.0))
+    return {str(label): float(dt[labels == label].sum()) for label in np.unique(labels)}
+
+
+def write_session(session, labels, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "quadrant_log.csv"), "w", newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "quadrant", "bend_angle", "N", "S", "E", "W"])
+        for ts, label, nsew in zip(session["quadrant_t"], labels, session["nsew"]):
+            writer.writerow([repr(float(ts)), label, *nsew.tolist()])
+    if "force_t" in session:
+        with open(os.path.join(out_dir, "force_log.csv"), "w", newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["timestamp", "force_Array"])
+            for ts, row in zip(session["force_t"], session["force"]):
+                writer.writerow([repr(float(ts)), *row.tolist()])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded session through quadrant classification")
+    parser.add_argument("session", help="session folder or .aeep archive")
+    parser.add_argument("--threshold", type=float, default=15, help="determine_quadrant dead band")
+    parser.add_argument("--speed", type=float, help="pace rows at this multiple of real time and print them")
+    parser.add_argument("--out", help="write the re-classified session logs to this folder")
+    args = parser.parse_args()
+
+    session = load_session(args.session)
+    if "quadrant_t" not in session:
+        parser.error(f"{args.session} has no quadrant log")
+    started = time.perf_counter()
+    labels = replay(session, args.threshold, args.speed)
+    elapsed = time.perf_counter() - started
+
+    print(f"{session['name']}: {len(labels)} rows in {elapsed * 1e3:.1f} ms")
+    if len(labels):
+        print(f"agreement with recorded labels: {np.mean(labels == session['quadrant']):.1%}")
+    for label, seconds in sorted(dwell_times(session["quadrant_t"], labels).items(), key=lambda kv: -kv[1]):
+        print(f"  {label:<11}{seconds:8.1f} s")
+    if args.out:
+        write_session(session, labels, args.out)
+        print(f"Saved to {args.out}")
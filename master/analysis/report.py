@@ -0,0 +1,409 @@
+# report.py - headless cohort reports: PNGs + one PDF per session, rendered on a process pool
+#
+# Per session folder / .aeep archive:
+#   force       the force_process.py grid (every sheet channel, min / max / avg of the non-zero readings)
+#   quadrants   N/S/E/W and the quadrant distribution (quadrant_process.py), bars in a fixed order
+#               so sessions compare at a glance
+#   stats       analzye_csv's statistics per sensor after calibration, and the change-point phases
+#               of phase_segment.py with their length, total force and N/S/E/W means
+#   trajectory  rod tip position over time, top and side view (only when the session has an IMU stream)
+#
+# Everything is drawn with Agg. Each worker builds a figure once per page layout and then only
+# swaps the data of its lines, bars, texts and table cells for the next session, so creating
+# axes / tickers / tables is paid once per worker instead of once per page. Series are
+# downsampled to --max-points like lod_plot.
+#
+# report_manifest.json in the output folder keeps a key per session (session_hash of the
+# recording + the report settings); sessions whose key and files are unchanged are skipped, so
+# re-running over the whole cohort after one new recording renders just that one.
+#
+#   python master/analysis/report.py bootcamp_data/E* --out reports
+#   python master/analysis/report.py bootcamp_data/EA6 --format png --rebuild
+#   python master/analysis/report.py bootcamp_data/EA7 --smooth --L 0.1    (trajectory page drift-corrected)
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+MASTER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(MASTER, "force_sensing"))
+sys.path.append(os.path.join(MASTER, "imu"))
+
+from downsample import downsample_line
+from lod_plot import MAX_POINTS, use_backend
+from phase_segment import FORCE_CHANNELS, STAT_NAMES, segment_session, segment_stats
+from session_archive import load_session, session_files, session_hash, session_name
+from skill_features import CALIBRATION_THRESHOLD
+
+REPORT_VERSION = 1
+DEFAULT_OUT = "reports"
+MANIFEST = "report_manifest.json"
+FORMATS = ("png", "pdf")
+DPI = 100
+QUADRANTS = ("Center", "North", "South", "East", "West", "Quadrant 1", "Quadrant 2", "Quadrant 3", "Quadrant 4")
+DIRECTIONS = ("N", "S", "E", "W")
+STATS_BOX = dict(boxstyle='round', facecolor='wheat', alpha=0.5)
+
+
+def after_calibration(t, x):
+    """ force_process / quadrant_process rule: rows from the first one summing above the threshold, t from there """
+    active = np.flatnonzero(x.sum(axis=1) > CALIBRATION_THRESHOLD)
+    start = int(active[0]) if len(active) else 0
+    return t[start:] - t[start], x[start:]
+
+
+def stats_text(values):
+    """ Min / max / avg of the non-zero readings, as printed on force_process's plots """
+    nonzero = values[values != 0]
+    if len(nonzero):
+        lo, hi, avg = nonzero.min(), nonzero.max(), nonzero.mean()
+    else:
+        lo, hi, avg = 0, values.max() if len(values) else 0, values.mean() if len(values) else 0
+    return f'Min: {lo:.2f}\nMax: {hi:.2f}\nAvg: {avg:.2f}'
+
+
+def session_trajectory(session, beta=0.1, L=0.0, smooth=False):
+    """ compute_trajectory (or smoother.py's drift-corrected) dict of the session's IMU stream, None without one """
+    t, imu = session.get("imu_t"), session.get("imu")
+    if t is None or imu is None or len(t) < 2:
+        return None
+    # dof9_filter.load_imu_array's layout: column 0 is the per-sample dt
+    data = np.hstack([np.empty((len(t), 1)), imu[:, :9]])
+    data[1:, 0] = np.diff(t)
+    data[0, 0] = data[1:, 0].mean()
+    if smooth:
+        from smoother import smooth_trajectory
+        return smooth_trajectory(data, beta, L)
+    from dof9_filter import MadgwickFilter
+    return MadgwickFilter(sample_period=data[:, 0].mean(), beta=beta).compute_trajectory(data, beta, L)
+
+
+def _rescale(ax):
+    ax.relim()
+    ax.autoscale_view()
+
+
+# ——— page templates: built once per worker and layout, data swapped per session ———
+class ForcePage:
+    """ force_process.plot_force's grid for `channels` sensors """
+
+    def __init__(self, plt, channels):
+        from matplotlib.ticker import MaxNLocator
+        nrows = int(np.ceil(channels / 3))
+        self.fig, axs = plt.subplots(nrows=nrows, ncols=3, figsize=(18, 2.4 * nrows + 0.6), sharex=True)
+        axs = axs.flatten()
+        for ax in axs[channels:]:
+            self.fig.delaxes(ax)
+        self.axs = axs[:channels]
+        self.lines, self.texts = [], []
+        for i, ax in enumerate(self.axs):
+            self.lines.append(ax.plot([], [])[0])
+            self.texts.append(ax.text(0.02, 0.98, "", transform=ax.transAxes, fontsize=9,
+                                      verticalalignment='top', bbox=STATS_BOX))
+            ax.set_title(f'force_{i+1}')
+            ax.set_ylabel('Force Reading')
+            ax.xaxis.set_major_locator(MaxNLocator(nbins=12))
+            ax.yaxis.set_major_locator(MaxNLocator(nbins=6))
+            ax.tick_params(axis='x', rotation=0, labelsize=8)
+            ax.tick_params(axis='y', labelsize=8)
+        self.title = self.fig.suptitle("")
+        self.fig.text(0.5, 0.01, 'Time (s)', ha='center', fontsize=12)
+        self.fig.subplots_adjust(left=0.05, right=0.99, bottom=0.06, top=0.93, wspace=0.18, hspace=0.35)
+
+    def update(self, name, t, force, max_points, method):
+        for i, (ax, line, text) in enumerate(zip(self.axs, self.lines, self.texts)):
+            line.set_data(*downsample_line(t, force[:, i], max_points, method))
+            text.set_text(stats_text(force[:, i]))
+            _rescale(ax)
+        self.title.set_text(f"{name} - force")
+        return self.fig
+
+
+class QuadrantPage:
+    """ quadrant_process.plot_quadrants' layout """
+
+    def __init__(self, plt):
+        from matplotlib.ticker import MaxNLocator
+        self.fig, axs = plt.subplots(nrows=3, ncols=2, figsize=(16, 12))
+        axs = axs.flatten()
+        self.axs = axs[:4]
+        self.lines, self.texts = [], []
+        for ax, direction in zip(self.axs, DIRECTIONS):
+            self.lines.append(ax.plot([], [])[0])
+            self.texts.append(ax.text(0.02, 0.98, "", transform=ax.transAxes, fontsize=9,
+                                      verticalalignment='top', bbox=STATS_BOX))
+            ax.set_title(f'{direction} Direction Force')
+            ax.set_xlabel('Time (s)')
+            ax.set_ylabel('Force Reading')
+            ax.xaxis.set_major_locator(MaxNLocator(nbins=12))
+            ax.yaxis.set_major_locator(MaxNLocator(nbins=6))
+            ax.tick_params(axis='x', rotation=0, labelsize=8)
+            ax.tick_params(axis='y', labelsize=8)
+        self.bar_ax = axs[4]
+        self.bars = self.bar_ax.bar(range(len(QUADRANTS)), np.zeros(len(QUADRANTS)))
+        self.bar_ax.set_xticks(range(len(QUADRANTS)))
+        self.bar_ax.set_xticklabels(QUADRANTS, rotation=45)
+        self.bar_ax.set_title('Quadrant Distribution')
+        self.bar_ax.set_ylabel('Count')
+        self.fig.delaxes(axs[5])
+        self.title = self.fig.suptitle("")
+        self.fig.subplots_adjust(left=0.06, right=0.98, bottom=0.08, top=0.94, wspace=0.18, hspace=0.4)
+
+    def update(self, name, t, nsew, quadrant, max_points, method):
+        for i, (ax, line, text) in enumerate(zip(self.axs, self.lines, self.texts)):
+            line.set_data(*downsample_line(t, nsew[:, i], max_points, method))
+            text.set_text(stats_text(nsew[:, i]))
+            _rescale(ax)
+        labels, counts = np.unique(quadrant, return_counts=True)
+        counts = dict(zip(labels, counts))
+        for bar, label in zip(self.bars, QUADRANTS):
+            bar.set_height(counts.get(label, 0))
+        _rescale(self.bar_ax)
+        other = sum(c for label, c in counts.items() if label not in QUADRANTS)
+        self.bar_ax.set_xlabel(f"{other} samples with other labels" if other else "")
+        self.title.set_text(f"{name} - flex sensors and quadrants")
+        return self.fig
+
+
+class StatsPage:
+    """ Per sensor statistics after calibration (fixed table) + one row per phase (rebuilt per session) """
+    PHASE_COLUMNS = ["phase", "rows", "start s", "length s", "total force", *DIRECTIONS]
+
+    def __init__(self, plt, names):
+        self.fig, (self.sensor_ax, self.phase_ax) = plt.subplots(nrows=2, ncols=1, figsize=(12, 16),
+                                                                 gridspec_kw={"height_ratios": [1, 1.2]})
+        for ax in (self.sensor_ax, self.phase_ax):
+            ax.axis("off")
+        self.sensor_table = self.sensor_ax.table(cellText=[[""] * len(STAT_NAMES) for _ in names], rowLabels=names,
+                                                 colLabels=STAT_NAMES, loc="upper center")
+        self.sensor_table.auto_set_font_size(False)
+        self.sensor_table.set_fontsize(9)
+        self.sensor_table.scale(1, 1.3)
+        self.sensor_title = self.sensor_ax.set_title("")
+        self.phase_title = self.phase_ax.set_title("")
+        self.phase_table = None
+        self.fig.subplots_adjust(left=0.12, right=0.98, bottom=0.02, top=0.96, hspace=0.08)
+
+    def update(self, name, t, x, bounds):
+        start = bounds[0][0]
+        overall = segment_stats(x, [(start, len(x))])[0]
+        for r, row in enumerate(overall):
+            for c, value in enumerate(row):
+                self.sensor_table[r + 1, c].get_text().set_text(f"{value:.2f}")
+        self.sensor_title.set_text(f"{name} - sensor statistics after calibration (rows {start + 1}-{len(x)})")
+
+        rows = []
+        for k, (a, b) in enumerate(bounds):
+            seg = x[a:b]
+            rows.append([f"{k + 1}", f"{a + 1}-{b}", f"{t[a] - t[start]:.0f}", f"{t[b - 1] - t[a]:.0f}",
+                         f"{seg[:, :FORCE_CHANNELS].sum(axis=1).mean():.1f}",
+                         *(f"{v:.1f}" for v in seg[:, FORCE_CHANNELS:].mean(axis=0))])
+        if self.phase_table is not None:
+            self.phase_table.remove()
+        self.phase_table = self.phase_ax.table(cellText=rows, colLabels=self.PHASE_COLUMNS, loc="upper center")
+        self.phase_table.auto_set_font_size(False)
+        self.phase_table.set_fontsize(9 if len(rows) <= 30 else 7)
+        self.phase_table.scale(1, 1.3 if len(rows) <= 30 else 1.0)
+        self.phase_title.set_text(f"{len(bounds)} phases (phase_segment.py)")
+        return self.fig
+
+
+class TrajectoryPage:
+    """ Rod tip x / y / z over time, top view (x-y) and side view (x-z) """
+
+    def __init__(self, plt):
+        self.fig = plt.figure(figsize=(14, 10))
+        grid = self.fig.add_gridspec(2, 2, height_ratios=[1, 1.4])
+        self.time_ax = self.fig.add_subplot(grid[0, :])
+        self.top_ax = self.fig.add_subplot(grid[1, 0])
+        self.side_ax = self.fig.add_subplot(grid[1, 1])
+        self.axis_lines = [self.time_ax.plot([], [], label=axis)[0] for axis in "xyz"]
+        self.time_ax.set_xlabel('Time (s)')
+        self.time_ax.set_ylabel('Position (m)')
+        self.time_ax.legend(loc="upper right")
+        self.top_line = self.top_ax.plot([], [], linewidth=0.8)[0]
+        self.side_line = self.side_ax.plot([], [], linewidth=0.8)[0]
+        for ax, (h, v) in ((self.top_ax, "xy"), (self.side_ax, "xz")):
+            ax.set_xlabel(f'{h} (m)')
+            ax.set_ylabel(f'{v} (m)')
+            ax.set_aspect("equal", adjustable="datalim")
+        self.top_ax.set_title('Top view')
+        self.side_ax.set_title('Side view')
+        self.text = self.time_ax.text(0.02, 0.95, "", transform=self.time_ax.transAxes, fontsize=9,
+                                      verticalalignment='top', bbox=STATS_BOX)
+        self.title = self.fig.suptitle("")
+        self.fig.subplots_adjust(left=0.07, right=0.98, bottom=0.06, top=0.93, wspace=0.2, hspace=0.25)
+
+    def update(self, name, trajectory, max_points, method):
+        tip = trajectory["rod_tip_position"]
+        t = trajectory["time"]
+        for k, line in enumerate(self.axis_lines):
+            line.set_data(*downsample_line(t, tip[:, k], max_points, method))
+        # the path views keep every max_points-th sample: a shape, not a time series to zoom into
+        step = max(1, len(tip) // max_points)
+        self.top_line.set_data(tip[::step, 0], tip[::step, 1])
+        self.side_line.set_data(tip[::step, 0], tip[::step, 2])
+        for ax in (self.time_ax, self.top_ax, self.side_ax):
+            _rescale(ax)
+        path = float(np.linalg.norm(np.diff(tip, axis=0), axis=1).sum())
+        self.text.set_text(f'Duration: {t[-1]:.0f} s\nPath length: {path:.2f} m')
+        self.title.set_text(f"{name} - rod tip trajectory")
+        return self.fig
+
+
+PAGE_TYPES = {"force": ForcePage, "quadrants": QuadrantPage, "stats": StatsPage, "trajectory": TrajectoryPage}
+
+_plt = None
+_pages = {}  # (page, layout) -> template, per process: reused for every session the worker renders
+
+
+def _init_worker():
+    global _plt
+    _plt = use_backend(True)
+
+
+def _page(kind, *layout):
+    key = (kind, *layout)
+    if key not in _pages:
+        _pages[key] = PAGE_TYPES[kind](_plt, *layout)
+    return _pages[key]
+
+
+def render_session(path, out_dir, formats=FORMATS, max_points=MAX_POINTS, method="minmax", beta=0.1, L=0.0,
+                   smooth=False, dpi=DPI):
+    """ Renders one session's pages into out_dir -> (name, files relative to out_dir) """
+    if _plt is None:
+        _init_worker()
+    session = load_session(path)
+    name = session["name"]
+    t, x, names, bounds = segment_session(session)  # ValueError without force + quadrant logs
+
+    figures = [("force", _page("force", session["force"].shape[1]).update(
+        name, *after_calibration(session["force_t"], session["force"]), max_points, method))]
+    qt, nsew = after_calibration(session["quadrant_t"], session["nsew"])
+    quadrant = session["quadrant"][len(session["quadrant"]) - len(qt):]
+    figures.append(("quadrants", _page("quadrants").update(name, qt, nsew, quadrant, max_points, method)))
+    figures.append(("stats", _page("stats", tuple(names)).update(name, t, x, bounds)))
+    trajectory = session_trajectory(session, beta, L, smooth)
+    if trajectory is not None:
+        figures.append(("trajectory", _page("trajectory").update(name, trajectory, max_points, method)))
+
+    files = []
+    if "png" in formats:
+        os.makedirs(os.path.join(out_dir, name), exist_ok=True)
+        for page, fig in figures:
+            files.append(os.path.join(name, f"{page}.png"))
+            fig.savefig(os.path.join(out_dir, files[-1]), dpi=dpi)
+    if "pdf" in formats:
+        from matplotlib.backends.backend_pdf import PdfPages
+        files.append(f"{name}.pdf")
+        with PdfPages(os.path.join(out_dir, files[-1])) as pdf:
+            for _, fig in figures:
+                pdf.savefig(fig)
+    return name, files
+
+
+# ——— cohort runs ———
+def report_key(content_hash, settings):
+    blob = json.dumps(settings, sort_keys=True)
+    return hashlib.sha1(f"report:{content_hash}:{blob}:v{REPORT_VERSION}".encode()).hexdigest()
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _session_size(path):
+    return sum(os.path.getsize(p) for p in session_files(path))
+
+
+def build_reports(paths, out_dir=DEFAULT_OUT, workers=None, rebuild=False, progress=True, formats=FORMATS,
+                  max_points=MAX_POINTS, method="minmax", beta=0.1, L=0.0, smooth=False, dpi=DPI):
+    """
+    Renders every session whose recording or settings changed since the last run.
+    workers : processes (default: all cores, 1 = no pool)
+    Returns {"rendered": [...], "skipped": [...], "failed": [(path, error), ...]}
+    """
+    settings = {"formats": sorted(formats), "max_points": max_points, "method": method, "beta": beta, "L": L,
+                "smooth": smooth, "dpi": dpi}
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    result = {"rendered": [], "skipped": [], "failed": []}
+    todo = {}
+    for path in dict.fromkeys(os.path.normpath(p) for p in paths):
+        key = report_key(session_hash(path), settings)
+        entry = manifest.get(session_name(path), {})
+        if not rebuild and entry.get("key") == key and all(os.path.exists(os.path.join(out_dir, f)) for f in entry["files"]):
+            result["skipped"].append(session_name(path))
+            continue
+        todo[path] = key
+    # longest sessions first so the pool doesn't end on one big straggler
+    order = sorted(todo, key=_session_size, reverse=True)
+    args = (out_dir, formats, max_points, method, beta, L, smooth, dpi)
+
+    def finish(path, outcome):
+        if isinstance(outcome, Exception):
+            result["failed"].append((path, str(outcome)))
+            if progress:
+                print(f"skipping {path}: {outcome}")
+            return
+        name, files = outcome
+        manifest[name] = {"key": todo[path], "files": files}
+        save_manifest(out_dir, manifest)
+        result["rendered"].append(name)
+        if progress:
+            print(f"  {name}: {len(files)} files")
+
+    if workers == 1 or len(order) <= 1:
+        for path in order:
+            try:
+                finish(path, render_session(path, *args))
+            except (ValueError, KeyError, OSError) as e:
+                finish(path, e)
+    elif order:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {pool.submit(render_session, path, *args): path for path in order}
+            for future in as_completed(futures):
+                try:
+                    finish(futures[future], future.result())
+                except (ValueError, KeyError, OSError) as e:
+                    finish(futures[future], e)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render per-session report pages (PNG / PDF) for a cohort, headless")
+    parser.add_argument("sessions", nargs="+", help="session folders / .aeep archives")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="output folder (PNGs in <out>/<session>/, <out>/<session>.pdf)")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=list(FORMATS), dest="formats")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores, 1 = no pool)")
+    parser.add_argument("--rebuild", action="store_true", help="render every session even if unchanged")
+    parser.add_argument("--max-points", type=int, default=MAX_POINTS, help="points drawn per series")
+    parser.add_argument("--method", choices=["minmax", "lttb"], default="minmax")
+    parser.add_argument("--beta", type=float, default=0.1, help="Madgwick gain for the trajectory page")
+    parser.add_argument("--L", type=float, default=0.0, help="rod length in meters for the trajectory page")
+    parser.add_argument("--smooth", action="store_true", help="drift-corrected trajectory (smoother.py)")
+    parser.add_argument("--dpi", type=int, default=DPI)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = build_reports(args.sessions, args.out, args.workers, args.rebuild, True, args.formats,
+                           args.max_points, args.method, args.beta, args.L, args.smooth, args.dpi)
+    print(f"{len(result['rendered'])} rendered, {len(result['skipped'])} unchanged, {len(result['failed'])} failed "
+          f"in {time.perf_counter() - start:.1f} s -> {args.out}")
@@ -0,0 +1,389 @@
+# session_archive.py - compact chunked archive for recorded sessions
+#
+# One .aeep file per session. Each channel group (force, quadrant, imu) is cut into
+# fixed-time chunks; every chunk is delta-encoded and compressed (zlib or lzma) on its own,
+# and a json index at the end of the file lists each chunk's time range and byte offset.
+# Reading a time window only decompresses the chunks that overlap it.
+#
+# Encoding is lossless: timestamps are stored as the float64 bit patterns (delta-encoded),
+# values as fixed-point integers when every value has few enough decimals (the logs are
+# written with 1 decimal) and as raw float64 otherwise. Exporting gives back the exact
+# force_log.csv / quadrant_log.csv files.
+#
+# File layout:  MAGIC | chunk bytes ... | index json | u64 index offset | MAGIC
+#
+#   python master/analysis/session_archive.py import bootcamp_data/EA6 EA6.aeep
+#   python master/analysis/session_archive.py export EA6.aeep out/EA6
+#   python master/analysis/session_archive.py info EA6.aeep
+#   python master/analysis/session_archive.py import-all bootcamp_data archives/
+import argparse
+import csv
+import hashlib
+import json
+import lzma
+import os
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b"AEEPARC1"
+FOOTER = struct.Struct("<Q8s")
+CODECS = {
+    "zlib": (lambda b: zlib.compress(b, 9), zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+MAX_DECIMALS = 6
+
+QUADRANT_HEADER = ["timestamp", "quadrant", "bend_angle", "N", "S", "E", "W"]
+FORCE_HEADER = ["timestamp", "force_Array"]
+
+
+# ——— encoding ———
+def _decimals(values):
+    """ Smallest number of decimals that represents every value exactly, or None """
+    finite = values[np.isfinite(values)]
+    if len(finite) != values.size or (len(finite) and np.abs(finite).max() > 1e12):
+        return None
+    for k in range(MAX_DECIMALS + 1):
+        scaled = np.round(values * 10 ** k)
+        if np.array_equal(scaled / 10 ** k, values):
+            return k
+    return None
+
+
+def _delta(a):
+    out = a.copy()
+    out[1:] -= a[:-1]
+    return out
+
+
+def encode_chunk(timestamps, values, codec):
+    """ -> (bytes, encoding) ; encoding is "dN" (N decimals fixed point) or "f8" """
+    t_bits = _delta(timestamps.astype("<f8").view("<i8"))
+    k = _decimals(values)
+    if k is None:
+        payload = values.astype("<f8").T.tobytes()  # column-major compresses better
+        encoding = "f8"
+    else:
+        ints = np.round(values * 10 ** k).astype("<i8")
+        payload = _delta(ints).T.tobytes()
+        encoding = f"d{k}"
+    return CODECS[codec][0](t_bits.tobytes() + payload), encoding
+
+
+def decode_chunk(blob, n, width, encoding, codec):
+    raw = CODECS[codec][1](blob)
+    t_bits = np.cumsum(np.frombuffer(raw, "<i8", count=n))
+    timestamps = t_bits.view("<f8")
+    body = raw[8 * n:]
+    if encoding == "f8":
+        values = np.frombuffer(body, "<f8").reshape(width, n).T.copy()
+    else:
+        k = int(encoding[1:])
+        ints = np.cumsum(np.frombuffer(body, "<i8").reshape(width, n), axis=1)
+        values = (ints / 10 ** k).T
+    return timestamps, values
+
+
+# ——— writing ———
+def write_archive(path, groups, chunk_seconds=60.0, codec="zlib", meta=None):
+    """
+    groups: {name: {"timestamps": (N,), "values": (N, W), "columns": [...], "labels": [...] (optional)}}
+    labels lets a value column hold category codes (quadrant names); stored in the index.
+    """
+    index = {"version": 1, "codec": codec, "chunk_seconds": chunk_seconds, "meta": meta or {}, "groups": {}}
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for name, g in groups.items():
+            timestamps = np.asarray(g["timestamps"], dtype=float)
+            values = np.asarray(g["values"], dtype=float).reshape(len(timestamps), -1)
+            entry = {"columns": g["columns"], "width": values.shape[1], "chunks": []}
+            if "labels" in g:
+                entry["labels"] = g["labels"]
+            if len(timestamps):
+                # chunk boundaries on a fixed time grid (rows stay in file order)
+                bins = np.floor((timestamps - timestamps[0]) / chunk_seconds).astype(np.int64)
+                cuts = np.flatnonzero(np.diff(bins)) + 1
+                for a, b in zip(np.r_[0, cuts], np.r_[cuts, len(timestamps)]):
+                    blob, encoding = encode_chunk(timestamps[a:b], values[a:b], codec)
+                    entry["chunks"].append({
+                        "t0": float(timestamps[a:b].min()), "t1": float(timestamps[a:b].max()),
+                        "n": int(b - a), "offset": f.tell(), "length": len(blob), "encoding": encoding,
+                    })
+                    f.write(blob)
+            index["groups"][name] = entry
+        index_offset = f.tell()
+        f.write(json.dumps(index).encode())
+        f.write(FOOTER.pack(index_offset, MAGIC))
+
+
+# ——— reading ———
+class ArchiveReader:
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "rb")
+        if self.f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a session archive")
+        self.f.seek(-FOOTER.size, os.SEEK_END)
+        index_offset, magic = FOOTER.unpack(self.f.read(FOOTER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is truncated (no index)")
+        end = self.f.seek(0, os.SEEK_END) - FOOTER.size
+        self.f.seek(index_offset)
+        self.index = json.loads(self.f.read(end - index_offset))
+        self.chunks_read = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.f.close()
+
+    @property
+    def groups(self):
+        return list(self.index["groups"])
+
+    def columns(self, group):
+        return self.index["groups"][group]["columns"]
+
+    def labels(self, group):
+        return self.index["groups"][group].get("labels")
+
+    def time_range(self, group=None):
+        chunks = [c for name in ([group] if group else self.groups) for c in self.index["groups"][name]["chunks"]]
+        if not chunks:
+            return None
+        return min(c["t0"] for c in chunks), max(c["t1"] for c in chunks)
+
+    def read(self, group, t0=None, t1=None):
+        """ (timestamps, values) for rows with t0 <= timestamp <= t1 (None = open ended) """
+        entry = self.index["groups"][group]
+        width = entry["width"]
+        parts_t, parts_v = [], []
+        for c in entry["chunks"]:
+            if (t0 is not None and c["t1"] < t0) or (t1 is not None and c["t0"] > t1):
+                continue
+            self.f.seek(c["offset"])
+            ts, vs = decode_chunk(self.f.read(c["length"]), c["n"], width, c["encoding"], self.index["codec"])
+            self.chunks_read += 1
+            keep = np.ones(len(ts), dtype=bool)
+            if t0 is not None:
+                keep &= ts >= t0
+            if t1 is not None:
+                keep &= ts <= t1
+            parts_t.append(ts[keep])
+            parts_v.append(vs[keep])
+        if not parts_t:
+            return np.zeros(0), np.zeros((0, width))
+        return np.concatenate(parts_t), np.concatenate(parts_v)
+
+
+# ——— csv import / export ———
+def _read_rows(path):
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        return header, [row for row in reader if row]
+
+
+def import_session(session_dir, out_path, chunk_seconds=60.0, codec="zlib"):
+    """ Packs a session folder (force_log.csv, quadrant_log.csv, optional imu csv) into one archive """
+    groups = {}
+    force_path = os.path.join(session_dir, "force_log.csv")
+    if os.path.exists(force_path):
+        _, rows = _read_rows(force_path)
+        width = max((len(r) for r in rows), default=1) - 1
+        values = np.array([[float(v) for v in r[1:]] + [np.nan] * (width + 1 - len(r)) for r in rows]).reshape(len(rows), width)
+        groups["force"] = {
+            "timestamps": np.array([float(r[0]) for r in rows]),
+            "values": values,
+            "columns": [f"force_{i + 1}" for i in range(width)],
+        }
+    quadrant_path = os.path.join(session_dir, "quadrant_log.csv")
+    if os.path.exists(quadrant_path):
+        _, rows = _read_rows(quadrant_path)
+        labels = sorted({r[1] for r in rows})
+        codes = {label: i for i, label in enumerate(labels)}
+        # force_main writes timestamp, quadrant, N, S, E, W (no bend_angle despite the header)
+        groups["quadrant"] = {
+            "timestamps": np.array([float(r[0]) for r in rows]),
+            "values": np.array([[codes[r[1]]] + [float(v) for v in r[2:6]] for r in rows]).reshape(len(rows), 5),
+            "columns": ["quadrant", "N", "S", "E", "W"],
+            "labels": labels,
+        }
+    imu_path = os.path.join(session_dir, "imu_log.csv")
+    if os.path.exists(imu_path):
+        header, rows = _read_rows(imu_path)
+        data = np.array([[float(v) for v in r] for r in rows]).reshape(len(rows), len(header))
+        groups["imu"] = {"timestamps": data[:, 0], "values": data[:, 1:], "columns": header[1:]}
+    if not groups:
+        raise FileNotFoundError(f"no session csv files in {session_dir}")
+    write_archive(out_path, groups, chunk_seconds, codec, meta={"session": os.path.basename(os.path.normpath(session_dir))})
+    return out_path
+
+
+def export_session(archive_path, out_dir):
+    """ Writes the archive back out in the force_main csv layouts """
+    os.makedirs(out_dir, exist_ok=True)
+    with ArchiveReader(archive_path) as archive:
+        if "force" in archive.groups:
+            ts, vs = archive.read("force")
+            with open(os.path.join(out_dir, "force_log.csv"), "w", newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(FORCE_HEADER)
+                for t, row in zip(ts.tolist(), vs.tolist()):
+                    writer.writerow([t, *[v for v in row if v == v]])  # drop nan padding
+        if "quadrant" in archive.groups:
+            labels = archive.labels("quadrant")
+            ts, vs = archive.read("quadrant")
+            with open(os.path.join(out_dir, "quadrant_log.csv"), "w", newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(QUADRANT_HEADER)
+                for t, row in zip(ts.tolist(), vs.tolist()):
+                    writer.writerow([t, labels[int(row[0])], *row[1:]])
+        if "imu" in archive.groups:
+            ts, vs = archive.read("imu")
+            with open(os.path.join(out_dir, "imu_log.csv"), "w", newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(["Timestamp", *archive.columns("imu")])
+                for t, row in zip(ts.tolist(), vs.tolist()):
+                    writer.writerow([t, *row])
+    return out_dir
+
+
+SESSION_FILES = ("force_log.csv", "quadrant_log.csv", "imu_log.csv")
+
+
+def session_name(path):
+    return os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+
+
+def session_files(path):
+    """ The files that make up a session (a folder of csvs or one .aeep archive) """
+    if os.path.isdir(path):
+        return [os.path.join(path, n) for n in SESSION_FILES if os.path.exists(os.path.join(path, n))]
+    return [path]
+
+
+def session_hash(path):
+    """ sha1 over the session's file contents - changes whenever the recording does """
+    h = hashlib.sha1()
+    for file_path in session_files(path):
+        h.update(os.path.basename(file_path).encode())
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def _load_numeric(path):
+    """ All-numeric csv -> (N, W) array; rows shorter than the widest are padded with 0 """
+    import warnings
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # header-only files
+            data = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)  # C parser, ~10x faster
+        if data.size:
+            return data
+    except ValueError:  # ragged rows (14 and 15 sensor logs mixed)
+        pass
+    _, rows = _read_rows(path)
+    width = max((len(r) for r in rows), default=1)
+    return np.array([[float(v) for v in r] + [0.0] * (width - len(r)) for r in rows]).reshape(len(rows), width)
+
+
+def load_session(path):
+    """
+    Loads a session folder or .aeep archive into arrays:
+        name, force_t (N,), force (N, W), quadrant_t (M,), quadrant (M,) str labels,
+        nsew (M, 4), imu_t / imu (K, 9) or None when there is no IMU stream
+    Force rows shorter than the widest (14 and 15 sensor logs mixed) are padded with 0 from
+    either source; NaN is only the archive's internal "no value" marker.
+    """
+    if not os.path.isdir(path):
+        session = {"name": session_name(path), "imu_t": None, "imu": None}
+        with ArchiveReader(path) as archive:
+            if "force" in archive.groups:
+                session["force_t"], force = archive.read("force")
+                session["force"] = np.nan_to_num(force, nan=0.0)  # padding, same as _load_numeric
+            if "quadrant" in archive.groups:
+                ts, vs = archive.read("quadrant")
+                labels = np.array(archive.labels("quadrant"))
+                session["quadrant_t"] = ts
+                session["quadrant"] = labels[vs[:, 0].astype(int)] if len(vs) else np.array([], dtype=str)
+                session["nsew"] = vs[:, 1:5]
+            if "imu" in archive.groups:
+                session["imu_t"], session["imu"] = archive.read("imu")
+        return session
+
+    session = {"name": session_name(path), "imu_t": None, "imu": None}
+    force_path = os.path.join(path, "force_log.csv")
+    if os.path.exists(force_path):
+        data = _load_numeric(force_path)
+        session["force_t"], session["force"] = data[:, 0], data[:, 1:]
+    quadrant_path = os.path.join(path, "quadrant_log.csv")
+    if os.path.exists(quadrant_path):
+        _, rows = _read_rows(quadrant_path)
+        session["quadrant_t"] = np.array([float(r[0]) for r in rows])
+        session["quadrant"] = np.array([r[1] for r in rows])
+        session["nsew"] = np.array([[float(v) for v in r[2:6]] for r in rows]).reshape(len(rows), 4)
+    imu_path = os.path.join(path, "imu_log.csv")
+    if os.path.exists(imu_path):
+        data = _load_numeric(imu_path)
+        session["imu_t"], session["imu"] = data[:, 0], data[:, 1:10]
+    return session
+
+
+def _dir_size(session_dir):
+    return sum(os.path.getsize(os.path.join(session_dir, n)) for n in os.listdir(session_dir)
+               if n in ("force_log.csv", "quadrant_log.csv", "imu_log.csv"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunked compressed archives for session csv folders")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("import", help="session folder -> archive")
+    p.add_argument("session_dir")
+    p.add_argument("archive")
+    p.add_argument("--chunk-seconds", type=float, default=60.0)
+    p.add_argument("--codec", choices=list(CODECS), default="zlib")
+    p = sub.add_parser("import-all", help="every session folder under a directory -> archives")
+    p.add_argument("data_dir")
+    p.add_argument("out_dir")
+    p.add_argument("--chunk-seconds", type=float, default=60.0)
+    p.add_argument("--codec", choices=list(CODECS), default="zlib")
+    p = sub.add_parser("export", help="archive -> force_log.csv / quadrant_log.csv")
+    p.add_argument("archive")
+    p.add_argument("out_dir")
+    p = sub.add_parser("info", help="list groups and chunks")
+    p.add_argument("archive")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        import_session(args.session_dir, args.archive, args.chunk_seconds, args.codec)
+        print(f"{_dir_size(args.session_dir)} bytes of csv -> {os.path.getsize(args.archive)} bytes")
+    elif args.command == "import-all":
+        os.makedirs(args.out_dir, exist_ok=True)
+        total_in = total_out = 0
+        for name in sorted(os.listdir(args.data_dir)):
+            session_dir = os.path.join(args.data_dir, name)
+            if not os.path.exists(os.path.join(session_dir, "force_log.csv")):
+                continue
+            out = import_session(session_dir, os.path.join(args.out_dir, name + ".aeep"), args.chunk_seconds, args.codec)
+            total_in += _dir_size(session_dir)
+            total_out += os.path.getsize(out)
+            print(f"{name}: {_dir_size(session_dir)} -> {os.path.getsize(out)} bytes")
+        if total_out:
+            print(f"total {total_in} -> {total_out} bytes ({total_in / total_out:.1f}x smaller)")
+    elif args.command == "export":
+        export_session(args.archive, args.out_dir)
+    else:
+        with ArchiveReader(args.archive) as archive:
+            print(json.dumps(archive.index["meta"]), archive.index["codec"])
+            for name in archive.groups:
+                chunks = archive.index["groups"][name]["chunks"]
+                print(f"{name}: {sum(c['n'] for c in chunks)} rows, {len(chunks)} chunks, columns {archive.columns(name)}")
@@ -0,0 +1,335 @@
+# session_dtw.py - how closely does a session follow an expert reference? (dynamic time warping)
+#
+# Every session becomes a profile: its force channels and quadrant direction, from the end of
+# calibration to the end of the recording, averaged into PROFILE_LENGTH equal time bins. Time is
+# normalized, so a student who takes twice as long is not penalized for that alone (duration
+# is reported separately); the warping absorbs doing the steps at a different pace.
+#
+#   force     first FORCE_CHANNELS sheet channels / FORCE_SCALE (every rig has at least 14)
+#   quadrant  unit vector of the quadrant label (East = +x, North = +y, Quadrant 1 = NE, ...)
+#
+# Profiles are compared with multichannel DTW (squared euclidean, one shared warping path)
+# inside a Sakoe-Chiba band of +-band * PROFILE_LENGTH steps. One-vs-many search ranks the
+# cohort by the cheap LB_Kim / LB_Keogh lower bounds first; a candidate whose bound already
+# exceeds the current top-k cost is never aligned, and an alignment stops as soon as every
+# path through the current row is too expensive. The survivors run on a process pool.
+#
+# For every match the warping path gives the cost per phase of the reference (thirds by
+# default, --phase name=start:end in reference seconds after calibration, or --auto-phases for
+# the reference's change-point phases from phase_segment.py) and the part of the candidate's
+# recording that was matched to that phase. Profiles are cached next to the skill features
+# (feature_cache/), so a growing session library is only read once.
+#
+#   python master/analysis/session_dtw.py bootcamp_data/EA6 bootcamp_data/E* --top 5
+#   python master/analysis/session_dtw.py bootcamp_data/EA6 bootcamp_data/ES* --top 0 --band 0.2 \
+#       --phase setup=0:300 --phase resection=300:1500 --phase finish=1500:1790 --out es_vs_ea6.json
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from session_archive import load_session, session_hash, session_name
+from skill_features import CALIBRATION_THRESHOLD, DEFAULT_CACHE
+
+PROFILE_VERSION = 1
+PROFILE_LENGTH = 600
+FORCE_CHANNELS = 14
+FORCE_SCALE = 10.0  # a 10 unit force difference costs as much as one quadrant step
+QUADRANT_XY = {
+    "Center": (0.0, 0.0),
+    "North": (0.0, 1.0), "South": (0.0, -1.0), "East": (1.0, 0.0), "West": (-1.0, 0.0),
+    "Quadrant 1": (0.7071, 0.7071), "Quadrant 2": (-0.7071, 0.7071),
+    "Quadrant 3": (-0.7071, -0.7071), "Quadrant 4": (0.7071, -0.7071),
+}
+
+
+# ——— profiles ———
+def _bin_means(t, x, t0, t1, length):
+    """ Mean of x (N, C) in each of `length` equal bins of [t0, t1]; empty bins repeat the previous sample """
+    edges = np.linspace(t0, t1, length + 1)
+    lo = np.searchsorted(t, edges[:-1], side="left")
+    hi = np.searchsorted(t, edges[1:], side="left")
+    hi[-1] = np.searchsorted(t, t1, side="right")
+    c = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(x, axis=0)])
+    count = hi - lo
+    out = (c[hi] - c[lo]) / np.maximum(count, 1)[:, None]
+    empty = count == 0
+    out[empty] = x[np.clip(lo[empty] - 1, 0, len(x) - 1)]
+    return out
+
+
+def session_profile(session, length=PROFILE_LENGTH):
+    """ load_session dict -> ((length, FORCE_CHANNELS + 2) profile, seconds after calibration) """
+    if "force_t" not in session or "quadrant_t" not in session or not len(session["force_t"]) \
+            or not len(session["quadrant_t"]):
+        raise ValueError(f"{session['name']}: needs force_log.csv and quadrant_log.csv")
+    ft, force = session["force_t"], session["force"][:, :FORCE_CHANNELS]
+    if force.shape[1] < FORCE_CHANNELS:
+        force = np.hstack([force, np.zeros((len(force), FORCE_CHANNELS - force.shape[1]))])
+    active = np.flatnonzero(force.sum(axis=1) > CALIBRATION_THRESHOLD)
+    t0 = ft[active[0]] if len(active) else ft[0]
+    t1 = max(ft[-1], session["quadrant_t"][-1])
+    if t1 <= t0:
+        t1 = t0 + 1.0
+    xy = np.array([QUADRANT_XY.get(str(label), (0.0, 0.0)) for label in session["quadrant"]])
+    profile = np.hstack([_bin_means(ft, force, t0, t1, length) / FORCE_SCALE,
+                         _bin_means(session["quadrant_t"], xy, t0, t1, length)])
+    return profile, float(t1 - t0)
+
+
+def cached_profile(path, length=PROFILE_LENGTH, cache_dir=DEFAULT_CACHE):
+    """ session_profile of a session folder / archive through the on-disk cache -> (name, profile, duration) """
+    key = hashlib.sha1(f"dtw:{session_hash(path)}:{length}:v{PROFILE_VERSION}".encode()).hexdigest()
+    cache_path = os.path.join(cache_dir, key + ".npz") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            return session_name(path), cached["profile"], float(cached["duration"])
+    profile, duration = session_profile(load_session(path), length)
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = cache_path + ".tmp.npz"
+        np.savez(tmp, profile=profile, duration=duration)
+        os.replace(tmp, cache_path)
+    return session_name(path), profile, duration
+
+
+# ——— DTW with a Sakoe-Chiba band ———
+def _cost_band(a, b, radius):
+    """ Squared distances a[i] - b[j] for |i - j| <= radius as (n, 2 radius + 1), column j - i + radius """
+    pad = np.pad(b, ((radius, radius), (0, 0)), constant_values=np.nan)
+    windows = np.lib.stride_tricks.sliding_window_view(pad, 2 * radius + 1, axis=0)  # (n, C, 2r+1)
+    diff = a[:, :, None] - windows
+    band = np.einsum("ncw,ncw->nw", diff, diff)
+    band[np.isnan(band)] = np.inf
+    return band
+
+
+def dtw(a, b, radius, best=np.inf, return_path=False):
+    """
+    DTW between equal length profiles a, b (n, C), warping limited to |i - j| <= radius.
+    Returns (total cost, band of local costs, path (K, 2) or None); total is inf when the
+    alignment was abandoned because every path already costs more than `best`.
+
+    Row by row: D[i, j] = c[i, j] + min(D[i-1, j-1], D[i-1, j], D[i, j-1]). The horizontal term
+    is a running minimum, D[i, j] = S[j] + min_{k <= j} (m[k] - S[k-1]) with S the prefix sums
+    of c[i] and m the best of the row above, so a row is a handful of numpy calls.
+    """
+    n = len(a)
+    r = max(0, min(int(radius), n - 1))
+    band = _cost_band(a, b, r)
+    # column j - i + r of row i, one extra inf column for the "up" neighbour at the band edge
+    D = np.full((n, 2 * r + 2), np.inf)
+    for i in range(n):
+        lo, hi = max(0, i - r), min(n - 1, i + r)
+        c = band[i, lo - i + r:hi - i + r + 1]
+        if i == 0:
+            m = np.full(len(c), np.inf)
+            m[0] = 0.0
+        else:
+            m = np.minimum(D[i - 1, lo - i + r:hi - i + r + 1], D[i - 1, lo - i + r + 1:hi - i + r + 2])
+        S = np.cumsum(c)
+        row = S + np.minimum.accumulate(m - (S - c))
+        D[i, lo - i + r:hi - i + r + 1] = row
+        # every path crosses every row
+        if row.min() > best:
+            return np.inf, band, None
+    total = D[n - 1, r]
+    if not return_path:
+        return total, band, None
+
+    def at(i, j):
+        return D[i, j - i + r] if i >= 0 and 0 <= j - i + r <= 2 * r else np.inf
+
+    path = [(n - 1, n - 1)]
+    i = j = n - 1
+    while i > 0 or j > 0:
+        steps = ((i - 1, j - 1), (i - 1, j), (i, j - 1))
+        i, j = min(steps, key=lambda s: at(*s))
+        path.append((i, j))
+    return total, band, np.array(path[::-1])
+
+
+# ——— lower bounds ———
+def envelope(x, radius):
+    """ Upper / lower envelope of x (..., n, C) over +-radius steps """
+    pad = [(0, 0)] * (x.ndim - 2) + [(radius, radius), (0, 0)]
+    upper = np.lib.stride_tricks.sliding_window_view(np.pad(x, pad, constant_values=-np.inf), 2 * radius + 1, axis=-2)
+    lower = np.lib.stride_tricks.sliding_window_view(np.pad(x, pad, constant_values=np.inf), 2 * radius + 1, axis=-2)
+    return upper.max(axis=-1), lower.min(axis=-1)
+
+
+def lb_keogh(env, c):
+    """ LB_Keogh of candidates c (..., n, C) against the envelope of the other series """
+    upper, lower = env
+    above = np.maximum(c - upper, 0.0)
+    below = np.maximum(lower - c, 0.0)
+    return np.sum(above * above + below * below, axis=(-2, -1))
+
+
+def lower_bounds(reference, candidates, radius):
+    """ max(LB_Kim, LB_Keogh both ways) of the reference (n, C) vs every candidate (K, n, C) """
+    kim = np.sum((candidates[:, 0] - reference[0]) ** 2, axis=-1) + np.sum((candidates[:, -1] - reference[-1]) ** 2, axis=-1)
+    keogh_ref = lb_keogh(envelope(reference, radius), candidates)
+    keogh_cand = lb_keogh(envelope(candidates, radius), reference[None])
+    return np.maximum(kim, np.maximum(keogh_ref, keogh_cand))
+
+
+# ——— comparison ———
+def default_phases(duration):
+    return [("early", 0.0, duration / 3), ("middle", duration / 3, 2 * duration / 3), ("late", 2 * duration / 3, duration)]
+
+
+def phase_indices(phases, duration, length=PROFILE_LENGTH):
+    """ (name, start_s, end_s) in reference seconds -> (name, first bin, end bin) """
+    out = []
+    for name, start, end in phases:
+        a = int(np.clip(np.floor(start / duration * length), 0, length))
+        b = int(np.clip(np.ceil(end / duration * length), a, length))
+        out.append((name, a, b))
+    return out
+
+
+def compare(reference, candidate, radius, best=np.inf, phases=()):
+    """
+    Aligns one candidate profile to the reference. Returns None when abandoned (cost > best),
+    else cost (mean per step) and per phase: cost and the matched fraction of the candidate.
+    """
+    total, band, path = dtw(reference, candidate, radius, best, return_path=True)
+    if path is None:
+        return None
+    n = len(reference)
+    r = (band.shape[1] - 1) // 2
+    local = band[path[:, 0], path[:, 1] - path[:, 0] + r]
+    result = {"total": float(total), "cost": float(total / n), "phases": {}}
+    for name, a, b in phases:
+        on = (path[:, 0] >= a) & (path[:, 0] < b)
+        if not on.any():
+            continue
+        j = path[on, 1]
+        result["phases"][name] = {"cost": float(local[on].mean()),
+                                  "start": float(j.min() / n), "end": float((j.max() + 1) / n)}
+    return result
+
+
+def search(reference, candidates, band=0.1, top=5, workers=None, phases=None):
+    """
+    reference / candidates : (name, profile, duration) from cached_profile
+    top : keep the top best matches (lowest cost), 0 = align every candidate
+    Returns (matches sorted by cost, stats)
+    """
+    ref_name, ref_profile, ref_duration = reference
+    length = len(ref_profile)
+    radius = max(1, int(round(band * length)))
+    phase_bins = phase_indices(phases or default_phases(ref_duration), ref_duration, length)
+    candidates = [c for c in candidates if c[1].shape == ref_profile.shape]
+    stats = {"candidates": len(candidates), "aligned": 0, "pruned_lower_bound": 0, "abandoned": 0}
+    if not candidates:
+        return [], stats
+    bounds = lower_bounds(ref_profile, np.stack([c[1] for c in candidates]), radius)
+    order = list(np.argsort(bounds, kind="stable"))
+    matches = []
+
+    def threshold():
+        # total cost of the current top-th match; unlimited until top matches exist
+        if not top or len(matches) < top:
+            return np.inf
+        return sorted(m["total"] for m in matches)[top - 1]
+
+    def finish(k, result):
+        name, _, duration = candidates[k]
+        if result is None:
+            stats["abandoned"] += 1
+            return
+        stats["aligned"] += 1
+        for phase in result["phases"].values():
+            phase["start_s"] = round(phase.pop("start") * duration, 1)
+            phase["end_s"] = round(phase.pop("end") * duration, 1)
+        matches.append({"name": name, "lower_bound": float(bounds[k] / length), "duration_s": round(duration, 1),
+                        "duration_ratio": round(duration / ref_duration, 3), **result})
+
+    if workers == 1:
+        for k in order:
+            if bounds[k] > threshold():
+                stats["pruned_lower_bound"] += 1
+                continue
+            finish(k, compare(ref_profile, candidates[k][1], radius, threshold(), phase_bins))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            width = pool._max_workers
+            pending = {}
+            while order or pending:
+                # candidates go out in lower bound order; once one is too far, so are the rest
+                while order and len(pending) < width:
+                    k = order.pop(0)
+                    if bounds[k] > threshold():
+                        stats["pruned_lower_bound"] += 1 + len(order)
+                        order = []
+                        break
+                    future = pool.submit(compare, ref_profile, candidates[k][1], radius, threshold(), phase_bins)
+                    pending[future] = k
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(pending.pop(future), future.result())
+    matches.sort(key=lambda m: m["total"])
+    if top:
+        matches = matches[:top]
+    for m in matches:
+        m.pop("total")
+    return matches, stats
+
+
+def parse_phase(spec):
+    """ name=start:end (reference seconds after calibration) """
+    name, _, span = spec.partition("=")
+    start, _, end = span.partition(":")
+    if not name or not end:
+        raise argparse.ArgumentTypeError(f"phase must look like name=start:end, got {spec!r}")
+    return name, float(start), float(end)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank sessions by DTW distance to a reference session")
+    parser.add_argument("reference", help="reference session folder or .aeep archive (e.g. an expert)")
+    parser.add_argument("sessions", nargs="+", help="session folders / archives to compare (the reference is skipped)")
+    parser.add_argument("--top", type=int, default=5, help="best matches to return, 0 = align every session")
+    parser.add_argument("--band", type=float, default=0.1, help="Sakoe-Chiba band as a fraction of the profile length")
+    parser.add_argument("--length", type=int, default=PROFILE_LENGTH, help="time bins per profile")
+    parser.add_argument("--phase", action="append", type=parse_phase, default=[],
+                        help="name=start:end in reference seconds after calibration (default: thirds)")
+    parser.add_argument("--auto-phases", action="store_true", help="phases of the reference found by phase_segment.py")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores, 1 = no pool)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE, help="'' disables the profile cache")
+    parser.add_argument("--out", help="write the matches as json")
+    args = parser.parse_args()
+
+    reference_path = os.path.normpath(args.reference)
+    paths = [p for p in dict.fromkeys(os.path.normpath(p) for p in args.sessions) if p != reference_path]
+    reference = cached_profile(reference_path, args.length, args.cache_dir)
+    candidates = []
+    for path in paths:
+        try:
+            candidates.append(cached_profile(path, args.length, args.cache_dir))
+        except (ValueError, KeyError, OSError) as e:
+            print(f"skipping {path}: {e}")
+
+    if args.auto_phases:
+        from phase_segment import phase_windows
+        args.phase = phase_windows(load_session(reference_path))
+    matches, stats = search(reference, candidates, args.band, args.top, args.workers, args.phase)
+    print(f"reference {reference[0]} ({reference[2]:.0f} s after calibration), band +-{args.band:.0%}, "
+          f"{stats['candidates']} candidates: {stats['aligned']} aligned, "
+          f"{stats['pruned_lower_bound']} pruned by lower bound, {stats['abandoned']} abandoned early")
+    phase_names = list(dict.fromkeys(p for m in matches for p in m["phases"]))
+    print(f"{'session':<12}{'cost':>8}{'duration':>10}" + "".join(f"{p:>12}" for p in phase_names))
+    for m in matches:
+        print(f"{m['name']:<12}{m['cost']:>8.3f}{m['duration_s']:>9.0f}s"
+              + "".join(f"{m['phases'][p]['cost']:>12.3f}" if p in m["phases"] else f"{'-':>12}" for p in phase_names))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"reference": reference[0], "band": args.band, "length": args.length, "stats": stats,
+                       "matches": matches}, f, indent=2)
@@ -0,0 +1,259 @@
+# skill_features.py - per-window features for expert vs student sessions + a small classifier
+#
+# Features per time window (window_s long, every hop_s):
+#   force  - per-channel mean/std/max, total force mean/std/max, fraction of active channels, over the
+#            first FORCE_CHANNELS channels only (the rigs differ in a 15th channel, not in skill)
+#   flex   - N/S/E/W mean and std
+#   quadrant - transition rate, dwell entropy, mean dwell time, fraction of time in Center
+#   imu (when the session has one) - gyro/accel magnitude mean and std
+#
+# Features are cached on disk per (session content hash, window, hop), so re-running with new
+# windows or new sessions only computes what is missing. The classifier is L2 regularized
+# logistic regression in NumPy, evaluated leave-one-session-out (windows from the held out
+# session are never in the training set). Labels come from folder names: EA* = expert,
+# ES* = student.
+#
+#   python master/analysis/skill_features.py bootcamp_data/EA* bootcamp_data/ES* --window 30 --hop 10
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from session_archive import load_session, session_hash, session_name
+
+FEATURE_VERSION = 2
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "feature_cache")
+CALIBRATION_THRESHOLD = 1.0  # same rule as force_process.py: data starts at the first total force > 1
+FORCE_CHANNELS = 14  # every rig has these; EA1-3 / ES* log a 15th, which would only tell the rigs apart
+
+
+def skill_label(name):
+    """ 1 = expert (EA*), 0 = student (ES*), None = unknown """
+    if name.upper().startswith("EA"):
+        return 1
+    if name.upper().startswith("ES"):
+        return 0
+    return None
+
+
+def _window_bounds(t, starts, window_s):
+    return np.searchsorted(t, starts, side="left"), np.searchsorted(t, starts + window_s, side="left")
+
+
+def _windowed_mean_std(x, a, b):
+    """ Mean and std of x[a:b] for every window via cumulative sums, x is (N, C) """
+    c1 = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(x, axis=0)])
+    c2 = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(x * x, axis=0)])
+    n = np.maximum(b - a, 1)[:, None]
+    mean = (c1[b] - c1[a]) / n
+    var = np.maximum((c2[b] - c2[a]) / n - mean ** 2, 0.0)
+    return mean, np.sqrt(var)
+
+
+def _windowed_max(x, a, b):
+    out = np.zeros((len(a), x.shape[1]))
+    for i, (lo, hi) in enumerate(zip(a, b)):
+        if hi > lo:
+            out[i] = x[lo:hi].max(axis=0)
+    return out
+
+
+def _quadrant_features(t, labels, a, b):
+    """ transition rate (1/s), dwell entropy (bits), mean dwell (s), fraction in Center """
+    out = np.zeros((len(a), 4))
+    if len(t) == 0:
+        return out
+    dt = np.diff(t, append=t[-1] + (np.median(np.diff(t)) if len(t) > 1 else 0.5))
+    _, codes = np.unique(labels, return_inverse=True)
+    changes = np.concatenate(([False], codes[1:] != codes[:-1]))
+    center = labels == "Center"
+    for i, (lo, hi) in enumerate(zip(a, b)):
+        if hi - lo < 2:
+            continue
+        span = t[hi - 1] - t[lo] + dt[hi - 1]
+        n_changes = int(changes[lo + 1:hi].sum())
+        dwell = np.bincount(codes[lo:hi], weights=dt[lo:hi])
+        p = dwell[dwell > 0] / dwell.sum()
+        out[i] = (n_changes / span, float(-(p * np.log2(p)).sum()), span / (n_changes + 1), dt[lo:hi][center[lo:hi]].sum() / span)
+    return out
+
+
+def feature_names(force_width, has_imu):
+    names = []
+    for stat in ("mean", "std", "max"):
+        names += [f"force_{i + 1}_{stat}" for i in range(force_width)]
+    names += ["total_force_mean", "total_force_std", "total_force_max", "active_channels"]
+    names += [f"{d}_{stat}" for stat in ("mean", "std") for d in "NSEW"]
+    names += ["quadrant_transition_rate", "quadrant_dwell_entropy", "quadrant_mean_dwell_s", "center_fraction"]
+    if has_imu:
+        names += ["gyro_mag_mean", "gyro_mag_std", "accel_mag_mean", "accel_mag_std"]
+    return names
+
+
+def extract_features(session, window_s=30.0, hop_s=10.0):
+    """ -> (window start times (W,), feature matrix (W, F), feature names) """
+    if "force_t" not in session or "quadrant_t" not in session:
+        raise ValueError(f"{session['name']}: needs both force_log and quadrant_log")
+    force_t, force = session["force_t"], session["force"][:, :FORCE_CHANNELS]
+    if force.shape[1] < FORCE_CHANNELS:
+        force = np.hstack([force, np.zeros((len(force), FORCE_CHANNELS - force.shape[1]))])
+    total = force.sum(axis=1)
+    active = np.flatnonzero(total > CALIBRATION_THRESHOLD)
+    t_start = force_t[active[0]] if len(active) else force_t[0]
+    t_end = max(force_t[-1], session["quadrant_t"][-1] if len(session["quadrant_t"]) else force_t[-1])
+    starts = np.arange(t_start, max(t_start, t_end - window_s) + 1e-9, hop_s)
+    has_imu = session.get("imu") is not None
+
+    a, b = _window_bounds(force_t, starts, window_s)
+    f_mean, f_std = _windowed_mean_std(force, a, b)
+    f_max = _windowed_max(force, a, b)
+    tot_mean, tot_std = _windowed_mean_std(total[:, None], a, b)
+    tot_max = _windowed_max(total[:, None], a, b)
+    act_mean, _ = _windowed_mean_std((force > 0).mean(axis=1, keepdims=True), a, b)
+    parts = [f_mean, f_std, f_max, tot_mean, tot_std, tot_max, act_mean]
+
+    qa, qb = _window_bounds(session["quadrant_t"], starts, window_s)
+    nsew_mean, nsew_std = _windowed_mean_std(session["nsew"], qa, qb)
+    parts += [nsew_mean, nsew_std, _quadrant_features(session["quadrant_t"], session["quadrant"], qa, qb)]
+
+    if has_imu:
+        ia, ib = _window_bounds(session["imu_t"], starts, window_s)
+        mags = np.column_stack([np.linalg.norm(session["imu"][:, 3:6], axis=1), np.linalg.norm(session["imu"][:, 0:3], axis=1)])
+        m_mean, m_std = _windowed_mean_std(mags, ia, ib)
+        parts += [m_mean[:, :1], m_std[:, :1], m_mean[:, 1:], m_std[:, 1:]]
+
+    return starts, np.hstack(parts), feature_names(FORCE_CHANNELS, has_imu)
+
+
+# ——— cache ———
+def cache_key(content_hash, window_s, hop_s):
+    return hashlib.sha1(f"{content_hash}:{window_s}:{hop_s}:v{FEATURE_VERSION}".encode()).hexdigest()
+
+
+def session_features(path, window_s=30.0, hop_s=10.0, cache_dir=DEFAULT_CACHE):
+    """ Cached extract_features for a session folder / archive; returns (starts, X, names, from_cache) """
+    key = cache_key(session_hash(path), window_s, hop_s)
+    cache_path = os.path.join(cache_dir, key + ".npz") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            return cached["starts"], cached["X"], [str(n) for n in cached["names"]], True
+    starts, X, names = extract_features(load_session(path), window_s, hop_s)
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = cache_path + ".tmp.npz"
+        np.savez_compressed(tmp, starts=starts, X=X, names=np.array(names))
+        os.replace(tmp, cache_path)
+    return starts, X, names, False
+
+
+# ——— classifier ———
+class SkillClassifier:
+    """ Standardized L2 logistic regression fitted with plain gradient descent """
+
+    def __init__(self, l2=1.0, lr=0.1, iters=2000):
+        self.l2 = l2
+        self.lr = lr
+        self.iters = iters
+
+    def fit(self, X, y):
+        self.mu = X.mean(axis=0)
+        self.sigma = X.std(axis=0)
+        self.sigma[self.sigma == 0] = 1.0
+        Z = (X - self.mu) / self.sigma
+        n, d = Z.shape
+        self.w = np.zeros(d)
+        self.b = 0.0
+        # balance classes so the larger cohort doesn't dominate
+        weights = np.where(y == 1, 0.5 / max(y.mean(), 1e-9), 0.5 / max(1 - y.mean(), 1e-9)) / n
+        for _ in range(self.iters):
+            p = self._sigmoid(Z @ self.w + self.b)
+            g = weights * (p - y)
+            self.w -= self.lr * (Z.T @ g + self.l2 * self.w / n)
+            self.b -= self.lr * g.sum()
+        return self
+
+    @staticmethod
+    def _sigmoid(z):
+        return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+    def predict_proba(self, X):
+        """ Probability of expert per window """
+        return self._sigmoid(((X - self.mu) / self.sigma) @ self.w + self.b)
+
+    def to_dict(self, names):
+        return {"names": names, "mu": self.mu.tolist(), "sigma": self.sigma.tolist(), "w": self.w.tolist(), "b": self.b}
+
+    @classmethod
+    def from_dict(cls, d):
+        model = cls()
+        model.mu, model.sigma, model.w, model.b = np.array(d["mu"]), np.array(d["sigma"]), np.array(d["w"]), d["b"]
+        return model
+
+
+def _align(features):
+    """ Drop feature columns not shared by every session (e.g. imu only in some) """
+    common = set(features[0][1])
+    for _, names in features[1:]:
+        common &= set(names)
+    names = [n for n in features[0][1] if n in common]
+    return [X[:, [fn.index(n) for n in names]] for X, fn in features], names
+
+
+def leave_one_session_out(sessions, **model_args):
+    """
+    sessions: list of (name, X, label). Returns (name, label, mean P(expert), window accuracy)
+    per session. Everything with the held out name is left out (a folder and its archive)
+    """
+    results = []
+    for name, X, label in sessions:
+        train = [s for s in sessions if s[0] != name]
+        X_train = np.vstack([s[1] for s in train])
+        y_train = np.concatenate([np.full(len(s[1]), s[2]) for s in train])
+        if len(np.unique(y_train)) < 2 or len(X) == 0:
+            continue
+        p = SkillClassifier(**model_args).fit(X_train, y_train).predict_proba(X)
+        results.append((name, label, float(p.mean()), float(((p > 0.5) == label).mean())))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Windowed session features and an expert/student classifier")
+    parser.add_argument("sessions", nargs="+", help="session folders or .aeep archives (EA*/ES* names give labels)")
+    parser.add_argument("--window", type=float, default=30.0, help="window length in seconds")
+    parser.add_argument("--hop", type=float, default=10.0, help="seconds between window starts")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE)
+    parser.add_argument("--l2", type=float, default=1.0)
+    parser.add_argument("--save-model", help="fit on every labelled session and save the model json here")
+    args = parser.parse_args()
+
+    features, labelled = [], []
+    for path in args.sessions:
+        name = session_name(path)
+        try:
+            starts, X, names, cached = session_features(path, args.window, args.hop, args.cache_dir)
+        except ValueError as e:
+            print(f"Skipping {e}")
+            continue
+        print(f"{name}: {len(X)} windows{' (cached)' if cached else ''}")
+        features.append((X, names))
+        labelled.append((name, skill_label(name)))
+    matrices, names = _align(features)
+    sessions = [(name, X, label) for (name, label), X in zip(labelled, matrices) if label is not None]
+
+    results = leave_one_session_out(sessions, l2=args.l2)
+    if results:
+        print(f"\n{'session':<10}{'label':>8}{'P(expert)':>12}{'window acc':>12}")
+        for name, label, p, acc in results:
+            print(f"{name:<10}{'expert' if label else 'student':>8}{p:>12.2f}{acc:>12.2f}")
+        session_acc = np.mean([(p > 0.5) == label for _, label, p, _ in results])
+        print(f"leave-one-session-out session accuracy: {session_acc:.2f}")
+
+    if args.save_model:
+        X_all = np.vstack([s[1] for s in sessions])
+        y_all = np.concatenate([np.full(len(s[1]), s[2]) for s in sessions])
+        model = SkillClassifier(l2=args.l2).fit(X_all, y_all)
+        with open(args.save_model, "w") as f:
+            json.dump({"window": args.window, "hop": args.hop, **model.to_dict(names)}, f, indent=2)
+        print(f"Model saved to {args.save_model}")
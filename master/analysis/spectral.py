@@ -0,0 +1,302 @@
+# spectral.py - tremor / oscillation band power per channel, live (sliding DFT) and over recorded sessions
+#
+# Hand tremor and instrument oscillation show up as power in the 4-12 Hz band of the gyro
+# (Gyro_X-Z) and of the flex N/S/E/W channels. SlidingSpectrum keeps only the DFT bins of the
+# band (plus one on each side for the Hann window) over the last `window` samples and moves
+# every bin with one complex multiply-add per sample - a sliding DFT, the recursive form of a
+# Goertzel bank:
+#     X_k <- (X_k + x_new - x_old) * exp(2j pi k / N)
+# so a hop costs O(hop x bins) instead of a window FFT. The Hann window is applied in the
+# frequency domain (0.5 X_k - 0.25 (X_k-1 + X_k+1)), and the bins are recomputed exactly once
+# per window so rounding can't build up. band_power() gives the same numbers for a whole
+# recording at once (strided windows + rfft).
+#
+# Power is in signal units squared ((deg/s)^2 for the gyro): the variance the band contributes
+# to the window. ratio = band power / window variance, the share of the movement that is tremor.
+#
+# A band can only be seen below half the sample rate. The IMU sketch sends about 10 Hz, the flex
+# sketch about 1 Hz and the session logs are written at 2 Hz, so with today's firmware the
+# band is clipped to the part below Nyquist and reported as not observable when nothing is
+# left. Raise the sketches' rates to see tremor; slower oscillation (--band 0.2:0.9) can be
+# measured in the existing logs with a longer window.
+#
+#   python master/analysis/spectral.py trial1_imu.csv                        (Gyro_X-Z, 4-12 Hz)
+#   python master/analysis/spectral.py bootcamp_data/E* --source flex --band 0.2:0.9 --window 10
+#   force_main --tremor, "tremor": true in a station.py config               (live, tremor_log.csv)
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from session_archive import load_session
+
+TREMOR_BAND = (4.0, 12.0)  # Hz
+WINDOW_S = 2.0             # 0.5 Hz resolution
+HOP_S = 0.5
+RATIO_THRESHOLD = 0.5      # windows where the band carries more than this share of the variance are "dominant"
+GAP_FACTOR = 5.0           # live: a pause longer than this many sample periods restarts the window
+TREMOR_HEADER = ["timestamp", "device", "channel", "band_power", "ratio"]
+SOURCES = {
+    # name: (time key, values key, column slice, channel names)
+    "imu": ("imu_t", "imu", slice(3, 6), ["Gyro_X", "Gyro_Y", "Gyro_Z"]),
+    "flex": ("quadrant_t", "nsew", slice(0, 4), ["N", "S", "E", "W"]),
+    "force": ("force_t", "force", slice(0, 14), [f"sensor A{i}" for i in range(14)]),
+}
+
+
+def band_bins(fs, n, band):
+    """ Bins k of an n-sample DFT whose frequency k fs / n lies in band, without DC and Nyquist """
+    k = np.arange(1, (n + 1) // 2)
+    f = k * fs / n
+    slack = 0.01 * fs / n  # a rate measured from timestamps is never exact
+    return k[(f >= band[0] - slack) & (f <= band[1] + slack)]
+
+
+def window_samples(fs, window_s=WINDOW_S, hop_s=HOP_S):
+    return max(4, int(round(window_s * fs))), max(1, int(round(hop_s * fs)))
+
+
+def describe_band(fs, n, band):
+    """ What part of band a window of n samples at fs actually measures, for reports """
+    bins = band_bins(fs, n, band)
+    if not len(bins):
+        return f"{band[0]:g}-{band[1]:g} Hz not observable at {fs:.3g} Hz (Nyquist {fs / 2:.3g} Hz)"
+    lo, hi = bins[0] * fs / n, bins[-1] * fs / n
+    clipped = " (clipped at Nyquist)" if hi + fs / n <= band[1] and hi + fs / n >= fs / 2 else ""
+    return f"{lo:.3g}-{hi:.3g} Hz{clipped}"
+
+
+class SlidingSpectrum:
+    """
+    Hann windowed DFT bins `bins` of the last n samples of every channel, one push() per sample.
+    full() once n samples went in.
+    """
+
+    def __init__(self, n, bins, channels):
+        self.n = n
+        self.k = np.arange(bins[0] - 1, bins[-1] + 2)  # + neighbours for the Hann window
+        self.twiddle = np.exp(2j * np.pi * self.k / n)
+        self.basis = np.exp(-2j * np.pi * np.outer(np.arange(n), self.k) / n)  # (n, K), for refresh
+        self.norm = 2.0 / (n * (3.0 * n / 8.0))  # one-sided, / sum of the (periodic) Hann window squared
+        self.reset(channels)
+
+    def reset(self, channels=None):
+        channels = channels if channels is not None else self.X.shape[0]
+        self.X = np.zeros((channels, len(self.k)), dtype=complex)
+        self.buf = np.zeros((self.n, channels))
+        self.pos = 0
+        self.count = 0
+        self.s1 = np.zeros(channels)
+        self.s2 = np.zeros(channels)
+
+    def push(self, x):
+        old = self.buf[self.pos].copy()
+        self.buf[self.pos] = x
+        self.pos = (self.pos + 1) % self.n
+        self.count += 1
+        self.X = (self.X + (x - old)[:, None]) * self.twiddle
+        self.s1 += x - old
+        self.s2 += x * x - old * old
+        if self.pos == 0:
+            self._refresh()
+
+    def _refresh(self):
+        """ Exact bins and sums from the window (oldest sample at self.pos) """
+        window = np.roll(self.buf, -self.pos, axis=0)
+        self.X = window.T @ self.basis
+        self.s1 = window.sum(axis=0)
+        self.s2 = (window * window).sum(axis=0)
+
+    def full(self):
+        return self.count >= self.n
+
+    def band_power(self):
+        hann = 0.5 * self.X[:, 1:-1] - 0.25 * (self.X[:, :-2] + self.X[:, 2:])
+        return self.norm * (hann.real ** 2 + hann.imag ** 2).sum(axis=1)
+
+    def variance(self):
+        return np.maximum(self.s2 / self.n - (self.s1 / self.n) ** 2, 0.0)
+
+
+class TremorMonitor:
+    """
+    Live band power of one reader's channels: append monitor.tap to the reader's taps. Every hop
+    it sets <prefix>.<channel> gauges and calls on_power(timestamp, power, ratio).
+
+    columns : which of the tapped values to use (e.g. [3, 4, 5] = the IMU's gyro)
+    fs : sample rate, None = measured from the first rate_samples samples
+    """
+
+    def __init__(self, channels, columns=None, band=TREMOR_BAND, window_s=WINDOW_S, hop_s=HOP_S, fs=None,
+                 on_power=None, metrics=None, prefix="tremor", rate_samples=20):
+        self.channels = list(channels)
+        self.columns = columns
+        self.band = band
+        self.window_s = window_s
+        self.hop_s = hop_s
+        self.on_power = on_power
+        self.metrics = metrics
+        self.prefix = prefix
+        self.rate_samples = rate_samples
+        self.fs = None
+        self.spectrum = None
+        self.hop = None
+        self.last_t = None
+        self._pending = []
+        if fs:
+            self._setup(fs)
+
+    def _setup(self, fs):
+        self.fs = fs
+        n, self.hop = window_samples(fs, self.window_s, self.hop_s)
+        bins = band_bins(fs, n, self.band)
+        if len(bins):
+            self.spectrum = SlidingSpectrum(n, bins, len(self.channels))
+        if self.metrics is not None:
+            self.metrics.gauge(self.prefix + ".band", describe_band(fs, n, self.band))
+
+    def tap(self, timestamp, values):
+        values = np.asarray(values, dtype=float)
+        if self.columns is not None:
+            values = values[self.columns]
+        if self.fs is None:
+            self._pending.append((timestamp, values))
+            if len(self._pending) < self.rate_samples:
+                return
+            dt = np.diff([t for t, _ in self._pending])
+            dt = dt[dt > 0]
+            self._setup(1.0 / np.median(dt) if len(dt) else 1.0)
+            pending, self._pending = self._pending, []
+            for t, v in pending:
+                self._push(t, v)
+            return
+        self._push(timestamp, values)
+
+    def _push(self, timestamp, values):
+        spectrum = self.spectrum
+        if spectrum is None:
+            return
+        if self.last_t is not None and timestamp - self.last_t > GAP_FACTOR / self.fs:
+            spectrum.reset()
+        self.last_t = timestamp
+        spectrum.push(values)
+        if spectrum.full() and (spectrum.count - spectrum.n) % self.hop == 0:
+            power = spectrum.band_power()
+            variance = spectrum.variance()
+            ratio = np.divide(power, variance, out=np.zeros_like(power), where=variance > 0)
+            if self.metrics is not None:
+                for name, p in zip(self.channels, power):
+                    self.metrics.gauge(f"{self.prefix}.{name}", round(float(p), 4))
+            if self.on_power is not None:
+                self.on_power(timestamp, power, ratio)
+
+
+def uniform(t, x, fs=None):
+    """ Samples at times t (jittery serial timing) linearly interpolated onto a grid at fs (default: median rate) """
+    dt = np.diff(t)
+    dt = dt[dt > 0]
+    fs = fs or (1.0 / np.median(dt) if len(dt) else 1.0)
+    grid = t[0] + np.arange(int(np.floor((t[-1] - t[0]) * fs)) + 1) / fs
+    return grid, np.column_stack([np.interp(grid, t, x[:, c]) for c in range(x.shape[1])]), fs
+
+
+def band_power(t, x, band=TREMOR_BAND, window_s=WINDOW_S, hop_s=HOP_S, fs=None):
+    """
+    Band power per window for a whole recording (the same windows TremorMonitor reports).
+    Returns dict: fs, band (describe_band), t (window end times), power / ratio (W, C)
+    """
+    grid, xu, fs = uniform(np.asarray(t, dtype=float), np.asarray(x, dtype=float), fs)
+    n, hop = window_samples(fs, window_s, hop_s)
+    bins = band_bins(fs, n, band)
+    out = {"fs": fs, "band": describe_band(fs, n, band), "t": np.zeros(0),
+           "power": np.zeros((0, x.shape[1])), "ratio": np.zeros((0, x.shape[1]))}
+    if len(xu) < n or not len(bins):
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(xu, n, axis=0)[::hop]  # (W, C, n)
+    hann = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n) / n)
+    spec = np.fft.rfft(windows * hann, axis=-1)[..., bins]
+    power = 2.0 / (n * (hann * hann).sum()) * (spec.real ** 2 + spec.imag ** 2).sum(axis=-1)
+    variance = windows.var(axis=-1)
+    out["t"] = grid[n - 1::hop][:len(windows)]
+    out["power"] = power
+    out["ratio"] = np.divide(power, variance, out=np.zeros_like(power), where=variance > 0)
+    return out
+
+
+def load_imu_csv(path):
+    """ Standalone IMU csv (Timestamp, Accel_X..Mag_Z) -> (t, (N, 9)) like load_session's imu_t / imu """
+    columns = ["Accel_X", "Accel_Y", "Accel_Z", "Gyro_X", "Gyro_Y", "Gyro_Z", "Mag_X", "Mag_Y", "Mag_Z"]
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or "Timestamp" not in reader.fieldnames:
+            raise ValueError(f"{path}: not an IMU csv (no Timestamp column)")
+        rows = [[float(row["Timestamp"])] + [float(row[c]) for c in columns] for row in reader]
+    data = np.array(rows).reshape(-1, 10)
+    return data[:, 0], data[:, 1:]
+
+
+def session_sources(path, sources):
+    """ (name, source, t, x, channel names) for every requested stream the session has """
+    if path.endswith(".csv"):
+        t, imu = load_imu_csv(path)
+        session = {"name": os.path.basename(path), "imu_t": t, "imu": imu}
+    else:
+        session = load_session(path)
+    streams = []
+    for source in sources:
+        t_key, x_key, columns, names = SOURCES[source]
+        t, x = session.get(t_key), session.get(x_key)
+        if t is None or x is None or len(t) < 2:
+            continue
+        x = x[:, columns]
+        streams.append((session["name"], source, t, x, names[:x.shape[1]]))
+    return streams
+
+
+def parse_band(spec):
+    lo, _, hi = spec.partition(":")
+    try:
+        return float(lo), float(hi)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"band must look like lo:hi in Hz, got {spec!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tremor / oscillation band power per channel of recorded sessions")
+    parser.add_argument("sessions", nargs="+", help="session folders, .aeep archives or IMU csvs")
+    parser.add_argument("--source", action="append", choices=list(SOURCES),
+                        help="streams to analyse (default: imu and flex)")
+    parser.add_argument("--band", type=parse_band, default=TREMOR_BAND, help="lo:hi in Hz (default 4:12)")
+    parser.add_argument("--window", type=float, default=WINDOW_S, help="window length in seconds")
+    parser.add_argument("--hop", type=float, default=HOP_S, help="seconds between windows")
+    parser.add_argument("--out", help="write every window as csv rows (session, source, channel, time, power, ratio)")
+    args = parser.parse_args()
+
+    rows = []
+    for path in args.sessions:
+        try:
+            streams = session_sources(path, args.source or ["imu", "flex"])
+        except (ValueError, KeyError, OSError) as e:
+            print(f"skipping {path}: {e}")
+            continue
+        if not streams:
+            print(f"skipping {path}: no {' / '.join(args.source or ['imu', 'flex'])} data")
+        for name, source, t, x, channels in streams:
+            result = band_power(t, x, args.band, args.window, args.hop)
+            print(f"{name} {source}: {result['fs']:.3g} Hz, band {result['band']}, {len(result['t'])} windows")
+            if not len(result["t"]):
+                continue
+            print(f"  {'channel':<12}{'median':>10}{'p95':>10}{'dominant %':>12}")
+            for c, channel in enumerate(channels):
+                p = result["power"][:, c]
+                share = 100.0 * np.mean(result["ratio"][:, c] > RATIO_THRESHOLD)
+                print(f"  {channel:<12}{np.median(p):>10.4g}{np.percentile(p, 95):>10.4g}{share:>12.1f}")
+                rows += [[name, source, channel, ts, pw, r]
+                         for ts, pw, r in zip(result["t"], p, result["ratio"][:, c])]
+    if args.out:
+        with open(args.out, "w", newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["session", "source", "channel", "time", "band_power", "ratio"])
+            writer.writerows(rows)
+        print(f"wrote {len(rows)} windows to {args.out}")
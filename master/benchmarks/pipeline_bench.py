@@ -0,0 +1,273 @@
+# pipeline_bench.py - times every stage of the sensing pipeline (line -> quadrant/log row)
+# and compares the numbers against a saved baseline so slowdowns get caught.
+#
+# run from the repo root:
+#   python master/benchmarks/pipeline_bench.py                      (recorded EA6 session)
+#   python master/benchmarks/pipeline_bench.py --synthetic -n 5000  (random streams)
+#   python master/benchmarks/pipeline_bench.py --save-baseline      (overwrite baseline.json)
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MASTER = os.path.dirname(HERE)
+REPO = os.path.dirname(MASTER)
+sys.path.append(os.path.join(MASTER, "force_sensing"))
+sys.path.append(os.path.join(MASTER, "imu"))
+
+import force_reader_threading
+import conductive_reader_threading
+from quadrant_detection import determine_quadrant
+from force_analysis import force_analysis
+from dof9_filter import MadgwickFilter
+from serial_framing import FrameDecoder, encode_frame, SHEET_FRAME
+
+DEFAULT_SESSION = os.path.join(REPO, "bootcamp_data", "EA6")
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+WARMUP = 50
+
+
+# ——— input streams ———
+def flex_line(n, s, e, w):
+    """ Same layout the Flex_Arduino sketch prints (N, E, S, W order) """
+    return f"North:{n:.2f} East:{e:.2f} South:{s:.2f} West:{w:.2f} "
+
+
+def sheet_line(values):
+    """ Same layout the 15SensorControl sketch prints """
+    return "   ".join(f"Rel{i}: {v:.1f}" for i, v in enumerate(values)) + "   "
+
+
+def recorded_streams(session_dir, n):
+    """ Rebuild raw serial lines from a session's quadrant_log.csv and force_log.csv """
+    angles = []
+    with open(os.path.join(session_dir, "quadrant_log.csv"), newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            # rows are timestamp, quadrant, N, S, E, W (the header has an extra bend_angle column)
+            angles.append([float(v) for v in row[-4:]])
+    sheets = []
+    with open(os.path.join(session_dir, "force_log.csv"), newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            values = [float(v) for v in row[1:]]
+            sheets.append(values + [0.0] * (15 - len(values)))
+    angles = np.array(angles)
+    sheets = np.array(sheets)
+    # repeat the session until we have n samples
+    angles = np.resize(angles, (n, 4))
+    sheets = np.resize(sheets, (n, 15))
+    return angles, sheets
+
+
+def synthetic_streams(n, seed=0):
+    rng = np.random.default_rng(seed)
+    angles = np.clip(rng.normal(20, 40, size=(n, 4)), 0, None)
+    sheets = np.clip(rng.normal(5, 10, size=(n, 15)), 0, None)
+    return angles, sheets
+
+
+def synthetic_imu(n, seed=0, rate=100.0):
+    """ (N, 10) rows of Timestamp, Accel_X-Z, Gyro_X-Z, Mag_X-Z like the IMU csv exports """
+    rng = np.random.default_rng(seed)
+    data = np.zeros((n, 10))
+    data[:, 0] = 1.0 / rate
+    data[:, 1:4] = [0.0, 0.0, 9.81] + rng.normal(0, 0.2, size=(n, 3))
+    data[:, 4:7] = rng.normal(0, 0.05, size=(n, 3))
+    data[:, 7:10] = [20.0, -5.0, 40.0] + rng.normal(0, 1.0, size=(n, 3))
+    return data
+
+
+def load_imu_csv(path, n):
+    cols = ['Timestamp', 'Accel_X', 'Accel_Y', 'Accel_Z', 'Gyro_X', 'Gyro_Y', 'Gyro_Z', 'Mag_X', 'Mag_Y', 'Mag_Z']
+    with open(path, newline='') as f:
+        rows = [[float(row[c]) for c in cols] for row in csv.DictReader(f)]
+    data = np.array(rows)
+    # timestamps -> per-sample dt, which is what compute_position expects in column 0
+    data[1:, 0] = np.diff(data[:, 0])
+    data[0, 0] = data[1:, 0].mean() if len(data) > 1 else 0.01
+    return np.resize(data, (n, 10))
+
+
+# ——— timing ———
+def time_stage(fn, inputs):
+    """ Calls fn once per input and returns per-call latencies in nanoseconds """
+    for item in inputs[:WARMUP]:
+        fn(item)
+    latencies = np.empty(len(inputs), dtype=np.int64)
+    clock = time.perf_counter_ns
+    for i, item in enumerate(inputs):
+        t0 = clock()
+        fn(item)
+        latencies[i] = clock() - t0
+    return latencies
+
+
+def summarize(latencies):
+    total_s = latencies.sum() / 1e9
+    return {
+        "n": int(len(latencies)),
+        "throughput_per_s": float(len(latencies) / total_s) if total_s > 0 else float("inf"),
+        "mean_us": float(latencies.mean() / 1e3),
+        "p50_us": float(np.percentile(latencies, 50) / 1e3),
+        "p99_us": float(np.percentile(latencies, 99) / 1e3),
+    }
+
+
+def run_benchmarks(angles, sheets, imu, log_dir):
+    flex_lines = [flex_line(*row) for row in angles]
+    sheet_lines = [sheet_line(row) for row in sheets]
+    angle_tuples = [tuple(row) for row in angles.tolist()]
+    results = {}
+
+    results["parse_flex"] = time_stage(force_reader_threading.parse, flex_lines)
+    results["parse_sheet"] = time_stage(conductive_reader_threading.parse, sheet_lines)
+    # same sheet samples sent as binary frames (BINARY_PROTOCOL 1 in the sketch)
+    sheet_frames = [encode_frame(SHEET_FRAME, i, row) for i, row in enumerate(sheets)]
+    results["decode_sheet_frame"] = time_stage(FrameDecoder().feed, sheet_frames)
+    results["determine_quadrant"] = time_stage(lambda a: determine_quadrant(*a), angle_tuples)
+    results["force_analysis"] = time_stage(lambda a: force_analysis(*a), angle_tuples)
+
+    madgwick = MadgwickFilter(sample_period=imu[0, 0], beta=0.1)
+    imu_rows = [(row[4:7], row[1:4], row[7:10]) for row in imu]
+    results["madgwick_update"] = time_stage(lambda r: madgwick.update(*r), imu_rows)
+
+    try:
+        from ekf import OrientationBiasEKF
+    except ImportError as e:
+        print(f"[bench] skipping EKF stages: {e}")
+    else:
+        orient_ekf = OrientationBiasEKF()
+        results["ekf_predict"] = time_stage(lambda r: orient_ekf.predict(r[4:7], r[0]), list(imu))
+        results["ekf_update"] = time_stage(lambda r: orient_ekf.update(r[1:4], r[7:10]), list(imu))
+
+    # csv logging exactly the way force_main.scan_angles writes (one row per file, flushed)
+    with open(os.path.join(log_dir, "quadrant_log.csv"), "w", newline='') as f1, \
+         open(os.path.join(log_dir, "force_log.csv"), "w", newline='') as f2:
+        quadrant_writer = csv.writer(f1)
+        force_writer = csv.writer(f2)
+
+        def log_row(i):
+            timestamp = time.time()
+            n, s, e, w = angle_tuples[i]
+            quadrant_writer.writerow([timestamp, "Center", n, s, e, w])
+            force_writer.writerow([timestamp, *sheets[i]])
+            f1.flush()
+            f2.flush()
+        results["csv_logging"] = time_stage(log_row, list(range(len(angle_tuples))))
+
+        # end to end: raw serial lines in, quadrant + log rows out
+        def end_to_end(i):
+            dire = force_reader_threading.parse(flex_lines[i])
+            n = dire.get("North", 0.0)
+            s = dire.get("South", 0.0)
+            e = dire.get("East", 0.0)
+            w = dire.get("West", 0.0)
+            parsed = conductive_reader_threading.parse(sheet_lines[i])
+            latest_sheet = [parsed.get(k, 0.0) for k in range(15)]
+            quadrant = determine_quadrant(n, s, e, w)
+            force_analysis(n, s, e, w)
+            timestamp = time.time()
+            quadrant_writer.writerow([timestamp, quadrant, n, s, e, w])
+            force_writer.writerow([timestamp, *latest_sheet])
+            f1.flush()
+            f2.flush()
+        results["end_to_end"] = time_stage(end_to_end, list(range(len(flex_lines))))
+
+    return {name: summarize(lat) for name, lat in results.items()}
+
+
+# ——— baseline comparison ———
+def compare(results, baseline, tolerance):
+    """ Returns a list of (stage, metric, baseline, current) for every metric that got worse than tolerance """
+    regressions = []
+    for stage, current in results["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if old is None:
+            continue
+        for metric in ("p50_us", "p99_us"):
+            if current[metric] > old[metric] * (1 + tolerance):
+                regressions.append((stage, metric, old[metric], current[metric]))
+        if current["throughput_per_s"] < old["throughput_per_s"] / (1 + tolerance):
+            regressions.append((stage, "throughput_per_s", old["throughput_per_s"], current["throughput_per_s"]))
+    return regressions
+
+
+def print_table(stages):
+    print(f"{'stage':<20}{'ops/s':>14}{'p50 us':>12}{'p99 us':>12}")
+    for name, s in stages.items():
+        print(f"{name:<20}{s['throughput_per_s']:>14.0f}{s['p50_us']:>12.2f}{s['p99_us']:>12.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the AEEP sensing pipeline stage by stage")
+    parser.add_argument("-n", "--samples", type=int, default=2000, help="samples pushed through each stage")
+    parser.add_argument("--session", default=DEFAULT_SESSION, help="session folder with quadrant_log.csv/force_log.csv")
+    parser.add_argument("--synthetic", action="store_true", help="use random streams instead of a recorded session")
+    parser.add_argument("--imu-csv", help="IMU csv (Timestamp,Accel_X..Mag_Z); synthetic IMU data if omitted")
+    parser.add_argument("--out", help="write results json here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline json to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    n = args.samples + WARMUP
+    if args.synthetic:
+        angles, sheets = synthetic_streams(n)
+        source = "synthetic"
+    else:
+        angles, sheets = recorded_streams(args.session, n)
+        source = os.path.relpath(args.session, REPO)
+    imu = load_imu_csv(args.imu_csv, n) if args.imu_csv else synthetic_imu(n)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        stages = run_benchmarks(angles, sheets, imu, log_dir)
+
+    results = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "source": source,
+            "samples": args.samples,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+        },
+        "stages": stages,
+    }
+    print_table(stages)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline yet - run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("source") != source:
+        print(f"Note: baseline was recorded from {baseline.get('meta', {}).get('source')}, this run used {source}")
+    regressions = compare(results, baseline, args.tolerance)
+    for stage, metric, old, new in regressions:
+        print(f"REGRESSION {stage} {metric}: {old:.2f} -> {new:.2f}")
+    if not regressions:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# startup_bench.py - wall time from `python master/aeep.py <command>` to argument parsing
+#
+# Each command is started with --help in a fresh interpreter (so it only pays for imports),
+# several times, and the median is compared to a target. A headless command also fails if
+# it loads any GUI / plotting / hardware module - those must stay lazy.
+#
+# run from the repo root:
+#   python master/benchmarks/startup_bench.py                 (default commands, 300 ms target)
+#   python master/benchmarks/startup_bench.py --target-ms 200 --repeat 10 --out startup.json
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MASTER = os.path.dirname(HERE)
+ENTRY = os.path.join(MASTER, "aeep.py")
+
+HEADLESS_COMMANDS = [
+    "acquire",
+    "replay",
+    "analyze archive",
+    "analyze features",
+    "analyze sweep",
+    "analyze compare",
+    "analyze phases",
+    "analyze tremor",
+    "analyze report",
+    "analyze motion",
+    "analyze smooth",
+    "analyze occupancy",
+    "analyze bench",
+]
+HEAVY_MODULES = ("pyvista", "vtk", "matplotlib", "pandas", "filterpy", "serial", "scipy")
+
+
+def time_command(command, repeat):
+    """ Median / min wall time in ms over `repeat` fresh interpreters """
+    args = [sys.executable, ENTRY, *command.split(), "--help"]
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - t0) * 1e3)
+    return statistics.median(times), min(times)
+
+
+def imported_modules(command):
+    """ (top level module -> cumulative import us) from python -X importtime """
+    args = [sys.executable, "-X", "importtime", ENTRY, *command.split(), "--help"]
+    proc = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = {}
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line.split("|")
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue
+        name = parts[2].strip()
+        if "." not in name:
+            modules[name] = max(modules.get(name, 0), cumulative)
+    return modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup time of the aeep.py subcommands")
+    parser.add_argument("commands", nargs="*", default=HEADLESS_COMMANDS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=300.0, help="median startup budget per headless command")
+    parser.add_argument("--top", type=int, default=3, help="show the slowest imports of each command")
+    parser.add_argument("--out", help="write results json here")
+    args = parser.parse_args(argv)
+
+    baseline_ms, _ = time_command_python(args.repeat)
+    print(f"bare interpreter: {baseline_ms:.0f} ms\n")
+    print(f"{'command':<20}{'median ms':>10}{'min ms':>8}  slowest imports")
+    results = {}
+    failed = []
+    for command in args.commands:
+        median, fastest = time_command(command, args.repeat)
+        modules = imported_modules(command)
+        heavy = sorted(m for m in modules if m in HEAVY_MODULES)
+        slowest = sorted(modules.items(), key=lambda kv: -kv[1])[:args.top]
+        print(f"{command:<20}{median:>10.0f}{fastest:>8.0f}  " + ", ".join(f"{m} {us / 1e3:.0f}ms" for m, us in slowest))
+        if median > args.target_ms:
+            failed.append(f"{command}: {median:.0f} ms > {args.target_ms:.0f} ms")
+        if heavy:
+            failed.append(f"{command}: imports {', '.join(heavy)} at startup")
+        results[command] = {"median_ms": median, "min_ms": fastest, "heavy_imports": heavy}
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                                "interpreter_ms": baseline_ms, "target_ms": args.target_ms},
+                       "commands": results}, f, indent=2)
+    if failed:
+        print("\nOVER BUDGET:\n  " + "\n  ".join(failed))
+        return 1
+    print(f"\nall commands within {args.target_ms:.0f} ms")
+    return 0
+
+
+def time_command_python(repeat):
+    """ Cost of starting the interpreter itself, for reference """
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        times.append((time.perf_counter() - t0) * 1e3)
+    return statistics.median(times), min(times)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
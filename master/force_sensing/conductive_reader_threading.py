@@ -1,59 +1,159 @@
-import serial
 import time
 import re
-from threading import Thread
+from threading import Event, Thread
+from metrics import registry, get_logger
+from serial_framing import StreamDecoder, SHEET_FRAME
+from health import SensorHealth, supervise
+
+logger = get_logger("aeep.sheet")
 
 # Regex pattern to parse "Raw: 512  V: 2.502  %: 45.3"
 pattern = re.compile(r"Rel(\d+):\s*([\d.]+)")
 
-latest_sheet = [0.0] * 15
-
-stop_flag = False 
-
 def parse(data: str):
     matches = re.findall(r"Rel(\d+):\s*([\d.]+)", data)
     return {int(index): float(value) for index, value in matches}
 
 
-def serial_loop(port='/dev/arduino_conductive', baud_rate=115200):
-    """ Continuously read serial and update latest_sheet """
-    global latest_sheet, stop_flag
-    try:
-        with serial.Serial(port, baud_rate, timeout=0.01) as arduino:
+# Rel = ema - baseline of a 10 bit ADC, clamped at 0 on the board; 0 is an untouched sensor
+SHEET_LIMITS = (-1.0, 1023.0)
+
+
+class SheetReader:
+    """
+    One conductive sheet board: its serial thread and newest 15-value sample.
+    Every station owns its own reader, metrics names are prefixed with `prefix`.
+    """
+
+    def __init__(self, port='/dev/arduino_conductive', baud_rate=115200, protocol="auto", metrics=registry, prefix="sheet"):
+        self.port = port
+        self.baud_rate = baud_rate
+        self.protocol = protocol
+        self.metrics = metrics
+        self.prefix = prefix
+        self.latest_sheet = [0.0] * 15
+        self.consumed = True
+        # Events set on every new sample (force_main's event-driven scheduler registers one here)
+        self.listeners = []
+        # callables tap(timestamp, values) seeing every sample (the live dashboard)
+        self.taps = []
+        self.stop_flag = Event()
+        self.thread = None
+        self.health = SensorHealth([f"s{i + 1}" for i in range(15)], limits=SHEET_LIMITS, idle=0.0,
+                                   metrics=metrics, prefix=prefix)
+
+    def set_sheet(self, values):
+        # previous sample was never picked up by the logger
+        if not self.consumed:
+            self.metrics.incr(self.prefix + ".dropped")
+        self.latest_sheet = values
+        self.consumed = False
+        self.metrics.incr(self.prefix + ".samples")
+        now = time.time()
+        self.health.sample(now, values)
+        for event in self.listeners:
+            event.set()
+        if self.taps:
+            for tap in self.taps:
+                tap(now, values)
+
+    def serial_loop(self):
+        """
+        Continuously read serial and update latest_sheet until stop(). The port is reopened
+        with backoff when it fails or goes silent (health.supervise).
+        """
+        supervise(self.read_port, self.stop_flag, self.health, logger, self.port, self.metrics, self.prefix)
+
+    def read_port(self):
+        """
+        One serial session.
+        protocol: "text" (Rel0: .. lines), "binary" (serial_framing frames) or "auto"
+        (text until valid binary frames show up)
+        """
+        import serial
+        decoder = StreamDecoder(self.protocol)
+        metrics, prefix, health = self.metrics, self.prefix, self.health
+        with serial.Serial(self.port, self.baud_rate, timeout=0.01) as arduino:
             time.sleep(2)
-            while not stop_flag:
-                inline = arduino.readline().decode('utf-8', errors="ignore").strip()
-                if not inline:
+            # lines buffered while the board reset would all get the same timestamp
+            arduino.reset_input_buffer()
+            health.set_connected(True)
+            while not self.stop_flag.is_set():
+                with metrics.timer(prefix + ".serial_read"):
+                    chunk = arduino.read(arduino.in_waiting or 1)
+                metrics.gauge(prefix + ".queue_bytes", arduino.in_waiting)
+                if not chunk:
+                    health.watchdog(time.time())
                     continue
-                parsed = parse(inline)
-                if parsed:
-                    latest_sheet = [parsed.get(i, 0.0) for i in range(15)]
-    except Exception as e:
-        print(f"[Sheet Serial error] {e}")
+                # lines are reassembled by the decoder, so a short timeout no longer splits them
+                for kind, item in decoder.feed(chunk):
+                    if kind == "frame":
+                        frame_type, seq, values = item
+                        if frame_type == SHEET_FRAME:
+                            health.line(True)
+                            self.set_sheet(values.tolist())
+                        continue
+                    metrics.incr(prefix + ".lines")
+                    with metrics.timer(prefix + ".parse"):
+                        parsed = parse(item)
+                    health.line(bool(parsed))
+                    if parsed:
+                        self.set_sheet([parsed.get(i, 0.0) for i in range(15)])
+                    else:
+                        metrics.incr(prefix + ".parse_failures")
+                metrics.gauge(prefix + ".frames_dropped", decoder.frames.dropped)
+                metrics.gauge(prefix + ".crc_errors", decoder.frames.crc_errors)
+                health.watchdog(time.time())
+
+    def start(self):
+        """ Start the serial reading thread """
+        self.stop_flag.clear()
+        self.thread = Thread(target=self.serial_loop, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def get_latest_sheet(self):
+        """ Get the most recent conductive sheet values (raw, voltage, percent) """
+        self.consumed = True
+        return self.latest_sheet
+
+    def stop(self):
+        """ Signal the serial loop to stop """
+        self.stop_flag.set()
+
+
+# module-level reader + wrappers for single-rig scripts
+default_reader = SheetReader()
+listeners = default_reader.listeners
+
+
+def set_sheet(values):
+    default_reader.set_sheet(values)
+
+
+def serial_loop(port='/dev/arduino_conductive', baud_rate=115200, protocol="auto"):
+    default_reader.port, default_reader.baud_rate, default_reader.protocol = port, baud_rate, protocol
+    default_reader.serial_loop()
 
 
-def start_serial_thread(port='/dev/arduino_conductive', baud_rate=115200):
+def start_serial_thread(port='/dev/arduino_conductive', baud_rate=115200, protocol="auto"):
     """ Start the serial reading thread """
-    global stop_flag
-    stop_flag = False
-    thread = Thread(target=serial_loop, args=(port, baud_rate), daemon=True)
-    thread.start()
-    return thread
+    default_reader.port, default_reader.baud_rate, default_reader.protocol = port, baud_rate, protocol
+    return default_reader.start()
 
 
 def get_latest_sheet():
     """ Get the most recent conductive sheet values (raw, voltage, percent) """
-    return latest_sheet
+    return default_reader.get_latest_sheet()
 
 
 def stop_serial_thread():
     """ Signal the serial loop to stop """
-    global stop_flag
-    stop_flag = True
+    default_reader.stop()
     
 def scan_angles():
     while True:
-        print(latest_sheet)
+        print(default_reader.latest_sheet)
         time.sleep(0.2)
 
 if __name__ == "__main__":
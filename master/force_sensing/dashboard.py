@@ -0,0 +1,409 @@
+# dashboard.py - local live dashboard: browsers watch a session over WebSockets
+#
+# Every reader sample is folded into fixed-width min/max tiles (10 ms by default) as it
+# arrives - one small update per sample, whatever the number of viewers. Each connected
+# browser asks for its own view (window length, width in pixels, frame rate); the server
+# decimates the tiles of that window into one [min, max] pair per pixel and pushes a
+# binary frame at most max_fps times per second. The per-frame cost depends on the window
+# and the screen width only, never on the raw sample rate. A viewer whose socket backs up
+# skips frames instead of queueing them.
+#
+# Stdlib only: asyncio server with a minimal RFC 6455 WebSocket implementation; the page
+# itself is served from GET /.
+#
+# Binary frame (little endian), one per channel group per push:
+#   header "<4sBBHH6xdd" (32 bytes): b"AEDB", version, group index, buckets, channels, t0, t1
+#   then float32[buckets][channels][2] (min, max); NaN = no samples in that bucket
+#
+#   python master/force_sensing/station.py stations.json --dashboard 8766
+#   python master/force_sensing/force_main.py --dashboard 8766
+#   python master/force_sensing/dashboard.py --replay bootcamp_data/EA6 --speed 10   (no hardware)
+#   then open http://127.0.0.1:8766/
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from downsample import minmax_decimate
+from metrics import registry, get_logger, log_event
+
+logger = get_logger("aeep.dashboard")
+
+FRAME_MAGIC = b"AEDB"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<4sBBHH6xdd")
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_BUCKETS = 4096
+WRITE_BUFFER_LIMIT = 1 << 20  # bytes queued for one viewer before its frames are skipped
+
+
+class MinMaxTiles:
+    """ Ring of fixed-width time tiles holding each channel's min / max, fed from reader threads """
+
+    def __init__(self, channels, tile_s=0.01, history_s=600.0):
+        self.channels = list(channels)
+        self.tile_s = tile_s
+        self.capacity = int(math.ceil(history_s / tile_s))
+        width = len(self.channels)
+        self.t = np.zeros(self.capacity)
+        self.lo = np.zeros((self.capacity, width))
+        self.hi = np.zeros((self.capacity, width))
+        self.count = 0      # tiles ever started
+        self.current = None # index (time // tile_s) of the newest tile
+        self.samples = 0
+        self.lock = threading.Lock()
+
+    def append(self, timestamp, values):
+        k = int(timestamp // self.tile_s)
+        v = np.asarray(values, dtype=float)
+        with self.lock:
+            if k == self.current:
+                i = (self.count - 1) % self.capacity
+                np.minimum(self.lo[i], v, out=self.lo[i])
+                np.maximum(self.hi[i], v, out=self.hi[i])
+            elif self.current is None or k > self.current:
+                i = self.count % self.capacity
+                self.t[i] = k * self.tile_s
+                self.lo[i] = v
+                self.hi[i] = v
+                self.count += 1
+                self.current = k
+            # a sample older than the newest tile (clock step) is dropped
+            self.samples += 1
+
+    def window(self, t0):
+        """ Chronological (t, lo, hi) copies of the tiles from t0 on; only touches those tiles """
+        with self.lock:
+            n = min(self.count, self.capacity)
+            if n == 0 or self.current is None:
+                empty = np.zeros((0, len(self.channels)))
+                return np.zeros(0), empty, empty
+            wanted = min(n, int((self.current * self.tile_s - t0) / self.tile_s) + 2)
+            idx = np.arange(self.count - max(wanted, 0), self.count) % self.capacity
+            t, lo, hi = self.t[idx], self.lo[idx], self.hi[idx]
+        keep = t >= t0 - self.tile_s
+        return t[keep], lo[keep], hi[keep]
+
+
+# ——— minimal RFC 6455 ———
+async def read_http_request(reader):
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    parts = request_line.split()
+    return (parts[1] if len(parts) > 1 else "/"), headers
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+def encode_ws_frame(opcode, payload):
+    """ Server -> client frames are sent whole (FIN) and unmasked """
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+async def read_ws_message(reader, max_size=1 << 16):
+    """ One complete message (fragments joined) -> (opcode, payload); client frames are masked """
+    opcode, chunks = None, []
+    while True:
+        b0, b1 = await reader.readexactly(2)
+        n = b1 & 0x7F
+        if n == 126:
+            n = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif n == 127:
+            n = struct.unpack("!Q", await reader.readexactly(8))[0]
+        if n > max_size:
+            raise ValueError("websocket message too large")
+        mask = await reader.readexactly(4) if b1 & 0x80 else b"\0\0\0\0"
+        data = np.frombuffer(await reader.readexactly(n), dtype=np.uint8)
+        data = (data ^ np.resize(np.frombuffer(mask, dtype=np.uint8), n)).tobytes()
+        frame_opcode = b0 & 0x0F
+        if frame_opcode >= 0x8:  # control frames may arrive between fragments
+            return frame_opcode, data
+        if frame_opcode != 0:
+            opcode = frame_opcode
+        chunks.append(data)
+        if b0 & 0x80:
+            return opcode, b"".join(chunks)
+
+
+# ——— server ———
+class Viewer:
+    def __init__(self, groups):
+        self.groups = list(groups)
+        self.window_s = 30.0
+        self.buckets = 600
+        self.fps = 10.0
+        self.frames = 0
+        self.skipped = 0
+
+    def configure(self, request, available, max_fps):
+        groups = [g for g in request.get("groups", self.groups) if g in available]
+        self.groups = groups or self.groups
+        self.window_s = min(max(float(request.get("window_s", self.window_s)), 0.1), 3600.0)
+        self.buckets = min(max(int(request.get("buckets", self.buckets)), 1), MAX_BUCKETS)
+        self.fps = min(max(float(request.get("fps", self.fps)), 0.1), max_fps)
+
+
+class Dashboard:
+    def __init__(self, max_fps=10.0, tile_s=0.01, history_s=600.0, metrics=registry):
+        self.max_fps = max_fps
+        self.tile_s = tile_s
+        self.history_s = history_s
+        self.metrics = metrics
+        self.groups = {}
+        self.viewers = set()
+        self._rendered = {}  # (group, window, buckets) -> frame for the current slot, shared by identical views
+        self._slot = None
+
+    def add_group(self, name, channels):
+        self.groups[name] = MinMaxTiles(channels, self.tile_s, self.history_s)
+        return self.groups[name]
+
+    def attach_station(self, station):
+        """ Taps a Station's readers: groups <station_id>/flex, /sheet and /imu """
+        flex = self.add_group(station.station_id + "/flex", ["N", "S", "E", "W"])
+        station.flex.taps.append(flex.append)
+        sheet = self.add_group(station.station_id + "/sheet", [f"Rel{i}" for i in range(15)])
+        station.sheet.taps.append(lambda t, values: sheet.append(t, values[:15]))
+        if station.imu is not None:
+            imu = self.add_group(station.station_id + "/imu", ["ax", "ay", "az", "gx", "gy", "gz", "mx", "my", "mz"])
+            station.imu.taps.append(imu.append)
+
+    def render(self, group, window_s, buckets, now):
+        """ Binary frame for one group, cached for every viewer with the same view this frame slot """
+        slot = int(now * self.max_fps)
+        if slot != self._slot:
+            self._rendered.clear()
+            self._slot = slot
+        key = (group, window_s, buckets)
+        frame = self._rendered.get(key)
+        if frame is None:
+            tiles = self.groups[group]
+            t0, t1 = now - window_s, now
+            with self.metrics.timer("dashboard.render"):
+                t, lo, hi = tiles.window(t0)
+                values = minmax_decimate(t, lo, hi, t0, t1, buckets)
+            header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, list(self.groups).index(group), buckets, len(tiles.channels), t0, t1)
+            frame = encode_ws_frame(0x2, header + values.tobytes())
+            self._rendered[key] = frame
+        return frame
+
+    async def _connection(self, reader, writer):
+        """
+        start_server callback. Closing the server cancels every open connection; that is a normal
+        end, and asyncio (3.11) prints a traceback for a connection task that finishes cancelled
+        """
+        try:
+            await self.handle(reader, writer)
+        except asyncio.CancelledError:
+            pass
+
+    async def handle(self, reader, writer):
+        try:
+            path, headers = await read_http_request(reader)
+            if headers.get("upgrade", "").lower() != "websocket":
+                await self._serve_page(writer, path)
+                return
+            writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {accept_key(headers.get('sec-websocket-key', ''))}\r\n\r\n").encode())
+            viewer = Viewer(self.groups)
+            hello = {"groups": {name: tiles.channels for name, tiles in self.groups.items()}, "max_fps": self.max_fps}
+            writer.write(encode_ws_frame(0x1, json.dumps(hello).encode()))
+            await writer.drain()
+            self.viewers.add(viewer)
+            self.metrics.gauge("dashboard.viewers", len(self.viewers))
+            receiver = asyncio.ensure_future(self._receive(reader, writer, viewer))
+            try:
+                await self._push(writer, viewer, receiver)
+            finally:
+                receiver.cancel()
+                self.viewers.discard(viewer)
+                self.metrics.gauge("dashboard.viewers", len(self.viewers))
+        except asyncio.CancelledError:
+            raise  # server shutdown; the writer is closed below and _connection ends the task
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            log_event(logger, "viewer_error", error=e)
+        finally:
+            writer.close()
+
+    async def _receive(self, reader, writer, viewer):
+        """ Viewer -> server: json view requests, ping, close """
+        while True:
+            opcode, payload = await read_ws_message(reader)
+            if opcode == 0x8:
+                writer.write(encode_ws_frame(0x8, payload[:2]))
+                return
+            if opcode == 0x9:
+                writer.write(encode_ws_frame(0xA, payload))
+            elif opcode == 0x1:
+                try:
+                    viewer.configure(json.loads(payload), self.groups, self.max_fps)
+                except (ValueError, TypeError, AttributeError):
+                    log_event(logger, "bad_request", payload=payload[:80])
+
+    async def _push(self, writer, viewer, receiver):
+        while not receiver.done() and not writer.is_closing():
+            started = time.monotonic()
+            if writer.transport.get_write_buffer_size() > WRITE_BUFFER_LIMIT:
+                viewer.skipped += 1
+                self.metrics.incr("dashboard.skipped")
+            else:
+                now = time.time()
+                for group in viewer.groups:
+                    writer.write(self.render(group, viewer.window_s, viewer.buckets, now))
+                viewer.frames += 1
+                self.metrics.incr("dashboard.frames")
+            await asyncio.sleep(max(0.0, 1.0 / viewer.fps - (time.monotonic() - started)))
+
+    async def _serve_page(self, writer, path):
+        if path.split("?")[0] in ("/", "/index.html"):
+            body, status = PAGE.encode(), "200 OK"
+        else:
+            body, status = b"not found", "404 Not Found"
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/html; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8766):
+        server = await asyncio.start_server(self._connection, host, port)
+        log_event(logger, "listening", url=f"http://{host}:{port}/")
+        async with server:
+            await server.serve_forever()
+
+    def start(self, host="127.0.0.1", port=8766):
+        """ Runs the server on its own event loop thread next to the acquisition threads """
+        thread = threading.Thread(target=lambda: asyncio.run(self.serve(host, port)), daemon=True)
+        thread.start()
+        return thread
+
+
+def replay_session(dashboard, path, speed=1.0):
+    """
+    Registers a recorded session's groups and feeds it in (scaled) real time on a background
+    thread - for trying the dashboard without a rig
+    """
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analysis"))
+    from session_archive import load_session
+    session = load_session(path)
+    streams = []
+    if "quadrant_t" in session:
+        streams.append((dashboard.add_group(session["name"] + "/flex", ["N", "S", "E", "W"]), session["quadrant_t"], session["nsew"]))
+    if "force_t" in session:
+        width = session["force"].shape[1]
+        streams.append((dashboard.add_group(session["name"] + "/sheet", [f"Rel{i}" for i in range(width)]), session["force_t"], session["force"]))
+    events = sorted((t, i, j) for i, (_, ts, _) in enumerate(streams) for j, t in enumerate(ts))
+
+    def feed():
+        if not events:
+            return
+        t_first = events[0][0]
+        start = time.time()
+        for t, i, j in events:
+            due = start + (t - t_first) / speed
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            tiles, _, values = streams[i]
+            tiles.append(due, values[j])
+
+    thread = threading.Thread(target=feed, daemon=True)
+    thread.start()
+    return thread
+
+
+PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>AEEP live</title>
+<style>body{font-family:sans-serif;margin:12px;background:#111;color:#ddd}canvas{display:block;background:#1b1b1b;margin:4px 0 14px}
+label{margin-right:12px}</style></head><body>
+<div><label>window <select id="win"><option>10</option><option selected>30</option><option>120</option><option>600</option></select> s</label>
+<label>fps <select id="fps"><option>2</option><option>5</option><option selected>10</option></select></label><span id="info"></span></div>
+<div id="plots"></div>
+<script>
+const COLORS = ["#e6194b","#3cb44b","#ffe119","#4363d8","#f58231","#911eb4","#46f0f0","#f032e6","#bcf60c","#fabebe","#008080","#e6beff","#9a6324","#fffac8","#800000"];
+let groups = [], canvases = {}, frames = 0;
+const ws = new WebSocket(`ws://${location.host}/ws`);
+ws.binaryType = "arraybuffer";
+function view() {
+  const width = Math.min(document.body.clientWidth - 24, 4096);
+  ws.send(JSON.stringify({window_s: +win.value, fps: +fps.value, buckets: width}));
+}
+ws.onopen = view;
+win.onchange = fps.onchange = window.onresize = view;
+ws.onmessage = (msg) => {
+  if (typeof msg.data === "string") {
+    const hello = JSON.parse(msg.data);
+    groups = Object.keys(hello.groups);
+    for (const name of groups) {
+      const title = document.createElement("div"); title.textContent = name + "  (" + hello.groups[name].join(" ") + ")";
+      const c = document.createElement("canvas"); c.height = 160;
+      plots.append(title, c); canvases[name] = c;
+    }
+    view();
+    return;
+  }
+  const dv = new DataView(msg.data);
+  const group = groups[dv.getUint8(5)], buckets = dv.getUint16(6, true), channels = dv.getUint16(8, true);
+  const v = new Float32Array(msg.data, 32);
+  const c = canvases[group]; if (!c) return;
+  c.width = buckets;
+  let lo = Infinity, hi = -Infinity;
+  for (const x of v) if (!isNaN(x)) { if (x < lo) lo = x; if (x > hi) hi = x; }
+  if (hi <= lo) { hi = lo + 1; }
+  const g = c.getContext("2d"), y = (x) => c.height - 4 - (x - lo) / (hi - lo) * (c.height - 8);
+  for (let ch = 0; ch < channels; ch++) {
+    g.strokeStyle = COLORS[ch % COLORS.length]; g.beginPath();
+    for (let b = 0; b < buckets; b++) {
+      const i = (b * channels + ch) * 2;
+      if (isNaN(v[i])) continue;
+      g.moveTo(b + 0.5, y(v[i])); g.lineTo(b + 0.5, y(v[i + 1]) - 0.5);
+    }
+    g.stroke();
+  }
+  info.textContent = `  range ${lo.toFixed(1)} .. ${hi.toFixed(1)}   frames ${++frames}`;
+};
+</script></body></html>
+"""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live sensor dashboard over WebSockets")
+    parser.add_argument("--replay", help="session folder or .aeep archive to stream instead of live readers")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed (1 = real time)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--max-fps", type=float, default=10.0, help="frames per second cap for every viewer")
+    args = parser.parse_args()
+    if not args.replay:
+        parser.error("live mode runs inside the acquisition process: force_main.py / station.py --dashboard PORT")
+
+    dashboard = Dashboard(max_fps=args.max_fps)
+    replay_session(dashboard, args.replay, args.speed)
+    try:
+        asyncio.run(dashboard.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,90 @@
+# downsample.py - reduce long sensor series to what a screen can show
+#
+# minmax_decimate keeps the smallest and largest value of every pixel bucket, so spikes
+# survive no matter how many raw samples fall into one pixel. Input can be raw samples
+# (lo = hi = values) or already aggregated min/max tiles (the live dashboard).
+# For matplotlib lines, downsample_line picks the samples to draw with min/max buckets or
+# LTTB (largest triangle three buckets), both keeping spikes that plain striding loses.
+import numpy as np
+
+
+def _buckets(t, t0, t1, buckets):
+    """ Bucket number of every time in [t0, t1) split into `buckets` equal parts """
+    return np.minimum(((t - t0) * (buckets / (t1 - t0))).astype(np.int64), buckets - 1)
+
+
+def minmax_decimate(t, lo, hi, t0, t1, buckets):
+    """
+    t : (N,) sorted times, lo / hi : (N, C) per-sample (or per-tile) minimum and maximum
+    -> (buckets, C, 2) float32 [min, max] per bucket of [t0, t1), NaN where a bucket is empty
+    """
+    lo = np.asarray(lo, dtype=float).reshape(len(t), -1)
+    hi = np.asarray(hi, dtype=float).reshape(len(t), -1)
+    out = np.full((buckets, lo.shape[1], 2), np.nan, dtype=np.float32)
+    keep = (t >= t0) & (t < t1)
+    if t1 <= t0 or not keep.any():
+        return out
+    t, lo, hi = t[keep], lo[keep], hi[keep]
+    b = _buckets(t, t0, t1, buckets)
+    # t is sorted so equal buckets are contiguous runs -> one reduceat per statistic
+    starts = np.flatnonzero(np.concatenate(([True], b[1:] != b[:-1])))
+    out[b[starts], :, 0] = np.minimum.reduceat(lo, starts, axis=0)
+    out[b[starts], :, 1] = np.maximum.reduceat(hi, starts, axis=0)
+    return out
+
+
+def minmax_indices(t, y, buckets):
+    """
+    Indices of the samples to draw a line plot with: the first / last sample plus each
+    bucket's minimum and maximum, in time order. At most 2 * buckets + 2 points.
+    """
+    n = len(t)
+    if n <= 2 * buckets + 2:
+        return np.arange(n)
+    t0, t1 = t[0], t[-1]
+    if t1 <= t0:
+        return np.array([0, n - 1])
+    b = _buckets(t, t0, t1, buckets)
+    starts = np.flatnonzero(np.concatenate(([True], b[1:] != b[:-1])))
+    picked = [np.array([0, n - 1])]
+    for reduce in (np.minimum, np.maximum):
+        extreme = np.repeat(reduce.reduceat(y, starts), np.diff(np.append(starts, n)))
+        hits = np.flatnonzero(y == extreme)
+        # first hit of each bucket
+        _, first = np.unique(b[hits], return_index=True)
+        picked.append(hits[first])
+    return np.unique(np.concatenate(picked))
+
+
+def lttb_indices(t, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: keeps the n_out samples that best preserve the shape of
+    the line (Steinarsson 2013). Returns sample indices in time order.
+    """
+    n = len(t)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # n_out - 2 inner buckets
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # average of the next bucket (or the last point)
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        nhi = max(nhi, nlo + 1)
+        ct, cy = t[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((t[a] - ct) * (y[lo:hi] - y[a]) - (t[a] - t[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def downsample_line(t, y, max_points=2000, method="minmax"):
+    """ (t, y) reduced to about max_points samples with minmax_indices or lttb_indices """
+    t = np.asarray(t, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(t) <= max_points:
+        return t, y
+    idx = lttb_indices(t, y, max_points) if method == "lttb" else minmax_indices(t, y, max_points // 2 - 1)
+    return t[idx], y[idx]
@@ -1,55 +1,50 @@
-from force_reader_threading import get_latest_angles, start_serial_thread as start_force_thread, stop_serial_thread as stop_force_thread
-from quadrant_detection import determine_quadrant
-from conductive_reader_threading import get_latest_sheet, start_serial_thread as start_conductive_thread, stop_serial_thread as stop_conductive_thread
-import time
-import os
-import shutil
-import csv
+from station import Station, store_data
+from metrics import registry, get_logger, start_status_line, start_http_server
+import argparse
 
-start_force_thread()
-start_conductive_thread()
+logger = get_logger("aeep.force_main")
 
-def store_data(file_path, name):
-    directory_path = "bootcamp_data/" + name
-    if not os.path.exists(directory_path):
-        os.makedirs(directory_path)
-    
-    shutil.move(file_path, os.path.join(directory_path, os.path.basename(file_path)))
-    
 
-def scan_angles():
-    new_file_1 = not os.path.exists("quadrant_log.csv")
-    new_file_2 = not os.path.exists("force_log.csv")
+def make_station(name, rate_hz=2.0, mode="fixed", flex_port='/dev/arduino_flex',
+                 sheet_port='/dev/arduino_conductive', imu_port=None, phases=None, tremor=False):
+    """ The single rig force_main logs: writes to the current folder, records into the global registry """
+    return Station(name, flex_port=flex_port, sheet_port=sheet_port, imu_port=imu_port,
+                   rate_hz=rate_hz, mode=mode, work_dir=".", metrics=registry, phases=phases,
+                   tremor=tremor)
 
-    with open("quadrant_log.csv", "a", newline='') as f1, open("force_log.csv", "a", newline='') as f2:
-        quadrant_writer = csv.writer(f1)
-        force_writer = csv.writer(f2)
 
-        if new_file_1:
-            quadrant_writer.writerow(["timestamp", "quadrant", "bend_angle", "N", "S", "E", "W"])
-        if new_file_2:
-            force_writer.writerow(["timestamp", "force_Array"])
+def scan_angles(station):
+    station.run()
 
-        while True:
-            n, s, e, w = get_latest_angles()
-            latest_sheet = get_latest_sheet()
-            quadrant = determine_quadrant(n, s, e, w)
-            timestamp = time.time()
-
-            print(quadrant)
-            print(latest_sheet)
-            quadrant_writer.writerow([timestamp, quadrant, n, s, e, w])
-            force_writer.writerow([timestamp, *latest_sheet])
-            f1.flush()
-            f2.flush()
-
-            time.sleep(0.5)
-        
 
 if __name__ == "__main__":
-    ID = "f1"
+    parser = argparse.ArgumentParser(description="Log quadrant + conductive sheet data")
+    parser.add_argument("--id", default="f1", help="session name, logs are moved to bootcamp_data/<id>")
+    parser.add_argument("--rate", type=float, default=2.0, help="logging rate in Hz for fixed mode, 1 to 10 (the sensors' native rate)")
+    parser.add_argument("--mode", choices=["fixed", "event"], default="fixed",
+                        help="fixed: log at --rate, event: log every new sensor sample")
+    parser.add_argument("--flex-port", default='/dev/arduino_flex')
+    parser.add_argument("--sheet-port", default='/dev/arduino_conductive')
+    parser.add_argument("--imu-port", help="also log the IMU to imu_log.csv")
+    parser.add_argument("--dashboard", type=int, help="serve the live dashboard on this port (e.g. 8766)")
+    parser.add_argument("--phases", nargs="?", const=True, metavar="REFERENCE",
+                        help="log procedure phases live to phase_log.csv (optionally scaled like an earlier session)")
+    parser.add_argument("--tremor", action="store_true", help="log 4-12 Hz band power of flex / gyro to tremor_log.csv")
+    args = parser.parse_args()
+    ID = args.id
+    station = make_station(ID, args.rate, args.mode, args.flex_port, args.sheet_port, args.imu_port, args.phases,
+                           args.tremor)
+    if args.dashboard:
+        from dashboard import Dashboard
+        dashboard = Dashboard()
+        dashboard.attach_station(station)
+        dashboard.start(port=args.dashboard)
+    station.start()
+    start_status_line(interval=5.0)
+    # live numbers at http://127.0.0.1:8765/metrics, POST /control?rate=10&mode=event switches the logging
+    start_http_server(port=8765, control=station.control)
     try:
-        scan_angles()
+        scan_angles(station)
     except KeyboardInterrupt:
-        store_data("quadrant_log.csv", ID)
-        store_data("force_log.csv", ID)
+        station.stop()
+        station.store()
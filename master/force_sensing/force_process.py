@@ -1,87 +1,106 @@
 #plots force over time
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
+#
+# python master/force_sensing/force_process.py bootcamp_data/EA6                  (interactive window)
+# python master/force_sensing/force_process.py bootcamp_data/EA6 --out ea6_force.png   (headless, Agg)
+# Each series is drawn with lod_plot, so multi-hour sessions plot in about the same time as short ones.
+import argparse
+import os
+import sys
 
-cols = ['timestamp'] + [f'force_{i+1}' for i in range(14)]
-df = pd.read_csv('master/force_sensing/EA6/force_log.csv', names=cols, skiprows=1)
+import numpy as np
 
-df['timestamp'] = df['timestamp'].astype(float)
+from lod_plot import MAX_POINTS, plot_lod, use_backend
 
-# Detect calibration end by finding the first significant jump in data
-# Calculate the sum of all force readings per row
-df['total_force'] = df[[f'force_{i+1}' for i in range(14)]].sum(axis=1)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analysis"))
 
-# Find where calibration ends (first significant increase)
-# Look for first row where total force exceeds a threshold (e.g., 1.0)
 calibration_threshold = 1.0
-calibration_end_idx = df[df['total_force'] > calibration_threshold].index
-if len(calibration_end_idx) > 0:
-    start_idx = calibration_end_idx[0]
-else:
-    start_idx = 0  # If no jump detected, use all data
-
-# Filter data to only include post-calibration
-df = df.iloc[start_idx:].copy()
-
-# Convert timestamp to delta t (time elapsed from calibration end in seconds)
-df['delta_t'] = df['timestamp'] - df['timestamp'].iloc[0]
-
-# Prepare subplots (grid with 3 columns)
-num_sensors = 14
-fig, axs = plt.subplots(nrows=5, ncols=3, figsize=(18, 12), sharex=True)
-axs = axs.flatten()  # To simplify iteration
-
-for i in range(num_sensors):
-    sensor_col = f'force_{i+1}'
-    
-    # Calculate statistics (only for non-zero values)
-    nonzero_values = df[sensor_col][df[sensor_col] != 0]
-    if len(nonzero_values) > 0:
-        min_val = nonzero_values.min()
-        max_val = nonzero_values.max()
-        avg_val = nonzero_values.mean()
-    else:
-        min_val = 0
-        max_val = df[sensor_col].max()
-        avg_val = df[sensor_col].mean()
-    
-    # Plot the data
-    axs[i].plot(df['delta_t'], df[sensor_col])
-    axs[i].set_title(f'{sensor_col}')
-    axs[i].set_ylabel('Force Reading')
-    
-    # Set y-axis tick increments
-    y_tick_increment = 5  # Change this value to adjust y-axis spacing (e.g., 5, 10, 20, etc.)
-    y_max = df[sensor_col].max()
-    y_ticks = np.arange(40, y_max + y_tick_increment, y_tick_increment)
-    axs[i].set_yticks(y_ticks)
-    axs[i].tick_params(axis='y', labelsize=8)
-    
-    # Add statistics as text on the plot
-    stats_text = f'Min: {min_val:.2f}\nMax: {max_val:.2f}\nAvg: {avg_val:.2f}'
-    axs[i].text(0.02, 0.98, stats_text, 
-                transform=axs[i].transAxes, 
-                fontsize=9, 
-                verticalalignment='top',
-                bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-
-# Remove extra subplots
-for j in range(num_sensors, len(axs)):
-    fig.delaxes(axs[j])
-
-# Set x-axis tick increments (change the number to your desired increment in seconds)
-tick_increment = 10  # Increased spacing to reduce overlap
-max_time = df['delta_t'].max()
-import numpy as np
-x_ticks = np.arange(0, max_time + tick_increment, tick_increment)
-for ax in axs[:num_sensors]:
-    ax.set_xticks(x_ticks)
-    ax.tick_params(axis='x', rotation=0, labelsize=8)  # Horizontal labels with smaller font
 
-# Add x-axis label to all bottom row subplots
-fig.text(0.5, 0.02, 'Time (s)', ha='center', fontsize=12)
 
-plt.tight_layout()
-plt.subplots_adjust(bottom=0.05)  
-plt.show()
\ No newline at end of file
+def load_force(path):
+    """ Session folder / .aeep / force_log.csv -> (delta_t from calibration end, force readings (N, W)) """
+    from session_archive import load_session
+    if path.endswith(".csv"):
+        path = os.path.dirname(path) or "."
+    session = load_session(path)
+    t, force = session["force_t"], session["force"]
+
+    # Detect calibration end by finding the first significant jump in data
+    # Look for first row where total force exceeds a threshold (e.g., 1.0)
+    calibration_end_idx = np.flatnonzero(force.sum(axis=1) > calibration_threshold)
+    start_idx = calibration_end_idx[0] if len(calibration_end_idx) > 0 else 0  # If no jump detected, use all data
+
+    # Filter data to only include post-calibration, time elapsed from calibration end in seconds
+    return t[start_idx:] - t[start_idx], force[start_idx:]
+
+
+def plot_force(delta_t, force, max_points=MAX_POINTS, method="minmax", plt=None):
+    plt = plt or use_backend(False)
+    from matplotlib.ticker import MaxNLocator
+
+    # Prepare subplots (grid with 3 columns)
+    num_sensors = force.shape[1]
+    nrows = int(np.ceil(num_sensors / 3))
+    fig, axs = plt.subplots(nrows=nrows, ncols=3, figsize=(18, 2.4 * nrows), sharex=True)
+    axs = axs.flatten()  # To simplify iteration
+
+    for i in range(num_sensors):
+        sensor_col = f'force_{i+1}'
+        values = force[:, i]
+
+        # Calculate statistics (only for non-zero values)
+        nonzero_values = values[values != 0]
+        if len(nonzero_values) > 0:
+            min_val = nonzero_values.min()
+            max_val = nonzero_values.max()
+            avg_val = nonzero_values.mean()
+        else:
+            min_val = 0
+            max_val = values.max() if len(values) else 0
+            avg_val = values.mean() if len(values) else 0
+
+        # Plot the data
+        plot_lod(axs[i], delta_t, values, max_points, method)
+        axs[i].set_title(f'{sensor_col}')
+        axs[i].set_ylabel('Force Reading')
+        axs[i].yaxis.set_major_locator(MaxNLocator(nbins=6))
+        axs[i].tick_params(axis='y', labelsize=8)
+
+        # Add statistics as text on the plot
+        stats_text = f'Min: {min_val:.2f}\nMax: {max_val:.2f}\nAvg: {avg_val:.2f}'
+        axs[i].text(0.02, 0.98, stats_text,
+                    transform=axs[i].transAxes,
+                    fontsize=9,
+                    verticalalignment='top',
+                    bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+
+    # Remove extra subplots
+    for j in range(num_sensors, len(axs)):
+        fig.delaxes(axs[j])
+
+    for ax in axs[:num_sensors]:
+        ax.xaxis.set_major_locator(MaxNLocator(nbins=12))
+        ax.tick_params(axis='x', rotation=0, labelsize=8)  # Horizontal labels with smaller font
+
+    # Add x-axis label to all bottom row subplots
+    fig.text(0.5, 0.02, 'Time (s)', ha='center', fontsize=12)
+
+    fig.tight_layout()
+    fig.subplots_adjust(bottom=0.05)
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot every force sensor of a session")
+    parser.add_argument("session", help="session folder, .aeep archive or force_log.csv")
+    parser.add_argument("--out", help="save to this image instead of opening a window (headless)")
+    parser.add_argument("--max-points", type=int, default=MAX_POINTS, help="points drawn per series")
+    parser.add_argument("--method", choices=["minmax", "lttb"], default="minmax")
+    args = parser.parse_args()
+
+    plt = use_backend(headless=bool(args.out))
+    fig = plot_force(*load_force(args.session), args.max_points, args.method, plt)
+    if args.out:
+        fig.savefig(args.out, dpi=100)
+        print(f"Saved {args.out}")
+    else:
+        plt.show()
@@ -1,51 +1,148 @@
-import serial
 import time
 import re
 from quadrant_detection import determine_quadrant
-from threading import Thread, Lock
+from threading import Event, Thread
+from metrics import registry, get_logger
+from serial_framing import StreamDecoder, FLEX_FRAME
+from health import SensorHealth, supervise
+
+logger = get_logger("aeep.flex")
 #read regex pattern
 pattern = re.compile(r"(\w+):(-?\d+(?:\.\d+)?)")
+# calibrated angles are 0-90ish; the board's R = R_DIV * (VCC / V - 1) runs off to inf on an open wire
+FLEX_LIMITS = (-1000.0, 1000.0)
 
-latest_angles = (0.0, 0.0, 0.0, 0.0)
 #parses data
 def parse(data: str):
     matches = pattern.findall(data)
     return {d: float(v) for d, v in matches}
 
-def serial_loop(port='/dev/arduino_flex', baud_rate=9600):
-    """ Continuously read serial and update latest_angles """
-    global latest_angles, stop_flag
-    try:
-        with serial.Serial(port, baud_rate, timeout=0.5) as arduino:
-            while True:
-                inline = arduino.readline().decode('utf-8', errors="ignore").strip()
-                #print(inline)
+
+class FlexReader:
+    """
+    One flex sensor board: its serial thread and newest (N, S, E, W) sample.
+    Every station owns its own reader, metrics names are prefixed with `prefix`.
+    """
+
+    def __init__(self, port='/dev/arduino_flex', baud_rate=9600, protocol="auto", metrics=registry, prefix="flex"):
+        self.port = port
+        self.baud_rate = baud_rate
+        self.protocol = protocol
+        self.metrics = metrics
+        self.prefix = prefix
+        self.latest_angles = (0.0, 0.0, 0.0, 0.0)
+        self.consumed = True
+        # Events set on every new sample (force_main's event-driven scheduler registers one here)
+        self.listeners = []
+        # callables tap(timestamp, values) seeing every sample (the live dashboard)
+        self.taps = []
+        self.stop_flag = Event()
+        self.thread = None
+        self.health = SensorHealth(["N", "S", "E", "W"], limits=FLEX_LIMITS, metrics=metrics, prefix=prefix)
+
+    def set_angles(self, north, south, east, west):
+        # previous sample was never picked up by the logger
+        if not self.consumed:
+            self.metrics.incr(self.prefix + ".dropped")
+        self.latest_angles = (north, south, east, west)
+        self.consumed = False
+        self.metrics.incr(self.prefix + ".samples")
+        now = time.time()
+        self.health.sample(now, self.latest_angles)
+        for event in self.listeners:
+            event.set()
+        if self.taps:
+            for tap in self.taps:
+                tap(now, self.latest_angles)
+
+    def serial_loop(self):
+        """
+        Continuously read serial and update latest_angles until stop(). The port is reopened
+        with backoff when it fails or goes silent (health.supervise).
+        """
+        supervise(self.read_port, self.stop_flag, self.health, logger, self.port, self.metrics, self.prefix)
+
+    def read_port(self):
+        """
+        One serial session.
+        protocol: "text" (North:.. East:.. lines), "binary" (serial_framing frames) or "auto"
+        (text until valid binary frames show up)
+        """
+        import serial
+        decoder = StreamDecoder(self.protocol)
+        metrics, prefix, health = self.metrics, self.prefix, self.health
+        with serial.Serial(self.port, self.baud_rate, timeout=0.5) as arduino:
+            health.set_connected(True)
+            while not self.stop_flag.is_set():
+                with metrics.timer(prefix + ".serial_read"):
+                    chunk = arduino.read(arduino.in_waiting or 1)
+                metrics.gauge(prefix + ".queue_bytes", arduino.in_waiting)
+                #print(chunk)
                 #time.sleep(0.2)
-                if not inline:
+                if not chunk:
+                    health.watchdog(time.time())
                     continue
-                dire = parse(inline)
-                if dire:
-                    north = dire.get("North", 0.0)
-                    south = dire.get("South", 0.0)
-                    east = dire.get("East", 0.0)
-                    west = dire.get("West",0.0)
-            
-                    latest_angles = (north, south, east, west)
-    except Exception as e:
-        print(f"[Serial error] {e}")
-
-def start_serial_thread(port='/dev/arduino_flex', baud_rate=9600):
-    thread = Thread(target=serial_loop, args=(port, baud_rate), daemon=True)
-    thread.start()
-    return thread
+                for kind, item in decoder.feed(chunk):
+                    if kind == "frame":
+                        frame_type, seq, values = item
+                        if frame_type == FLEX_FRAME:
+                            health.line(True)
+                            north, east, south, west = values.tolist()
+                            self.set_angles(north, south, east, west)
+                        continue
+                    metrics.incr(prefix + ".lines")
+                    with metrics.timer(prefix + ".parse"):
+                        dire = parse(item)
+                    health.line(bool(dire))
+                    if dire:
+                        north = dire.get("North", 0.0)
+                        south = dire.get("South", 0.0)
+                        east = dire.get("East", 0.0)
+                        west = dire.get("West",0.0)
+                        self.set_angles(north, south, east, west)
+                    else:
+                        metrics.incr(prefix + ".parse_failures")
+                metrics.gauge(prefix + ".frames_dropped", decoder.frames.dropped)
+                metrics.gauge(prefix + ".crc_errors", decoder.frames.crc_errors)
+                health.watchdog(time.time())
+
+    def start(self):
+        self.stop_flag.clear()
+        self.thread = Thread(target=self.serial_loop, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def get_latest_angles(self):
+        self.consumed = True
+        return self.latest_angles
+
+    def stop(self):
+        """ Signal the serial loop to stop """
+        self.stop_flag.set()
+
+
+# module-level reader + wrappers for single-rig scripts
+default_reader = FlexReader()
+listeners = default_reader.listeners
+
+def set_angles(north, south, east, west):
+    default_reader.set_angles(north, south, east, west)
+
+def serial_loop(port='/dev/arduino_flex', baud_rate=9600, protocol="auto"):
+    default_reader.port, default_reader.baud_rate, default_reader.protocol = port, baud_rate, protocol
+    default_reader.serial_loop()
+
+def start_serial_thread(port='/dev/arduino_flex', baud_rate=9600, protocol="auto"):
+    default_reader.port, default_reader.baud_rate, default_reader.protocol = port, baud_rate, protocol
+    return default_reader.start()
 
 def get_latest_angles():
-    return latest_angles
+    return default_reader.get_latest_angles()
 
 def stop_serial_thread():
     """ Signal the serial loop to stop """
-    global stop_flag
-    stop_flag = True
+    default_reader.stop()
+
 def scan_angles():
     while True:
         n,s,e,w = get_latest_angles()
@@ -0,0 +1,221 @@
+# health.py - streaming sensor health checks and reconnect with backoff for the serial readers
+#
+# Every reader owns a SensorHealth and feeds it each sample (sample), each text line / frame
+# (line) and connect / disconnect (set_connected). Each call is O(channels) and keeps no
+# history, so it stays on in the hot path. check(now) lists what is wrong right now:
+#   disconnected     serial port closed, being reopened
+#   stale            no sample for stale_s seconds
+#   stuck:<ch>       channel hasn't changed for stuck_s seconds (flat-lined / wire off)
+#   saturated:<ch>   channel at its limit (ADC rail, open circuit -> inf) for saturated_s seconds
+#   rate_drop        sample rate below rate_ratio x its long-run rate
+#   parse_failures   more than parse_limit of the recent lines didn't parse
+#
+# supervise() runs one reader's serial session and reopens the port with exponential backoff
+# whenever it fails or goes silent, so a loose USB cable no longer ends the recording. Station
+# writes each issue's begin / end to health_log.csv and leaves rows out of a device's log while
+# it is disconnected or stale (GAP_ISSUES) instead of repeating its last value.
+import random
+import time
+
+import numpy as np
+
+from metrics import log_event
+
+GAP_ISSUES = ("disconnected", "stale")
+HEALTH_HEADER = ["timestamp", "device", "issue", "event"]
+
+FAST_ALPHA = 0.2     # sample interval EWMA, follows the current rate
+SLOW_ALPHA = 0.002   # sample interval EWMA, long-run rate (~500 samples)
+PARSE_ALPHA = 0.05   # failure rate EWMA over roughly the last 20 lines
+RATE_WARMUP = 50     # sample intervals before rate_drop can fire
+
+
+class SensorHealth:
+    """
+    channels : channel names, in sample order
+    limits : (lo, hi) saturation limits, values <= lo or >= hi (or non finite) are saturated
+    idle : value a channel legitimately rests at (e.g. 0.0 for an untouched sheet sensor),
+           never reported as stuck
+    expected_hz : fixed reference rate for rate_drop instead of the long-run average
+    reconnect_s : watchdog() raises once connected this long without a sample
+    """
+
+    def __init__(self, channels, stale_s=2.0, stuck_s=10.0, stuck_eps=1e-9, limits=None, idle=None,
+                 saturated_s=1.0, rate_ratio=0.5, expected_hz=None, parse_limit=0.2, reconnect_s=5.0,
+                 metrics=None, prefix="sensor"):
+        self.channels = list(channels)
+        self.stale_s = stale_s
+        self.stuck_s = stuck_s
+        self.stuck_eps = stuck_eps
+        self.limits = limits
+        self.idle = idle
+        self.saturated_s = saturated_s
+        self.rate_ratio = rate_ratio
+        self.expected_hz = expected_hz
+        self.parse_limit = parse_limit
+        self.reconnect_s = reconnect_s
+        self.metrics = metrics
+        self.prefix = prefix
+        n = len(self.channels)
+        self.last = np.full(n, np.nan)
+        self.changed_at = np.zeros(n)
+        self.saturated_since = np.full(n, np.nan)
+        self.connected = False
+        self.connected_at = None
+        self.last_sample = None
+        self.samples = 0
+        self.intervals = 0
+        self.fast_dt = None
+        self.slow_dt = None
+        self.failure_rate = 0.0
+
+    def set_connected(self, connected, now=None):
+        self.connected = connected
+        if connected:
+            self.connected_at = time.time() if now is None else now
+
+    def sample(self, now, values):
+        """ One sample of every channel """
+        dt = None if self.last_sample is None else now - self.last_sample
+        # an outage is reported as stale / disconnected, it must not drag the rate averages
+        if dt is not None and dt <= self.stale_s:
+            self.intervals += 1
+            if self.fast_dt is None:
+                self.fast_dt = self.slow_dt = dt
+            else:
+                self.fast_dt += FAST_ALPHA * (dt - self.fast_dt)
+                # plain mean until the EWMA window is full - the burst buffered while the board
+                # resets after connecting would otherwise pin the long-run interval near zero
+                self.slow_dt += max(SLOW_ALPHA, 1.0 / self.intervals) * (dt - self.slow_dt)
+        self.last_sample = now
+        self.samples += 1
+
+        v = np.asarray(values, dtype=float)
+        # NaN compares False, so the first sample (and any NaN) counts as a change
+        changed = ~(np.abs(v - self.last) <= self.stuck_eps)
+        self.changed_at[changed] = now
+        self.last = v
+
+        saturated = ~np.isfinite(v)
+        if self.limits is not None:
+            lo, hi = self.limits
+            saturated |= (v <= lo) | (v >= hi)
+        self.saturated_since[~saturated] = np.nan
+        self.saturated_since[saturated & np.isnan(self.saturated_since)] = now
+
+    def line(self, ok):
+        """ One text line or frame; ok = it parsed into a sample """
+        self.failure_rate += PARSE_ALPHA * ((0.0 if ok else 1.0) - self.failure_rate)
+
+    def silent_for(self, now):
+        """ Seconds since the last sample (or since connecting, if none came yet) """
+        last = max(self.last_sample or 0.0, self.connected_at or 0.0)
+        return now - last if last else 0.0
+
+    def watchdog(self, now):
+        """ Raises TimeoutError when an open port stopped delivering, so supervise() reopens it """
+        if self.silent_for(now) > self.reconnect_s:
+            raise TimeoutError(f"no data for {self.reconnect_s:g}s")
+
+    def check(self, now=None):
+        """ Current issues (see the top of this file), [] when healthy """
+        now = time.time() if now is None else now
+        issues = []
+        if not self.connected:
+            issues.append("disconnected")
+        elif self.silent_for(now) > self.stale_s:
+            issues.append("stale")
+        gap = bool(issues)
+        if self.samples:
+            stuck = now - self.changed_at >= self.stuck_s
+            if self.idle is not None:
+                stuck &= ~(np.abs(self.last - self.idle) <= self.stuck_eps)
+            issues += ["stuck:" + self.channels[i] for i in np.flatnonzero(stuck)]
+            saturated = now - self.saturated_since >= self.saturated_s  # NaN -> False
+            issues += ["saturated:" + self.channels[i] for i in np.flatnonzero(saturated)]
+        if not gap and self.intervals > RATE_WARMUP and self.fast_dt:
+            reference = 1.0 / self.expected_hz if self.expected_hz else self.slow_dt
+            # a sample that is overdue counts before it arrives
+            current = max(self.fast_dt, self.silent_for(now))
+            if current * self.rate_ratio > reference:
+                issues.append("rate_drop")
+        if self.failure_rate > self.parse_limit:
+            issues.append("parse_failures")
+        if self.metrics is not None:
+            self.metrics.gauge(self.prefix + ".health", ",".join(issues) or "ok")
+        return issues
+
+    def is_gap(self, issues):
+        return any(issue in GAP_ISSUES for issue in issues)
+
+
+class Backoff:
+    """ Exponential reconnect delay: initial, initial * factor, ... capped at maximum, +-jitter """
+
+    def __init__(self, initial=0.5, maximum=30.0, factor=2.0, jitter=0.1, rng=random.random):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.rng = rng
+        self.attempts = 0
+
+    def next(self):
+        delay = min(self.maximum, self.initial * self.factor ** self.attempts)
+        self.attempts += 1
+        return delay * (1.0 + self.jitter * (2.0 * self.rng() - 1.0))
+
+    def reset(self):
+        self.attempts = 0
+
+
+def supervise(session, stop_flag, health, logger, port, metrics=None, prefix="sensor", backoff=None):
+    """
+    Runs session() - one open-read-close of the serial port - until stop_flag is set,
+    reopening it with backoff whenever it raises or returns. The backoff starts over after
+    any session that delivered samples.
+    """
+    backoff = backoff or Backoff()
+    while not stop_flag.is_set():
+        samples = health.samples
+        try:
+            session()
+        except Exception as e:
+            log_event(logger, "serial_error", port=port, error=e)
+        health.set_connected(False)
+        if stop_flag.is_set():
+            break
+        if health.samples > samples:
+            backoff.reset()
+        delay = backoff.next()
+        if metrics is not None:
+            metrics.incr(prefix + ".reconnects")
+        log_event(logger, "reconnect", port=port, attempt=backoff.attempts, in_s=round(delay, 2))
+        stop_flag.wait(delay)
+
+
+class HealthLog:
+    """ Writes a begin row when a device's issue appears and an end row when it clears """
+
+    def __init__(self, writer, logger=None):
+        self.writer = writer
+        self.logger = logger
+        self.open = {}  # device -> set of issues
+
+    def update(self, device, issues, now):
+        before = self.open.get(device, set())
+        after = set(issues)
+        for issue in sorted(after - before):
+            self.writer.writerow([now, device, issue, "begin"])
+            if self.logger is not None:
+                log_event(self.logger, "health", device=device, issue=issue, change="begin")
+        for issue in sorted(before - after):
+            self.writer.writerow([now, device, issue, "end"])
+            if self.logger is not None:
+                log_event(self.logger, "health", device=device, issue=issue, change="end")
+        self.open[device] = after
+
+    def close(self, now):
+        """ Ends every open issue (the recording stops) """
+        for device in list(self.open):
+            self.update(device, [], now)
@@ -0,0 +1,51 @@
+# lod_plot.py - level-of-detail lines for long sessions in matplotlib
+#
+# A LODLine keeps the full series in memory but only hands matplotlib a downsampled copy
+# (downsample.downsample_line, a few thousand points). When the x range changes (zoom / pan
+# in an interactive window) it re-queries the full data for the visible range, so zooming
+# in shows the raw samples again. For headless reports use the Agg backend (use_backend).
+import numpy as np
+
+from downsample import downsample_line
+
+MAX_POINTS = 2000
+
+
+def use_backend(headless):
+    """ Picks Agg for file output before pyplot is imported; returns pyplot """
+    import matplotlib
+    if headless:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+class LODLine:
+    def __init__(self, ax, t, y, max_points=MAX_POINTS, method="minmax", **line_kwargs):
+        self.t = np.asarray(t, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.max_points = max_points
+        self.method = method
+        self.line, = ax.plot(*downsample_line(self.t, self.y, max_points, method), **line_kwargs)
+        self._range = None
+        # the callback registry only keeps a weak reference to self.update: the line (owned by
+        # the axes) holds the LODLine, so callers can drop plot_lod's return value
+        self.line._lod = self
+        ax.callbacks.connect("xlim_changed", self.update)
+
+    def update(self, ax):
+        lo, hi = ax.get_xlim()
+        # one sample past each edge so the line runs to the border of the view
+        a = max(int(np.searchsorted(self.t, lo)) - 1, 0)
+        b = min(int(np.searchsorted(self.t, hi)) + 1, len(self.t))
+        if (a, b) == self._range:
+            return
+        self._range = (a, b)
+        # no draw_idle here: on Agg it redraws the whole figure once per shared axis, and
+        # set_data already marks the figure stale for the redraw that follows a zoom / pan
+        self.line.set_data(*downsample_line(self.t[a:b], self.y[a:b], self.max_points, self.method))
+
+
+def plot_lod(ax, t, y, max_points=MAX_POINTS, method="minmax", **line_kwargs):
+    """ ax.plot(t, y) drawing at most ~max_points points for the visible range """
+    return LODLine(ax, t, y, max_points, method, **line_kwargs)
@@ -0,0 +1,241 @@
+# metrics.py - lightweight counters/latency histograms for the acquisition loop
+#
+# Every stage (serial read, parse, classification, logging, render...) records into the
+# module-level `registry`. Recording is a couple of integer ops so it can stay on in the hot
+# path. Read the numbers with registry.snapshot(), a periodic status line
+# (start_status_line) or a local http endpoint (start_http_server -> GET /metrics, and
+# POST /control?key=value... when it is given a control callable, e.g. Station.control).
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+NUM_BUCKETS = 40  # bucket i holds latencies in [2^(i-1), 2^i) ns -> covers up to ~9 minutes
+
+
+class Histogram:
+    """ Power-of-two latency histogram; O(1) record, percentiles are bucket upper bounds """
+
+    def __init__(self):
+        self.buckets = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns):
+        i = int(ns).bit_length()
+        if i >= NUM_BUCKETS:
+            i = NUM_BUCKETS - 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, p):
+        if self.count == 0:
+            return 0.0
+        target = self.count * p / 100.0
+        seen = 0
+        for i, c in enumerate(self.buckets):
+            seen += c
+            if seen >= target:
+                return float(min(1 << i, self.max_ns))
+        return float(self.max_ns)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_us": (self.total_ns / self.count / 1e3) if self.count else 0.0,
+            "p50_us": self.percentile(50) / 1e3,
+            "p99_us": self.percentile(99) / 1e3,
+            "max_us": self.max_ns / 1e3,
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = True
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started = time.monotonic()
+        self._previous = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def observe(self, stage, ns):
+        if not self.enabled:
+            return
+        hist = self.histograms.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(stage, Histogram())
+        hist.record(ns)
+
+    @contextmanager
+    def timer(self, stage):
+        """ with registry.timer("parse"): ... """
+        t0 = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter_ns() - t0)
+
+    def snapshot(self, consumer="default"):
+        """
+        Counters, gauges, latency summaries and per-second rates since this consumer's
+        previous snapshot (the status line and the http endpoint each get their own rates).
+        """
+        now = time.monotonic()
+        counters = dict(self.counters)
+        last_time, last_counters = self._previous.get(consumer, (self.started, {}))
+        elapsed = now - last_time
+        rates = {}
+        if elapsed > 0:
+            for name, value in counters.items():
+                rates[name] = (value - last_counters.get(name, 0)) / elapsed
+        self._previous[consumer] = (now, counters)
+        return {
+            "uptime_s": now - self.started,
+            "counters": counters,
+            "rates_per_s": rates,
+            "gauges": dict(self.gauges),
+            "latency": {stage: h.summary() for stage, h in list(self.histograms.items())},
+        }
+
+    def reset(self):
+        self.__init__()
+
+
+registry = Metrics()
+
+
+# ——— rate limited structured logging (replaces print in the loops) ———
+# fields naming what an event is about: events for different workers / devices / ports are
+# rate limited separately, so one worker's restart can't hide another's
+IDENTITY_FIELDS = ("worker", "device", "issue", "port", "ring", "station")
+
+class RateLimitFilter(logging.Filter):
+    """ Lets each distinct message through at most once every `interval` seconds """
+
+    def __init__(self, interval=1.0):
+        super().__init__()
+        self.interval = interval
+        self._last = {}
+
+    def filter(self, record):
+        # log_event tags records with their event name + identity fields so changing values share one key
+        key = (record.name, getattr(record, "rate_key", record.msg))
+        now = time.monotonic()
+        if now - self._last.get(key, -self.interval) < self.interval:
+            return False
+        self._last[key] = now
+        return True
+
+
+def get_logger(name, interval=1.0, level=logging.INFO):
+    """ Logger printing `event key=value ...` lines, each event rate limited to once per interval """
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        handler.addFilter(RateLimitFilter(interval))
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
+    return logger
+
+
+def log_event(logger, event, level=logging.INFO, **fields):
+    """
+    Structured log line; the event name plus its IDENTITY_FIELDS is the rate-limit key, so changing
+    values don't bypass it but a different worker / device does
+    """
+    if not logger.isEnabledFor(level):
+        return
+    text = " ".join(f"{k}={v}" for k, v in fields.items())
+    key = (event, *((k, fields[k]) for k in IDENTITY_FIELDS if k in fields))
+    logger.log(level, event + (" " + text if text else ""), extra={"event": event, "rate_key": key})
+
+
+# ——— periodic status line ———
+def format_status(snap):
+    rates = snap["rates_per_s"]
+    parts = [f"up={snap['uptime_s']:.0f}s"]
+    for name in sorted(rates):
+        if name.endswith(".samples"):
+            parts.append(f"{name}={rates[name]:.1f}/s")
+    for name in sorted(snap["counters"]):
+        if name.endswith(".dropped") or name.endswith(".parse_failures"):
+            parts.append(f"{name}={snap['counters'][name]}")
+    for name, value in sorted(snap["gauges"].items()):
+        parts.append(f"{name}={value}")
+    for stage, s in sorted(snap["latency"].items()):
+        parts.append(f"{stage}.p99={s['p99_us']:.0f}us")
+    return " ".join(parts)
+
+
+def start_status_line(interval=5.0, logger=None, metrics=registry):
+    """ Background thread logging one status line every `interval` seconds """
+    logger = logger or get_logger("aeep.status", interval=0)
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            logger.info(format_status(metrics.snapshot("status_line")))
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return thread
+
+
+# ——— local http endpoint ———
+def start_http_server(port=8765, host="127.0.0.1", metrics=registry, control=None):
+    """ Serves the current snapshot as json at http://host:port/metrics, and passes the query of
+    POST /control to control(**params) if given """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlsplit, parse_qsl
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            self._send_json(200, metrics.snapshot("http"))
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            if control is None or url.path.rstrip("/") != "/control":
+                self.send_error(404)
+                return
+            try:
+                result = control(**dict(parse_qsl(url.query)))
+            except (TypeError, ValueError, KeyError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(200, result)
+
+        def _send_json(self, status, data):
+            body = json.dumps(data, indent=2).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -25,3 +25,18 @@ def determine_quadrant(n, s, e, w, threshold = 15):
         return "West"
     else:
         return "Center"
+
+
+def determine_quadrants(n, s, e, w, threshold = 15):
+    """ determine_quadrant over whole arrays of readings at once (for replaying logs) """
+    import numpy as np
+    vertical = np.asarray(n, dtype=float) - np.asarray(s, dtype=float)
+    horizontal = np.asarray(e, dtype=float) - np.asarray(w, dtype=float)
+    vertical = np.where(np.abs(vertical) < threshold, 0, vertical)
+    horizontal = np.where(np.abs(horizontal) < threshold, 0, horizontal)
+    return np.select(
+        [(vertical > 0) & (horizontal > 0), (vertical > 0) & (horizontal < 0),
+         (vertical < 0) & (horizontal < 0), (vertical < 0) & (horizontal > 0),
+         vertical > 0, vertical < 0, horizontal > 0, horizontal < 0],
+        ["Quadrant 1", "Quadrant 2", "Quadrant 3", "Quadrant 4", "North", "South", "East", "West"],
+        default="Center")
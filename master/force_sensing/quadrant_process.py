@@ -1,79 +1,104 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+#plots N/S/E/W flex readings over time and the quadrant distribution
+#
+# python master/force_sensing/quadrant_process.py bootcamp_data/EA6                     (interactive window)
+# python master/force_sensing/quadrant_process.py bootcamp_data/EA6 --out ea6_quadrant.png   (headless, Agg)
+import argparse
+import os
+import sys
+
 import numpy as np
 
-# Read the CSV file
-df = pd.read_csv('master/force_sensing/EA6/quadrant_log.csv')
+from lod_plot import MAX_POINTS, plot_lod, use_backend
 
-# Convert timestamp to float and create delta_t
-df['timestamp'] = df['timestamp'].astype(float)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analysis"))
 
-# Detect calibration end by finding first significant change
-df['total_directional'] = df['N'] + df['S'] + df['E'] + df['W']
 calibration_threshold = 1.0
-calibration_end_idx = df[df['total_directional'] > calibration_threshold].index
-if len(calibration_end_idx) > 0:
-    start_idx = calibration_end_idx[0]
-else:
-    start_idx = 0
+directions = ['N', 'S', 'E', 'W']
 
-# Filter data to only include post-calibration
-df = df.iloc[start_idx:].copy()
-df['delta_t'] = df['timestamp'] - df['timestamp'].iloc[0]
 
-# Create subplots
-fig, axs = plt.subplots(nrows=3, ncols=2, figsize=(16, 12))
-axs = axs.flatten()
+def load_quadrants(path):
+    """ Session folder / .aeep / quadrant_log.csv -> (delta_t, nsew (N, 4), quadrant labels) """
+    from session_archive import load_session
+    if path.endswith(".csv"):
+        path = os.path.dirname(path) or "."
+    session = load_session(path)
+    t, nsew, quadrant = session["quadrant_t"], session["nsew"], session["quadrant"]
 
-# Plots 1-4: Directional forces (N, S, E, W)
-directions = ['N', 'S', 'E', 'W']
-for i, direction in enumerate(directions):
-    axs[i].plot(df['delta_t'], df[direction])
-    axs[i].set_title(f'{direction} Direction Force')
-    axs[i].set_ylabel('Force Reading')
-    
-    nonzero_values = df[direction][df[direction] != 0]
-    if len(nonzero_values) > 0:
-        min_val = nonzero_values.min()
-        max_val = nonzero_values.max()
-        avg_val = nonzero_values.mean()
+    # Detect calibration end by finding first significant change
+    calibration_end_idx = np.flatnonzero(nsew.sum(axis=1) > calibration_threshold)
+    start_idx = calibration_end_idx[0] if len(calibration_end_idx) > 0 else 0
+
+    # Filter data to only include post-calibration
+    return t[start_idx:] - t[start_idx], nsew[start_idx:], quadrant[start_idx:]
+
+
+def plot_quadrants(delta_t, nsew, quadrant, max_points=MAX_POINTS, method="minmax", plt=None):
+    plt = plt or use_backend(False)
+    from matplotlib.ticker import MaxNLocator
+
+    # Create subplots
+    fig, axs = plt.subplots(nrows=3, ncols=2, figsize=(16, 12))
+    axs = axs.flatten()
+
+    # Plots 1-4: Directional forces (N, S, E, W)
+    for i, direction in enumerate(directions):
+        values = nsew[:, i]
+        plot_lod(axs[i], delta_t, values, max_points, method)
+        axs[i].set_title(f'{direction} Direction Force')
+        axs[i].set_ylabel('Force Reading')
+
+        nonzero_values = values[values != 0]
+        if len(nonzero_values) > 0:
+            min_val = nonzero_values.min()
+            max_val = nonzero_values.max()
+            avg_val = nonzero_values.mean()
+        else:
+            min_val = 0
+            max_val = values.max() if len(values) else 0
+            avg_val = values.mean() if len(values) else 0
+
+        stats_text = f'Min: {min_val:.2f}\nMax: {max_val:.2f}\nAvg: {avg_val:.2f}'
+        axs[i].text(0.02, 0.98, stats_text, transform=axs[i].transAxes, fontsize=9,
+                    verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+
+    # Plot 5: Quadrant distribution (bar chart), most frequent first
+    labels, counts = np.unique(quadrant, return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    axs[4].bar(range(len(order)), counts[order])
+    axs[4].set_xticks(range(len(order)))
+    axs[4].set_xticklabels(labels[order], rotation=45)
+    axs[4].set_title('Quadrant Distribution')
+    axs[4].set_ylabel('Count')
+
+    # Remove extra subplot
+    fig.delaxes(axs[5])
+
+    for ax in axs[:4]:  # First 4 plots are time-series
+        ax.xaxis.set_major_locator(MaxNLocator(nbins=12))
+        ax.tick_params(axis='x', rotation=0, labelsize=8)
+        ax.yaxis.set_major_locator(MaxNLocator(nbins=6))
+        ax.tick_params(axis='y', labelsize=8)
+
+    # Add x-axis label
+    fig.text(0.5, 0.02, 'Time (s)', ha='center', fontsize=12)
+
+    fig.tight_layout()
+    fig.subplots_adjust(bottom=0.05)
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot flex readings and quadrant distribution of a session")
+    parser.add_argument("session", help="session folder, .aeep archive or quadrant_log.csv")
+    parser.add_argument("--out", help="save to this image instead of opening a window (headless)")
+    parser.add_argument("--max-points", type=int, default=MAX_POINTS, help="points drawn per series")
+    parser.add_argument("--method", choices=["minmax", "lttb"], default="minmax")
+    args = parser.parse_args()
+
+    plt = use_backend(headless=bool(args.out))
+    fig = plot_quadrants(*load_quadrants(args.session), args.max_points, args.method, plt)
+    if args.out:
+        fig.savefig(args.out, dpi=100)
+        print(f"Saved {args.out}")
     else:
-        min_val = 0
-        max_val = df[direction].max()
-        avg_val = df[direction].mean()
-    
-    stats_text = f'Min: {min_val:.2f}\nMax: {max_val:.2f}\nAvg: {avg_val:.2f}'
-    axs[i].text(0.02, 0.98, stats_text, transform=axs[i].transAxes, fontsize=9,
-                verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-
-# Plot 5: Quadrant distribution (bar chart)
-quadrant_counts = df['quadrant'].value_counts()
-axs[4].bar(range(len(quadrant_counts)), quadrant_counts.values)
-axs[4].set_xticks(range(len(quadrant_counts)))
-axs[4].set_xticklabels(quadrant_counts.index, rotation=45)
-axs[4].set_title('Quadrant Distribution')
-axs[4].set_ylabel('Count')
-
-# Remove extra subplot
-fig.delaxes(axs[5])
-
-# Set x-axis ticks for time-series plots
-tick_increment = 30
-max_time = df['delta_t'].max()
-x_ticks = np.arange(0, max_time + tick_increment, tick_increment)
-for ax in axs[:4]:  # First 4 plots are time-series
-    ax.set_xticks(x_ticks)
-    ax.tick_params(axis='x', rotation=0, labelsize=8)
-    # Set y-axis ticks
-    y_max = ax.get_ylim()[1]
-    y_tick_increment = 10
-    y_ticks = np.arange(0, y_max + y_tick_increment, y_tick_increment)
-    ax.set_yticks(y_ticks)
-    ax.tick_params(axis='y', labelsize=8)
-
-# Add x-axis label
-fig.text(0.5, 0.02, 'Time (s)', ha='center', fontsize=12)
-
-plt.tight_layout()
-plt.subplots_adjust(bottom=0.05)
-plt.show()
\ No newline at end of file
+        plt.show()
@@ -0,0 +1,138 @@
+# scheduler.py - paces the force_main logging loop
+#
+# fixed mode: ticks at rate_hz against time.monotonic. Deadlines are start + k * period, so
+#             the time spent doing work does not push the period out (time.sleep(0.5) after
+#             the work did). A tick that starts more than one period late is an overrun; the
+#             ticks it swallowed are counted as missed instead of being run back to back.
+# event mode: ticks whenever a reader publishes a new sample (set the Event handed in),
+#             or after 1/min_rate_hz seconds without one so the log never stalls. Such a
+#             tick has timeout set (and counts in event_timeouts), it is never an overrun.
+#
+# Both can be switched while the loop runs, e.g. to log at the sensors' native rate during a
+# critical phase of the procedure. Other threads call request(rate_hz=..., mode=...), the
+# change is applied by the loop itself at its next wait(); from outside the process that is
+#   curl -X POST "http://127.0.0.1:8765/control?rate=10&mode=event"
+# rate_hz must lie between min_rate_hz (1 Hz) and the native max_rate_hz, anything else
+# (inf / nan included) raises ValueError, which /control answers with a 400.
+import math
+import threading
+import time
+from collections import namedtuple
+
+Tick = namedtuple("Tick", ["index", "time", "lateness", "overrun", "timeout"])
+
+MODES = ("fixed", "event")
+MAX_RATE_HZ = 10.0  # the sensors' native rate, conductivesheet.ino sends every 100 ms
+
+
+class LoopScheduler:
+    def __init__(self, rate_hz=2.0, mode="fixed", event=None, min_rate_hz=1.0, max_rate_hz=MAX_RATE_HZ,
+                 clock=time.monotonic):
+        self.clock = clock
+        self.event = event if event is not None else threading.Event()
+        self.min_rate_hz = min_rate_hz
+        self.max_rate_hz = max_rate_hz
+        self.ticks = 0
+        self.overruns = 0
+        self.missed = 0
+        self.timeouts = 0
+        self.max_lateness = 0.0
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self.set_mode(mode)
+        self.set_rate(rate_hz)
+
+    def check_rate(self, rate_hz):
+        if not (math.isfinite(rate_hz) and self.min_rate_hz <= rate_hz <= self.max_rate_hz):
+            raise ValueError(f"rate_hz must be between {self.min_rate_hz} and {self.max_rate_hz}, got {rate_hz}")
+
+    def set_rate(self, rate_hz):
+        self.check_rate(rate_hz)
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+        # restart the deadline grid so a rate change doesn't count as an overrun
+        self._start = self.clock()
+        self._k = 0
+
+    def set_mode(self, mode):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.mode = mode
+        self.event.clear()
+        self._start = self.clock()
+        self._k = 0
+
+    def request(self, rate_hz=None, mode=None):
+        """ Thread safe set_rate / set_mode, applied at the start of the next wait() """
+        if rate_hz is not None:
+            self.check_rate(rate_hz)
+        if mode is not None and mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        with self._pending_lock:
+            if rate_hz is not None:
+                self._pending["rate_hz"] = rate_hz
+            if mode is not None:
+                self._pending["mode"] = mode
+
+    def requested(self):
+        """ rate_hz and mode the loop runs at once the pending request is applied """
+        with self._pending_lock:
+            return {"rate_hz": self._pending.get("rate_hz", self.rate_hz), "mode": self._pending.get("mode", self.mode)}
+
+    def _apply_pending(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if "mode" in pending:
+            self.set_mode(pending["mode"])
+        if "rate_hz" in pending:
+            self.set_rate(pending["rate_hz"])
+
+    def wait(self):
+        """ Blocks until the next tick and returns it """
+        if self._pending:
+            self._apply_pending()
+        if self.mode == "event":
+            return self._wait_event()
+        return self._wait_fixed()
+
+    def _wait_fixed(self):
+        self._k += 1
+        deadline = self._start + self._k * self.period
+        now = self.clock()
+        if deadline > now:
+            time.sleep(deadline - now)
+            now = self.clock()
+        lateness = max(0.0, now - deadline)
+        overrun = lateness > self.period
+        if overrun:
+            # skip the ticks we are already past instead of firing them in a burst
+            skipped = int(lateness // self.period)
+            self.missed += skipped
+            self._k += skipped
+            self.overruns += 1
+        return self._tick(now, lateness, overrun, False)
+
+    def _wait_event(self):
+        got = self.event.wait(1.0 / self.min_rate_hz)
+        self.event.clear()
+        now = self.clock()
+        if not got:
+            self.timeouts += 1
+        return self._tick(now, 0.0, False, not got)
+
+    def _tick(self, now, lateness, overrun, timeout):
+        self.ticks += 1
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+        return Tick(self.ticks, now, lateness, overrun, timeout)
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "rate_hz": self.rate_hz,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "missed_ticks": self.missed,
+            "event_timeouts": self.timeouts,
+            "max_lateness_ms": self.max_lateness * 1e3,
+        }
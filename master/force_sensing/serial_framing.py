@@ -0,0 +1,195 @@
+# serial_framing.py - framed binary protocol for the Arduino streams (with text fallback)
+#
+# Frame layout (all little-endian):
+#   0xAA 0x55 | type (u8) | seq (u16) | payload | crc (u16)
+# crc is CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) over type+seq+payload, the same thing
+# binascii.crc_hqx(data, 0xFFFF) computes. The payload size is fixed per frame type so a frame
+# never needs a length field, and runs of identical frames can be decoded in one
+# numpy.frombuffer call. seq increments by one per frame, so gaps = dropped frames.
+#
+# Sketches switch to this with `#define BINARY_PROTOCOL 1` (Flex_Arduino, 15SensorControlUseThis).
+import binascii
+import struct
+
+import numpy as np
+
+SYNC = b"\xaa\x55"
+HEADER = struct.Struct("<2sBH")   # sync, type, seq
+CRC = struct.Struct("<H")
+
+FLEX_FRAME = 1
+SHEET_FRAME = 2
+IMU_FRAME = 3
+
+# type -> (payload dtype, number of values, scale applied after decoding)
+FRAME_TYPES = {
+    FLEX_FRAME: (np.dtype("<f4"), 4, 1.0),     # North, East, South, West (sketch order)
+    SHEET_FRAME: (np.dtype("<i2"), 15, 0.1),   # Rel0..Rel14 in tenths
+    IMU_FRAME: (np.dtype("<f4"), 9, 1.0),      # ax, ay, az, gx, gy, gz, mx, my, mz
+}
+
+
+def frame_size(frame_type):
+    dtype, count, _ = FRAME_TYPES[frame_type]
+    return HEADER.size + dtype.itemsize * count + CRC.size
+
+
+def _record_dtype(frame_type):
+    dtype, count, _ = FRAME_TYPES[frame_type]
+    return np.dtype([("sync", "S2"), ("type", "u1"), ("seq", "<u2"), ("payload", dtype, (count,)), ("crc", "<u2")])
+
+
+RECORD_DTYPES = {t: _record_dtype(t) for t in FRAME_TYPES}
+
+
+def crc16(data):
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encode_frame(frame_type, seq, values):
+    """ Build one frame (used by tests/replay tools; the Arduino sketches do the same in C) """
+    dtype, count, scale = FRAME_TYPES[frame_type]
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape != (count,):
+        raise ValueError(f"frame type {frame_type} needs {count} values, got {values.shape}")
+    if dtype.kind == "i":
+        values = np.round(values / scale)
+    body = HEADER.pack(SYNC, frame_type, seq & 0xFFFF)[2:] + values.astype(dtype).tobytes()
+    return SYNC + body + CRC.pack(crc16(body))
+
+
+class FrameDecoder:
+    """
+    Incremental decoder: feed() raw serial bytes, get back (type, seq, values) tuples.
+
+    Corrupt frames (bad crc / unknown type) are skipped by resyncing on the next 0xAA55.
+    Counters: frames, crc_errors, dropped (sequence gaps), skipped_bytes.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.frames = 0
+        self.crc_errors = 0
+        self.dropped = 0
+        self.skipped_bytes = 0
+        self.last_seq = {}
+
+    def _track_seq(self, frame_type, seq):
+        last = self.last_seq.get(frame_type)
+        if last is not None:
+            gap = (seq - last - 1) & 0xFFFF
+            # a huge gap is a device reset, not 60k lost frames
+            if gap < 0x8000:
+                self.dropped += gap
+        self.last_seq[frame_type] = seq
+
+    def _bulk(self, start, frame_type, out):
+        """ Decode a run of back-to-back frames of one type with a single frombuffer call """
+        size = frame_size(frame_type)
+        n = (len(self.buffer) - start) // size
+        if n < 2:
+            return start
+        records = np.frombuffer(bytes(self.buffer[start:start + n * size]), dtype=RECORD_DTYPES[frame_type])
+        good = (records["sync"] == SYNC) & (records["type"] == frame_type)
+        # stop at the first frame that does not line up - the slow path resyncs from there
+        n_run = n if good.all() else int(np.argmin(good))
+        if n_run < 2:
+            return start
+        _, _, scale = FRAME_TYPES[frame_type]
+        view = memoryview(self.buffer)
+        for i in range(n_run):
+            off = start + i * size
+            rec = records[i]
+            if crc16(view[off + 2:off + size - 2]) != rec["crc"]:
+                self.crc_errors += 1
+                continue
+            self._track_seq(frame_type, int(rec["seq"]))
+            self.frames += 1
+            out.append((frame_type, int(rec["seq"]), rec["payload"].astype(np.float64) * scale))
+        view.release()
+        return start + n_run * size
+
+    def feed(self, data):
+        self.buffer += data
+        out = []
+        pos = 0
+        buf = self.buffer
+        while True:
+            sync = buf.find(SYNC, pos)
+            if sync < 0:
+                # keep a trailing 0xAA in case the 0x55 is still on its way
+                keep = 1 if buf.endswith(SYNC[:1]) else 0
+                self.skipped_bytes += len(buf) - pos - keep
+                pos = len(buf) - keep
+                break
+            self.skipped_bytes += sync - pos
+            pos = sync
+            if len(buf) - pos < HEADER.size:
+                break
+            frame_type = buf[pos + 2]
+            if frame_type not in FRAME_TYPES:
+                self.crc_errors += 1
+                pos += 1
+                continue
+            size = frame_size(frame_type)
+            if len(buf) - pos < size:
+                break
+            new_pos = self._bulk(pos, frame_type, out)
+            if new_pos != pos:
+                pos = new_pos
+                continue
+            body = bytes(buf[pos + 2:pos + size - 2])
+            (crc,) = CRC.unpack_from(buf, pos + size - 2)
+            if crc16(body) != crc:
+                self.crc_errors += 1
+                pos += 1
+                continue
+            dtype, count, scale = FRAME_TYPES[frame_type]
+            (seq,) = struct.unpack_from("<H", body, 1)
+            values = np.frombuffer(body, dtype=dtype, count=count, offset=3).astype(np.float64) * scale
+            self._track_seq(frame_type, seq)
+            self.frames += 1
+            out.append((frame_type, seq, values))
+            pos += size
+        del self.buffer[:pos]
+        return out
+
+
+class StreamDecoder:
+    """
+    Accepts raw serial chunks from either protocol.
+
+    Until binary frames are seen it also splits the bytes into text lines, so old sketches
+    (and the text calibration messages the new ones still print) keep working. After
+    `lock_after` valid frames it stops looking for text. feed() returns a list of
+    ("frame", (type, seq, values)) and ("line", str) items in arrival order per kind.
+    """
+
+    def __init__(self, protocol="auto", lock_after=2):
+        if protocol not in ("auto", "text", "binary"):
+            raise ValueError(f"unknown protocol {protocol!r}")
+        self.protocol = protocol
+        self.lock_after = lock_after
+        self.frames = FrameDecoder()
+        self.text = bytearray()
+
+    @property
+    def binary(self):
+        return self.protocol == "binary"
+
+    def feed(self, data):
+        out = []
+        if self.protocol != "text":
+            out.extend(("frame", f) for f in self.frames.feed(data))
+            if self.protocol == "auto" and self.frames.frames >= self.lock_after:
+                self.protocol = "binary"
+                self.text.clear()
+        if self.protocol != "binary":
+            self.text += data
+            *lines, rest = self.text.split(b"\n")
+            self.text = bytearray(rest)
+            for line in lines:
+                line = line.decode("utf-8", errors="ignore").strip()
+                if line:
+                    out.append(("line", line))
+        return out
@@ -0,0 +1,377 @@
+# station.py - one training rig as an object, and a host running several rigs in one process
+#
+# A Station bundles everything force_main used to keep in module globals: the device ports,
+# its flex / conductive sheet (and optional IMU) readers, the logging scheduler, its csv logs,
+# its session id and its own Metrics. Stations share nothing, so one lab PC can log a whole
+# bootcamp room:
+#
+#   python master/force_sensing/station.py stations.json
+#
+# stations.json is a list of Station arguments, one entry per rig:
+#   [{"station_id": "rig1", "session_id": "EA7", "flex_port": "/dev/ttyUSB0", "sheet_port": "/dev/ttyUSB1"},
+#    {"station_id": "rig2", "session_id": "ES4", "flex_port": "/dev/ttyUSB2", "sheet_port": "/dev/ttyUSB3",
+#     "imu_port": "/dev/ttyACM0", "rate_hz": 5, "mode": "event"}]
+#
+# Every reader loop and logging loop runs on one shared thread pool owned by the host. The
+# host's snapshot() merges the stations' metrics (names prefixed with the station id, plus
+# all.* totals), so the status line and GET /metrics cover the whole room. The logging rate
+# and mode of a running rig are switched with POST /control?station=rig1&rate=10&mode=event
+# (leave out station to switch every rig).
+#
+# Readers reconnect on their own (health.py). While a device is disconnected or stale its rows
+# are left out of its log rather than repeating the last value, and health_log.csv records when
+# each problem (gap, stuck / saturated channel, rate drop, parse failures) began and ended.
+#
+# With "phases" set (true, or the path of an earlier session on the same rig to take the signal
+# scale from) the logged rows also feed an OnlineSegmenter (analysis/phase_segment.py) and each
+# procedure phase is written to phase_log.csv ("final") once no later data can move its
+# boundaries. That takes minutes, so the phase in progress is published right away as the
+# phase_provisional gauge and a "provisional" row (start, blank end) when a new one begins.
+# With "tremor": true every flex / gyro sample also feeds a TremorMonitor (analysis/spectral.py),
+# the 4-12 Hz band power per channel goes to the <device>.tremor.* gauges and tremor_log.csv.
+import argparse
+import csv
+import functools
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from conductive_reader_threading import SheetReader
+from force_reader_threading import FlexReader
+from health import HEALTH_HEADER, HealthLog
+from metrics import Metrics, get_logger, log_event, start_http_server, start_status_line
+from quadrant_detection import determine_quadrant
+from scheduler import LoopScheduler
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "imu"))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analysis"))
+
+IMU_HEADER = ["Timestamp", "Accel_X", "Accel_Y", "Accel_Z", "Gyro_X", "Gyro_Y", "Gyro_Z", "Mag_X", "Mag_Y", "Mag_Z"]
+PHASE_HEADER = ["start", "end", "phase", "status"]
+
+
+def store_data(file_path, name, root="bootcamp_data"):
+    directory_path = os.path.join(root, name)
+    if not os.path.exists(directory_path):
+        os.makedirs(directory_path)
+
+    shutil.move(file_path, os.path.join(directory_path, os.path.basename(file_path)))
+
+
+class Station:
+    def __init__(self, station_id, session_id=None, flex_port='/dev/arduino_flex', sheet_port='/dev/arduino_conductive',
+                 imu_port=None, rate_hz=2.0, mode="fixed", protocol="auto", work_dir=None, metrics=None, phases=None,
+                 tremor=False):
+        """
+        work_dir : where the logs are written while recording (default stations/<station_id>);
+                   store() moves them to bootcamp_data/<session_id>
+        metrics : Metrics to record into, a fresh one per station by default
+        phases : segment the session into phases live (phase_log.csv): True, or an earlier
+                 session folder / .aeep to take the signal scale from instead of a 2 min warm-up
+        tremor : live 4-12 Hz band power of the flex channels and the gyro (tremor_log.csv)
+        """
+        self.station_id = station_id
+        self.session_id = session_id or station_id
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.logger = get_logger("aeep.station." + station_id)
+        self.flex = FlexReader(flex_port, protocol=protocol, metrics=self.metrics)
+        self.sheet = SheetReader(sheet_port, protocol=protocol, metrics=self.metrics)
+        self.imu = None
+        if imu_port:
+            from imu_reader import ImuReader
+            self.imu = ImuReader(imu_port, on_sample=self._log_imu, metrics=self.metrics)
+        # event mode wakes up on every new flex or sheet sample
+        self.scheduler = LoopScheduler(rate_hz=rate_hz, mode=mode)
+        self.flex.listeners.append(self.scheduler.event)
+        self.sheet.listeners.append(self.scheduler.event)
+        self.work_dir = work_dir if work_dir is not None else os.path.join("stations", station_id)
+        self.stop_flag = threading.Event()
+        self._imu_file = None
+        self._imu_writer = None
+        self._imu_lock = threading.Lock()
+        self.segmenter = None
+        if phases:
+            from phase_segment import OnlineSegmenter, live_values, reference_scale
+            self._live_values = live_values
+            scale = reference_scale(phases) if isinstance(phases, str) else None
+            # the shortest phase is kept in seconds, so /control rate / mode switches don't shorten it
+            self.segmenter = OnlineSegmenter(scale=scale)
+            self._running_phase = 0
+        self.tremor = []
+        self._tremor_file = None
+        self._tremor_writer = None
+        self._tremor_lock = threading.Lock()
+        if tremor:
+            from spectral import SOURCES, TremorMonitor
+            monitors = [("flex", self.flex, SOURCES["flex"][3], None)]
+            if self.imu:
+                monitors.append(("imu", self.imu, SOURCES["imu"][3], [3, 4, 5]))
+            for device, reader, channels, columns in monitors:
+                monitor = TremorMonitor(channels, columns, metrics=self.metrics, prefix=device + ".tremor",
+                                        on_power=functools.partial(self._log_tremor, device, channels))
+                reader.taps.append(monitor.tap)
+                self.tremor.append(monitor)
+
+    def readers(self):
+        return [r for r in (self.flex, self.sheet, self.imu) if r is not None]
+
+    def log_paths(self):
+        names = ["quadrant_log.csv", "force_log.csv", "health_log.csv"] + (["imu_log.csv"] if self.imu else [])
+        names += ["phase_log.csv"] if self.segmenter else []
+        names += ["tremor_log.csv"] if self.tremor else []
+        return [os.path.join(self.work_dir, n) for n in names]
+
+    def start(self, pool=None):
+        """ Starts the reader loops, on `pool` when given (StationHost) or on their own threads """
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.stop_flag.clear()
+        if self.imu:
+            path = os.path.join(self.work_dir, "imu_log.csv")
+            new_file = not os.path.exists(path)
+            self._imu_file = open(path, "a", newline='')
+            self._imu_writer = csv.writer(self._imu_file)
+            if new_file:
+                self._imu_writer.writerow(IMU_HEADER)
+        if self.tremor:
+            from spectral import TREMOR_HEADER
+            path = os.path.join(self.work_dir, "tremor_log.csv")
+            new_file = not os.path.exists(path)
+            self._tremor_file = open(path, "a", newline='')
+            self._tremor_writer = csv.writer(self._tremor_file)
+            if new_file:
+                self._tremor_writer.writerow(TREMOR_HEADER)
+        for reader in self.readers():
+            if pool is None:
+                reader.start()
+            else:
+                reader.stop_flag.clear()
+                pool.submit(reader.serial_loop)
+
+    def _log_imu(self, timestamp, values):
+        with self._imu_lock:
+            if self._imu_writer is not None:
+                self._imu_writer.writerow([timestamp, *values])
+
+    def _log_tremor(self, device, channels, timestamp, power, ratio):
+        """ One hop of a TremorMonitor (called on the reader's thread) """
+        with self._tremor_lock:
+            if self._tremor_writer is not None:
+                for channel, p, r in zip(channels, power, ratio):
+                    self._tremor_writer.writerow([timestamp, device, channel, round(float(p), 6), round(float(r), 4)])
+
+    def run(self):
+        """
+        Logging loop: one quadrant + force row per scheduler tick until stop(). A device that is
+        disconnected or stale gets no rows (a gap), health_log.csv says when and why.
+        """
+        quadrant_path, force_path, health_path = self.log_paths()[:3]
+        new_file_1 = not os.path.exists(quadrant_path)
+        new_file_2 = not os.path.exists(force_path)
+        new_file_3 = not os.path.exists(health_path)
+        metrics = self.metrics
+
+        phase_file = phase_writer = None
+        if self.segmenter is not None:
+            phase_path = os.path.join(self.work_dir, "phase_log.csv")
+            new_phase_file = not os.path.exists(phase_path)
+            phase_file = open(phase_path, "a", newline='')
+            phase_writer = csv.writer(phase_file)
+            if new_phase_file:
+                phase_writer.writerow(PHASE_HEADER)
+
+        with open(quadrant_path, "a", newline='') as f1, open(force_path, "a", newline='') as f2, \
+                open(health_path, "a", newline='') as f3:
+            quadrant_writer = csv.writer(f1)
+            force_writer = csv.writer(f2)
+            health_log = HealthLog(csv.writer(f3), self.logger)
+
+            if new_file_1:
+                quadrant_writer.writerow(["timestamp", "quadrant", "bend_angle", "N", "S", "E", "W"])
+            if new_file_2:
+                force_writer.writerow(["timestamp", "force_Array"])
+            if new_file_3:
+                health_log.writer.writerow(HEALTH_HEADER)
+
+            try:
+                while not self.stop_flag.is_set():
+                    tick = self.scheduler.wait()
+                    if tick.overrun:
+                        log_event(self.logger, "overrun", lateness_ms=round(tick.lateness * 1e3, 1), missed=self.scheduler.missed)
+                    n, s, e, w = self.flex.get_latest_angles()
+                    latest_sheet = self.sheet.get_latest_sheet()
+                    with metrics.timer("classify"):
+                        quadrant = determine_quadrant(n, s, e, w)
+                    timestamp = time.time()
+
+                    with metrics.timer("health"):
+                        flex_issues = self.flex.health.check(timestamp)
+                        sheet_issues = self.sheet.health.check(timestamp)
+                        health_log.update("flex", flex_issues, timestamp)
+                        health_log.update("sheet", sheet_issues, timestamp)
+                        if self.imu:
+                            health_log.update("imu", self.imu.health.check(timestamp), timestamp)
+                    flex_gap = self.flex.health.is_gap(flex_issues)
+                    sheet_gap = self.sheet.health.is_gap(sheet_issues)
+
+                    log_event(self.logger, "sample", quadrant=quadrant, sheet=latest_sheet)
+                    with metrics.timer("log_write"):
+                        if not flex_gap:
+                            quadrant_writer.writerow([timestamp, quadrant, n, s, e, w])
+                        if not sheet_gap:
+                            force_writer.writerow([timestamp, *latest_sheet])
+                        f1.flush()
+                        f2.flush()
+                        f3.flush()
+                        with self._imu_lock:
+                            if self._imu_file is not None:
+                                self._imu_file.flush()
+                        with self._tremor_lock:
+                            if self._tremor_file is not None:
+                                self._tremor_file.flush()
+                    if phase_writer is not None and not flex_gap and not sheet_gap:
+                        with metrics.timer("phases"):
+                            phases = self.segmenter.update(self._live_values(latest_sheet, (n, s, e, w)), timestamp)
+                        self._write_phases(phase_writer, phases)
+                        self._write_running_phase(phase_writer)
+                        phase_file.flush()
+                        metrics.gauge("phase", len(self.segmenter.final) - 1)
+                        metrics.gauge("phase_provisional", self.segmenter.running_phase()[0])
+                    metrics.incr("log.rows")
+                    metrics.incr("log.gap_rows", flex_gap + sheet_gap)
+                    metrics.gauge("log.overruns", self.scheduler.overruns)
+                    metrics.gauge("log.max_lateness_ms", round(self.scheduler.max_lateness * 1e3, 1))
+                    metrics.gauge("log.event_timeouts", self.scheduler.timeouts)
+            finally:
+                health_log.close(time.time())
+                if phase_file is not None:
+                    self._write_phases(phase_writer, self.segmenter.finish())
+                    phase_file.close()
+
+    def _write_phases(self, writer, phases):
+        """ Final phases from the segmenter -> phase_log.csv rows, numbered from 1 """
+        first = len(self.segmenter.final) - len(phases)
+        for k, (start, end) in enumerate(phases):
+            writer.writerow([start, end, first + k, "final"])
+            log_event(self.logger, "phase", phase=first + k, start=start, end=end)
+
+    def _write_running_phase(self, writer):
+        """ A "provisional" row when the phase in progress gets a number not seen before """
+        number, start = self.segmenter.running_phase()
+        if number > self._running_phase:
+            self._running_phase = number
+            writer.writerow([start, "", number, "provisional"])
+            log_event(self.logger, "phase_provisional", phase=number, start=start)
+
+    def stop(self):
+        self.stop_flag.set()
+        for reader in self.readers():
+            reader.stop()
+        with self._imu_lock:
+            if self._imu_file is not None:
+                self._imu_file.close()
+                self._imu_file = self._imu_writer = None
+        with self._tremor_lock:
+            if self._tremor_file is not None:
+                self._tremor_file.close()
+                self._tremor_file = self._tremor_writer = None
+        log_event(self.logger, "scheduler", **self.scheduler.stats())
+
+    def control(self, rate=None, mode=None):
+        """ Switches the logging rate / mode of a running station (POST /control) """
+        rate_hz = float(rate) if rate is not None else None
+        self.scheduler.request(rate_hz=rate_hz, mode=mode)
+        log_event(self.logger, "schedule", rate_hz=rate_hz, mode=mode)
+        return {"station": self.station_id, **self.scheduler.requested()}
+
+    def store(self, root="bootcamp_data"):
+        """ Moves the logs to <root>/<session_id> """
+        for path in self.log_paths():
+            if os.path.exists(path):
+                store_data(path, self.session_id, root)
+
+
+class StationHost:
+    """ Runs several stations on one shared thread pool and merges their metrics """
+
+    def __init__(self, stations, workers=None):
+        ids = [s.station_id for s in stations]
+        if len(set(ids)) != len(ids):
+            raise ValueError(f"station ids must be unique, got {ids}")
+        self.stations = stations
+        self.started = time.monotonic()
+        # every reader loop and every logging loop holds a worker for as long as it runs
+        needed = sum(len(s.readers()) + 1 for s in stations)
+        if workers is not None and workers < needed:
+            raise ValueError(f"{len(stations)} stations need {needed} workers, got {workers}")
+        self.pool = ThreadPoolExecutor(max_workers=workers or needed, thread_name_prefix="station")
+        self.futures = []
+
+    def start(self):
+        for station in self.stations:
+            station.start(self.pool)
+            self.futures.append(self.pool.submit(station.run))
+
+    def stop(self, root="bootcamp_data"):
+        for station in self.stations:
+            station.stop()
+        self.pool.shutdown(wait=True)
+        for station in self.stations:
+            station.store(root)
+
+    def control(self, station=None, **params):
+        """ Station.control on the station with that id, or on every station """
+        targets = [s for s in self.stations if station in (None, s.station_id)]
+        if not targets:
+            raise KeyError(f"no station {station!r}")
+        return [s.control(**params) for s in targets]
+
+    def snapshot(self, consumer="default"):
+        """ Same shape as Metrics.snapshot: <station_id>.<name> per station plus all.<name> totals """
+        combined = {"uptime_s": time.monotonic() - self.started, "counters": {}, "rates_per_s": {}, "gauges": {}, "latency": {}}
+        for station in self.stations:
+            snap = station.metrics.snapshot(consumer)
+            for section in ("counters", "rates_per_s", "gauges", "latency"):
+                for name, value in snap[section].items():
+                    combined[section][f"{station.station_id}.{name}"] = value
+            for section in ("counters", "rates_per_s"):
+                for name, value in snap[section].items():
+                    combined[section]["all." + name] = combined[section].get("all." + name, 0) + value
+        return combined
+
+
+def load_stations(config_path):
+    with open(config_path) as f:
+        return [Station(**entry) for entry in json.load(f)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Log several training rigs from one process")
+    parser.add_argument("config", help="json list of stations (see the top of this file)")
+    parser.add_argument("--workers", type=int, help="thread pool size (default: one per reader/logging loop)")
+    parser.add_argument("--status", type=float, default=5.0, help="status line interval in seconds")
+    parser.add_argument("--port", type=int, default=8765, help="http metrics port, 0 disables")
+    parser.add_argument("--root", default="bootcamp_data", help="logs are moved to <root>/<session_id> on exit")
+    parser.add_argument("--dashboard", type=int, help="serve the live dashboard on this port (e.g. 8766)")
+    args = parser.parse_args()
+
+    host = StationHost(load_stations(args.config), args.workers)
+    if args.dashboard:
+        from dashboard import Dashboard
+        dashboard = Dashboard()
+        for station in host.stations:
+            dashboard.attach_station(station)
+        dashboard.start(port=args.dashboard)
+    host.start()
+    start_status_line(interval=args.status, metrics=host)
+    if args.port:
+        # per-station numbers at http://127.0.0.1:<port>/metrics, POST /control?station=rig1&rate=10 to switch
+        start_http_server(port=args.port, metrics=host, control=host.control)
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        host.stop(args.root)
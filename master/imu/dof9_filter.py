@@ -1,7 +1,8 @@
 import numpy as np
-import pandas as pd
 import csv
 
+import quaternion_ops
+
 #reads imu with madgwick filter - however an enhanced kalman filter may work better for IMU
 class MadgwickFilter:
     def __init__(self, sample_period, beta=0.1):
@@ -100,44 +101,22 @@ class MadgwickFilter:
         q2 += q_dot2 * self.sample_period
         q3 += q_dot3 * self.sample_period
         q4 += q_dot4 * self.sample_period
-        q_new = np.array([q1, q2, q3, q4])
         # Normalize quaternion
-        self.q = q_new / np.linalg.norm(q_new)
+        self.q = quaternion_ops.normalize([q1, q2, q3, q4])
         return self.q
 
     def get_euler(self):
         """
-        Returns the current orientation as Euler angles (yaw, pitch, roll) in degrees.
+        Returns the current orientation as Euler angles in degrees, rotations about x, y, z
+        (see quaternion_ops.to_euler; the first value was labelled yaw here before).
         """
-        q = self.q
-        # Yaw (z-axis rotation)
-        yaw = np.arctan2(2*(q[0]*q[1] + q[2]*q[3]),
-                         1 - 2*(q[1]*q[1] + q[2]*q[2]))
-        # Pitch (y-axis rotation)
-        pitch = np.arcsin(2*(q[0]*q[2] - q[3]*q[1]))
-        # Roll (x-axis rotation)
-        roll = np.arctan2(2*(q[0]*q[3] + q[1]*q[2]),
-                          1 - 2*(q[2]*q[2] + q[3]*q[3]))
-        return np.degrees(yaw), np.degrees(pitch), np.degrees(roll)
-    
+        return tuple(quaternion_ops.to_euler(self.q))
+
     def get_rotation_matrix(self):
         """
         Returns the 3x3 rotation matrix corresponding to the current quaternion.
         """
-        q = self.q
-        # Compute the rotation matrix elements
-        r11 = 1 - 2*(q[2]**2 + q[3]**2)
-        r12 = 2*(q[1]*q[2] - q[0]*q[3])
-        r13 = 2*(q[1]*q[3] + q[0]*q[2])
-        r21 = 2*(q[1]*q[2] + q[0]*q[3])
-        r22 = 1 - 2*(q[1]**2 + q[3]**2)
-        r23 = 2*(q[2]*q[3] - q[0]*q[1])
-        r31 = 2*(q[1]*q[3] - q[0]*q[2])
-        r32 = 2*(q[2]*q[3] + q[0]*q[1])
-        r33 = 1 - 2*(q[1]**2 + q[2]**2)
-        return np.array([[r11, r12, r13],
-                         [r21, r22, r23],
-                         [r31, r32, r33]])
+        return quaternion_ops.to_rotation_matrix(self.q)
 
     def calibrate_magnetometer(self, mag_data):
         calibrated_mag_data = np.zeros_like(mag_data)
@@ -152,6 +131,19 @@ class MadgwickFilter:
         return calibrated_mag_data
 
     def compute_position(self, data, beta, L):
+        return self.compute_trajectory(data, beta, L)["position"][-1]
+
+    def compute_trajectory(self, data, beta, L):
+        """
+        Runs the filter over (N, 10) rows of [dt, Accel_X-Z, Gyro_X-Z, Mag_X-Z] (or the same
+        data flattened) and returns every per-sample array instead of only the final position.
+
+        Returns:
+        --------
+        dict with keys
+            dt (N,), time (N,) - elapsed seconds, quaternions (N, 4), global_acc (N, 3),
+            velocity (N, 3), position (N, 3), rod_tip_position (N, 3)
+        """
         data = np.asarray(data)
         if data.size % 10 != 0:
             raise ValueError("Input array must have a length multiple of 10.")
@@ -171,39 +163,71 @@ class MadgwickFilter:
 
         mag_data = self.calibrate_magnetometer(mag_data)
 
-        velocity = np.zeros((N, 3))
-        position = np.zeros((N, 3))
-        rod_tip_position = np.zeros((N, 3)) 
         quaternions = np.zeros((N,4))
-        euler_angles = np.zeros((N,3))
-        global_acc = np.zeros((N,3))
 
-        
         madgwick = MadgwickFilter(sample_period=np.mean(dts), beta=beta)
+        dt_used = np.where(dts > 0, dts, np.mean(dts))
 
+        # only the filter itself has to run sample by sample
         for i in range(N):
-            dt = dts[i] if dts[i] > 0 else np.mean(dts)
-            madgwick.sample_period = dt
-
-            q = madgwick.update(gyro=gyro_data[i], accel=accel_data[i], mag=mag_data[i])
-            quaternions[i] = q
-
-            R = madgwick.get_rotation_matrix()
-            global_acc = R @ accel_data[i]
-
-            if i > 0:
-                velocity[i] = global_acc * dt
-                position[i] = 0.5 * global_acc * dt**2
-            else:
-                velocity[i] = velocity[i-1] + global_acc * dt
-                position[i] = position[i-1] + velocity[i-1] * dt + 0.5 * global_acc * dt**2
-
-            rod_offset = np.array([0,0,L])
-            rod_global = R @ rod_offset
-
-            rod_tip_position[i] = position[i] + rod_global
+            madgwick.sample_period = dt_used[i]
+            quaternions[i] = madgwick.update(gyro=gyro_data[i], accel=accel_data[i], mag=mag_data[i])
+
+        global_acc = quaternion_ops.rotate(quaternions, accel_data)
+        dt = dt_used[:, None]
+        # v[i] = v[i-1] + a[i] dt, p[i] = p[i-1] + v[i-1] dt + a[i] dt^2 / 2, from rest at the origin
+        velocity = np.cumsum(global_acc * dt, axis=0)
+        previous_velocity = np.vstack((np.zeros((1, 3)), velocity[:-1]))
+        position = np.cumsum(previous_velocity * dt + 0.5 * global_acc * dt**2, axis=0)
+        rod_tip_position = position + quaternion_ops.rotate(quaternions, [0.0, 0.0, L])
+
+        return {
+            "dt": dt_used,
+            "time": np.cumsum(dt_used) - dt_used[0],
+            "quaternions": quaternions,
+            "global_acc": global_acc,
+            "velocity": velocity,
+            "position": position,
+            "rod_tip_position": rod_tip_position,
+        }
+
+class LiveTrajectory:
+    """
+    compute_trajectory one sample at a time for live views: one filter, velocity and position
+    carried from call to call, so after N steps the state equals compute_trajectory over those
+    N rows (accel relative to the first sample, magnetometer calibrated, same integration).
+    """
+
+    def __init__(self, beta=0.1, L=0.0):
+        self.filter = MadgwickFilter(sample_period=0.0, beta=beta)
+        self.L = L
+        self.accel_offset = None
+        self.velocity = np.zeros(3)
+        self.position = np.zeros(3)
+        self.rod_tip_position = np.array([0.0, 0.0, L])
+        self.samples = 0
+        self._dt_sum = 0.0
+
+    def step(self, dt, accel, gyro, mag):
+        """ One sample -> (position, rod_tip_position), meters; dt <= 0 uses the mean dt so far """
+        accel = np.asarray(accel, dtype=float)
+        if self.accel_offset is None:
+            self.accel_offset = accel.copy()
+        self.samples += 1
+        if dt > 0:
+            self._dt_sum += dt
+        else:
+            dt = self._dt_sum / max(self.samples - 1, 1)
+        accel = accel - self.accel_offset
+        mag = self.filter.calibrate_magnetometer(np.array(mag, dtype=float).reshape(1, 3))[0]
+        self.filter.sample_period = dt
+        q = self.filter.update(gyro=np.asarray(gyro, dtype=float), accel=accel, mag=mag)
+        global_acc = quaternion_ops.rotate(q, accel)
+        self.position = self.position + self.velocity * dt + 0.5 * global_acc * dt**2
+        self.velocity = self.velocity + global_acc * dt
+        self.rod_tip_position = self.position + quaternion_ops.rotate(q, [0.0, 0.0, self.L])
+        return self.position, self.rod_tip_position
 
-        return position[-1]
 
 def read_imu_data(csv_path):
         """
@@ -231,6 +255,25 @@ def read_imu_data(csv_path):
                 ])
                 yield gyro, accel, mag
 
+IMU_COLUMNS = ['Timestamp',
+               'Accel_X', 'Accel_Y', 'Accel_Z',
+               'Gyro_X', 'Gyro_Y', 'Gyro_Z',
+               'Mag_X', 'Mag_Y', 'Mag_Z']
+
+def load_imu_array(csv_path):
+    """
+    Loads an IMU csv (IMU_COLUMNS) into the (N, 10) layout compute_trajectory expects,
+    with column 0 turned from timestamps into per-sample dt.
+    """
+    with open(csv_path, newline='') as f:
+        rows = [[float(row[c]) for c in IMU_COLUMNS] for row in csv.DictReader(f)]
+    data = np.array(rows).reshape(-1, 10)
+    timestamps = data[:, 0].copy()
+    if len(data) > 1:
+        data[1:, 0] = np.diff(timestamps)
+        data[0, 0] = data[1:, 0].mean()
+    return data
+
 if __name__ == "__main__":
     csv_path = '50cm_trial2_extracted.csv'
 
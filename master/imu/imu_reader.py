@@ -1,7 +1,18 @@
-import serial
+import logging
+import os
+import sys
+import threading
 import time
 import re
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "force_sensing"))
+from health import SensorHealth, supervise
+from metrics import get_logger, log_event
+
+logger = get_logger("aeep.imu")
+
+IMU_CHANNELS = ["ax", "ay", "az", "gx", "gy", "gz", "mx", "my", "mz"]
+
 def parse(line):
     """
     Parses a single line of text from the Arduino serial output to extract
@@ -52,8 +63,7 @@ def parse(line):
 
     # Check if any values are still None (i.e., failed parsing)
     if None in [ax, ay, az, gx, gy, gz, mx, my, mz]:
-        #If values are none initialize all to 0
-        print("Failed to parse all values, initializing to 0")
+        #If values are none initialize all to 0 (callers count / log the failure)
         ax = 0
         ay = 0
         az = 0
@@ -92,6 +102,8 @@ def read_imu_data(port='COM6', baud_rate=115200):
                (ax, ay, az, gx, gy, gz, mx, my, mz)
     """
     
+    import serial
+
     # Open serial connection to the Arduino
     with serial.Serial(port, baud_rate) as arduino:
         # Wait for connection to initialize
@@ -109,6 +121,78 @@ def read_imu_data(port='COM6', baud_rate=115200):
         return ax, ay, az, gx, gy, gz, mx, my, mz
 
 
+class ImuReader:
+    """
+    Streams IMU lines from one Arduino in a background thread (read_imu_data opens the port
+    for a single line). on_sample(timestamp, values) is called for every parsed sample.
+
+    Parameters:
+        port (str): The serial port of this rig's IMU (e.g. 'COM6' or '/dev/ttyACM0').
+        metrics: optional metrics.Metrics to count samples into, names prefixed with `prefix`.
+
+    The port is reopened with backoff when it fails or stops sending; self.health
+    (health.SensorHealth) tracks stale / stuck / rate problems.
+    """
+
+    def __init__(self, port='COM6', baud_rate=115200, on_sample=None, metrics=None, prefix="imu"):
+        self.port = port
+        self.baud_rate = baud_rate
+        self.on_sample = on_sample
+        self.metrics = metrics
+        self.prefix = prefix
+        self.latest = (0.0,) * 9
+        # extra callables tap(timestamp, values), e.g. the live dashboard
+        self.taps = []
+        self.stop_flag = threading.Event()
+        self.thread = None
+        self.health = SensorHealth(IMU_CHANNELS, metrics=metrics, prefix=prefix)
+
+    def serial_loop(self):
+        """ Reads until stop(), reopening the port with backoff when it fails or goes silent """
+        supervise(self.read_port, self.stop_flag, self.health, logger, self.port, self.metrics, self.prefix)
+
+    def read_port(self):
+        """ One serial session """
+        import serial
+        health = self.health
+        with serial.Serial(self.port, self.baud_rate, timeout=0.1) as arduino:
+            time.sleep(2)
+            arduino.reset_input_buffer()
+            health.set_connected(True)
+            while not self.stop_flag.is_set():
+                inline = arduino.readline().decode('utf-8', errors="ignore").strip()
+                if not inline:
+                    health.watchdog(time.time())
+                    continue
+                values = parse(inline)
+                # parse() answers all zeros when a line is incomplete
+                health.line(any(values))
+                if not any(values):
+                    if self.metrics is not None:
+                        self.metrics.incr(self.prefix + ".parse_failures")
+                    log_event(logger, "parse_failure", logging.WARNING, port=self.port, line=repr(inline[:40]))
+                    health.watchdog(time.time())
+                    continue
+                self.latest = values
+                if self.metrics is not None:
+                    self.metrics.incr(self.prefix + ".samples")
+                now = time.time()
+                health.sample(now, values)
+                if self.on_sample is not None:
+                    self.on_sample(now, self.latest)
+                for tap in self.taps:
+                    tap(now, self.latest)
+
+    def start(self):
+        self.stop_flag.clear()
+        self.thread = threading.Thread(target=self.serial_loop, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self.stop_flag.set()
+
+
 def main():
     """
     Main function to run the IMU data reading process.
@@ -0,0 +1,187 @@
+# motion_metrics.py - motion-economy metrics over whole IMU trajectories
+#
+# Everything works on the arrays MadgwickFilter.compute_trajectory returns, in vectorized
+# NumPy (no per-sample Python loops), so hour-long sessions take milliseconds:
+#   path length, speed/acceleration/jerk profiles, idle time, angular travel,
+#   working volume (convex hull), economy of motion.
+# windowed_metrics gives the same numbers per procedure phase using cumulative sums.
+#
+#   python master/imu/motion_metrics.py trial1.csv trial2.csv --L 0.1
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+import quaternion_ops
+
+IDLE_SPEED = 0.01  # m/s - slower than this counts as idle
+
+
+def _norm(v):
+    return np.sqrt(np.einsum("ij,ij->i", v, v))
+
+
+def step_lengths(position):
+    """ Distance travelled between consecutive samples, shape (N-1,) """
+    return _norm(np.diff(position, axis=0))
+
+
+def path_length(position):
+    return float(step_lengths(position).sum()) if len(position) > 1 else 0.0
+
+
+def derivatives(position, t):
+    """ velocity, acceleration and jerk (each (N, 3)) by finite differences over time t """
+    if len(position) < 3:
+        zeros = np.zeros_like(position)
+        return zeros, zeros, zeros
+    vel = np.gradient(position, t, axis=0)
+    acc = np.gradient(vel, t, axis=0)
+    jerk = np.gradient(acc, t, axis=0)
+    return vel, acc, jerk
+
+
+def angular_steps(quaternions):
+    """ Rotation angle (rad) between consecutive orientations, shape (N-1,) """
+    return quaternion_ops.angle_between(quaternions[1:], quaternions[:-1])
+
+
+def working_volume(points):
+    """ Convex hull volume of the points (m^3); 95% covariance ellipsoid without scipy """
+    points = np.asarray(points)
+    if len(points) < 4 or np.ptp(points, axis=0).min() == 0:
+        return 0.0
+    try:
+        from scipy.spatial import ConvexHull  # optional, imported on first use (slow to import)
+    except ImportError:  # fall back to a covariance ellipsoid
+        ConvexHull = None
+    if ConvexHull is not None:
+        try:
+            return float(ConvexHull(points).volume)
+        except Exception:
+            return 0.0
+    # chi2(3) 95% quantile = 7.815
+    eig = np.clip(np.linalg.eigvalsh(np.cov(points.T)), 0, None)
+    return float(4.0 / 3.0 * np.pi * np.sqrt(np.prod(eig * 7.815)))
+
+
+def log_dimensionless_jerk(jerk, t, path):
+    """ -ln(duration^5 / path^2 * integral |jerk|^2) ; closer to 0 = smoother """
+    duration = t[-1] - t[0]
+    if duration <= 0 or path <= 0:
+        return 0.0
+    sq = np.einsum("ij,ij->i", jerk, jerk)
+    integral = np.sum(0.5 * (sq[1:] + sq[:-1]) * np.diff(t))
+    if integral <= 0:
+        return 0.0
+    return float(-np.log(duration ** 5 / path ** 2 * integral))
+
+
+def motion_metrics(trajectory, idle_speed=IDLE_SPEED, use_tip=True):
+    """
+    Metrics for one trajectory dict from MadgwickFilter.compute_trajectory.
+    use_tip=True measures the rod tip (rod_tip_position), otherwise the IMU itself.
+    """
+    pos = trajectory["rod_tip_position" if use_tip else "position"]
+    t = trajectory["time"]
+    dt = trajectory["dt"]
+    q = trajectory["quaternions"]
+
+    vel, acc, jerk = derivatives(pos, t)
+    speed = _norm(vel)
+    path = path_length(pos)
+    displacement = float(np.linalg.norm(pos[-1] - pos[0])) if len(pos) else 0.0
+    duration = float(t[-1] - t[0]) if len(t) else 0.0
+    return {
+        "duration_s": duration,
+        "path_length_m": path,
+        "displacement_m": displacement,
+        # 1.0 = straight line from start to end, smaller = more wasted motion
+        "economy_of_motion": displacement / path if path > 0 else 1.0,
+        "mean_speed": float(speed.mean()) if len(speed) else 0.0,
+        "max_speed": float(speed.max()) if len(speed) else 0.0,
+        "rms_acceleration": float(np.sqrt(np.mean(np.einsum("ij,ij->i", acc, acc)))) if len(acc) else 0.0,
+        "rms_jerk": float(np.sqrt(np.mean(np.einsum("ij,ij->i", jerk, jerk)))) if len(jerk) else 0.0,
+        "log_dimensionless_jerk": log_dimensionless_jerk(jerk, t, path) if len(t) > 2 else 0.0,
+        "idle_time_s": float(dt[speed < idle_speed].sum()),
+        "angular_travel_deg": float(np.degrees(angular_steps(q).sum())) if len(q) > 1 else 0.0,
+        "working_volume_m3": working_volume(pos),
+    }
+
+
+def profiles(trajectory, use_tip=True):
+    """ Per-sample speed / acceleration / jerk magnitude and angular speed for plotting """
+    pos = trajectory["rod_tip_position" if use_tip else "position"]
+    t = trajectory["time"]
+    vel, acc, jerk = derivatives(pos, t)
+    ang_speed = np.zeros(len(t))
+    if len(t) > 1:
+        ang_speed[1:] = angular_steps(trajectory["quaternions"]) / np.maximum(np.diff(t), 1e-9)
+    return {"time": t, "speed": _norm(vel), "acceleration": _norm(acc), "jerk": _norm(jerk), "angular_speed": ang_speed}
+
+
+def windowed_metrics(trajectory, windows, idle_speed=IDLE_SPEED, use_tip=True):
+    """
+    Metrics per phase. windows is a list of (start_s, end_s) in trajectory time.
+    Path length, idle time and angular travel come from cumulative sums (one pass for all
+    windows); the rest are computed on each window's slice.
+    """
+    pos = trajectory["rod_tip_position" if use_tip else "position"]
+    t = trajectory["time"]
+    dt = trajectory["dt"]
+    vel, _, _ = derivatives(pos, t)
+
+    cum_path = np.concatenate(([0.0], np.cumsum(step_lengths(pos))))
+    cum_angle = np.concatenate(([0.0], np.cumsum(angular_steps(trajectory["quaternions"]))))
+    cum_idle = np.concatenate(([0.0], np.cumsum(np.where(_norm(vel) < idle_speed, dt, 0.0))))
+
+    bounds = np.asarray(windows, dtype=float).reshape(-1, 2)
+    starts = np.searchsorted(t, bounds[:, 0], side="left")
+    ends = np.searchsorted(t, bounds[:, 1], side="right")  # exclusive
+
+    results = []
+    for (t0, t1), a, b in zip(bounds, starts, ends):
+        if b - a < 2:
+            results.append({"start_s": float(t0), "end_s": float(t1), "samples": int(b - a)})
+            continue
+        sub = {key: trajectory[key][a:b] for key in ("rod_tip_position", "position", "quaternions", "dt", "time")}
+        m = motion_metrics(sub, idle_speed, use_tip)
+        # the cumulative versions avoid re-summing; they match the slice values
+        m["path_length_m"] = float(cum_path[b - 1] - cum_path[a])
+        m["angular_travel_deg"] = float(np.degrees(cum_angle[b - 1] - cum_angle[a]))
+        m["idle_time_s"] = float(cum_idle[b] - cum_idle[a])
+        m.update(start_s=float(t0), end_s=float(t1), samples=int(b - a))
+        results.append(m)
+    return results
+
+
+def session_metrics(csv_path, beta=0.1, L=0.0):
+    """ Load an IMU csv, run the Madgwick filter and return its metrics """
+    from dof9_filter import MadgwickFilter, load_imu_array
+    data = load_imu_array(csv_path)
+    madgwick = MadgwickFilter(sample_period=data[:, 0].mean(), beta=beta)
+    return motion_metrics(madgwick.compute_trajectory(data, beta, L))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Motion-economy metrics for IMU session csv files")
+    parser.add_argument("csv_files", nargs="+")
+    parser.add_argument("--beta", type=float, default=0.1)
+    parser.add_argument("--L", type=float, default=0.0, help="rod length in meters")
+    parser.add_argument("--out", help="write one row per session to this csv")
+    args = parser.parse_args()
+
+    rows = []
+    for path in args.csv_files:
+        m = session_metrics(path, args.beta, args.L)
+        rows.append({"session": path, **m})
+        print(path)
+        for k, v in m.items():
+            print(f"  {k:<24}{v:.4f}")
+    if args.out:
+        with open(args.out, "w", newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Saved {len(rows)} sessions to {args.out}", file=sys.stderr)
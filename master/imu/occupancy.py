@@ -0,0 +1,253 @@
+# occupancy.py - where the instrument tip spent its time: voxel occupancy / dwell grid for the minimap
+#
+# The grid covers the prostate mesh bounds (PyVista's (xmin, xmax, ymin, ymax, zmin, zmax)) with
+# cubic voxels and keeps, per voxel, how many samples fell in it and for how long (dwell, s).
+# The live minimap feeds each IMU sample through TipFeed (one filter and one integrated position
+# across samples) and adds its rod_tip_position - an index computation and two
+# increments, O(1) - and recorded trajectories go in chunks with one np.add.at per array. The
+# arrays are flat in VTK order (x fastest), so the PyVista overlay shares their memory and a
+# frame only marks them modified: drawing costs the same after an hour as after a minute.
+#
+# Samples outside the bounds are counted separately (outside / outside_dwell), not clipped
+# onto the border voxels.
+#
+#   python master/imu/occupancy.py trial.csv --L 0.1 --scale 1000 --out trial_occupancy.npz
+#   python master/imu/occupancy.py trial.csv --smooth --show            (needs pyvista)
+import argparse
+
+import numpy as np
+
+# bounds of bph_mold_combined.stl, the minimap's mesh (main.py)
+MESH_BOUNDS = (-75.485, 75.485, -82.4505, 82.4505, -63.0095, 63.0095)
+VOXEL = 5.0      # edge length, mesh units
+CHUNK = 65536    # samples per np.add.at in add_many
+
+
+class OccupancyGrid:
+    """
+    counts / dwell : flat (nx * ny * nz,) arrays, voxel (i, j, k) at i + nx * (j + ny * k)
+    """
+
+    def __init__(self, bounds=MESH_BOUNDS, voxel=VOXEL):
+        lo = np.asarray(bounds[0::2], dtype=float)
+        hi = np.asarray(bounds[1::2], dtype=float)
+        self.bounds = tuple(float(b) for b in bounds)
+        self.voxel = float(voxel)
+        self.origin = lo
+        self.shape = tuple(int(n) for n in np.maximum(np.ceil((hi - lo) / voxel), 1))
+        self.strides = np.array([1, self.shape[0], self.shape[0] * self.shape[1]])
+        size = int(np.prod(self.shape))
+        self.counts = np.zeros(size, dtype=np.int64)
+        self.dwell = np.zeros(size)
+        self.outside = 0
+        self.outside_dwell = 0.0
+        self.samples = 0
+        self.version = 0  # bumped on every change, for renderers
+
+    def index(self, position):
+        """ Flat voxel index of one position, -1 outside the grid """
+        cell = np.floor((np.asarray(position, dtype=float) - self.origin) / self.voxel).astype(np.int64)
+        if (cell < 0).any() or (cell >= self.shape).any():
+            return -1
+        return int(cell @ self.strides)
+
+    def indices(self, positions):
+        """ Flat voxel indices of (N, 3) positions, -1 outside the grid """
+        cells = np.floor((np.asarray(positions, dtype=float) - self.origin) / self.voxel).astype(np.int64)
+        inside = ((cells >= 0) & (cells < self.shape)).all(axis=1)
+        return np.where(inside, cells @ self.strides, -1)
+
+    def add(self, position, dt):
+        """ One sample held for dt seconds; returns its voxel (-1 = outside) """
+        i = self.index(position)
+        self.samples += 1
+        self.version += 1
+        if i < 0:
+            self.outside += 1
+            self.outside_dwell += dt
+        else:
+            self.counts[i] += 1
+            self.dwell[i] += dt
+        return i
+
+    def add_many(self, positions, dt, chunk=CHUNK):
+        """ (N, 3) positions with per-sample dt (N,) or one dt for all, np.add.at per chunk """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        dt = np.broadcast_to(np.asarray(dt, dtype=float), (len(positions),))
+        for a in range(0, len(positions), chunk):
+            idx = self.indices(positions[a:a + chunk])
+            d = dt[a:a + chunk]
+            inside = idx >= 0
+            np.add.at(self.counts, idx[inside], 1)
+            np.add.at(self.dwell, idx[inside], d[inside])
+            self.outside += int((~inside).sum())
+            self.outside_dwell += float(d[~inside].sum())
+        self.samples += len(positions)
+        self.version += 1
+
+    def centers(self, idx=None):
+        """ Voxel centers (N, 3) of flat indices idx (default: every voxel) """
+        idx = np.arange(len(self.counts)) if idx is None else np.asarray(idx)
+        cells = np.stack(np.unravel_index(idx, self.shape, order="F"), axis=-1)
+        return self.origin + (cells + 0.5) * self.voxel
+
+    def occupied(self):
+        """ (flat indices, centers, counts, dwell) of the voxels the tip visited """
+        idx = np.flatnonzero(self.counts)
+        return idx, self.centers(idx), self.counts[idx], self.dwell[idx]
+
+    def summary(self, top=5):
+        idx, centers, counts, dwell = self.occupied()
+        total = self.dwell.sum() + self.outside_dwell
+        order = np.argsort(-dwell, kind="stable")[:top]
+        return {
+            "samples": self.samples,
+            "occupied_voxels": len(idx),
+            "coverage": len(idx) / len(self.counts),
+            "dwell_s": float(total),
+            "outside_share": float(self.outside_dwell / total) if total else 0.0,
+            "top": [(tuple(round(float(v), 2) for v in centers[k]), float(dwell[k])) for k in order],
+        }
+
+    def save(self, path):
+        np.savez_compressed(path, bounds=self.bounds, voxel=self.voxel, counts=self.counts, dwell=self.dwell,
+                            outside=self.outside, outside_dwell=self.outside_dwell, samples=self.samples)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        grid = cls(tuple(data["bounds"]), float(data["voxel"]))
+        grid.counts[:] = data["counts"]
+        grid.dwell[:] = data["dwell"]
+        grid.outside = int(data["outside"])
+        grid.outside_dwell = float(data["outside_dwell"])
+        grid.samples = int(data["samples"])
+        return grid
+
+
+def from_trajectory(trajectory, bounds=MESH_BOUNDS, voxel=VOXEL, scale=1.0, use_tip=True, grid=None):
+    """ Grid of a compute_trajectory / smooth_trajectory result (positions x scale -> mesh units) """
+    grid = grid or OccupancyGrid(bounds, voxel)
+    points = trajectory["rod_tip_position" if use_tip else "position"] * scale
+    grid.add_many(points, trajectory["dt"])
+    return grid
+
+
+class TipFeed:
+    """
+    Live IMU samples -> one LiveTrajectory (dof9_filter) kept across samples -> grid.
+    Positions come out of the filter in meters and go into the grid x scale (1000: m -> mm,
+    the minimap mesh's units), like the CLI's --scale.
+    """
+
+    def __init__(self, grid, beta=0.1, L=0.0, scale=1000.0):
+        from dof9_filter import LiveTrajectory
+        self.grid = grid
+        self.scale = scale
+        self.trajectory = LiveTrajectory(beta, L)
+
+    def add(self, dt, accel, gyro, mag):
+        """ One sample -> (position, rod tip position) in mesh units; the tip is added to the grid """
+        position, tip = self.trajectory.step(dt, accel, gyro, mag)
+        position, tip = position * self.scale, tip * self.scale
+        self.grid.add(tip, dt)
+        return position, tip
+
+
+class OccupancyOverlay:
+    """
+    Draws a grid into a PyVista plotter and keeps it current with update() (call it per frame).
+
+    mode "volume": dwell as a volume over the whole grid, the image shares grid.dwell
+    mode "points": one sphere per visited voxel coloured by dwell; the point set is only
+                   rebuilt when a new voxel gets visited
+    """
+
+    def __init__(self, plotter, grid, mode="volume", cmap="inferno", point_size=8):
+        import pyvista as pv
+        self.pv = pv
+        self.plotter = plotter
+        self.grid = grid
+        self.mode = mode
+        self.cmap = cmap
+        self.point_size = point_size
+        self._version = None
+        self._occupied = -1
+        self.actor = None
+        if mode == "volume":
+            self.image = pv.ImageData(dimensions=grid.shape, spacing=(grid.voxel,) * 3,
+                                      origin=grid.origin + grid.voxel / 2)
+            self.image.point_data["dwell"] = grid.dwell  # float64, x fastest: wrapped, not copied
+            self._shared = np.shares_memory(self.image.point_data["dwell"], grid.dwell)
+            self.actor = plotter.add_volume(self.image, scalars="dwell", cmap=cmap, opacity="linear",
+                                            show_scalar_bar=False)
+        else:
+            self.cloud = None
+
+    def update(self):
+        grid = self.grid
+        if grid.version == self._version:
+            return
+        self._version = grid.version
+        peak = float(grid.dwell.max()) or 1.0
+        if self.mode == "volume":
+            if not self._shared:
+                self.image.point_data["dwell"][:] = grid.dwell
+            self.image.Modified()
+            self.actor.mapper.scalar_range = (0.0, peak)
+            return
+        occupied = int(np.count_nonzero(grid.counts))
+        if occupied != self._occupied:
+            # a newly visited voxel: new point set (size = visited voxels, not samples)
+            self._occupied = occupied
+            self._idx, centers, _, _ = grid.occupied()
+            self.cloud = self.pv.PolyData(centers)
+            self.cloud.point_data["dwell"] = grid.dwell[self._idx]
+            if self.actor is not None:
+                self.plotter.remove_actor(self.actor, render=False)
+            self.actor = self.plotter.add_mesh(self.cloud, scalars="dwell", cmap=self.cmap, clim=(0.0, peak),
+                                               render_points_as_spheres=True, point_size=self.point_size,
+                                               show_scalar_bar=False)
+        else:
+            self.cloud.point_data["dwell"][:] = grid.dwell[self._idx]
+            self.cloud.Modified()
+            self.actor.mapper.scalar_range = (0.0, peak)
+
+
+if __name__ == "__main__":
+    from dof9_filter import MadgwickFilter, load_imu_array
+
+    parser = argparse.ArgumentParser(description="Voxel occupancy / dwell grid of the instrument tip for an IMU csv")
+    parser.add_argument("csv_path")
+    parser.add_argument("--beta", type=float, default=0.1)
+    parser.add_argument("--L", type=float, default=0.0, help="rod length in meters")
+    parser.add_argument("--smooth", action="store_true", help="drift-corrected positions (smoother.py)")
+    parser.add_argument("--scale", type=float, default=1.0, help="trajectory units -> mesh units (1000: m -> mm)")
+    parser.add_argument("--voxel", type=float, default=VOXEL, help="voxel edge in mesh units")
+    parser.add_argument("--bounds", type=float, nargs=6, default=MESH_BOUNDS,
+                        metavar=("XMIN", "XMAX", "YMIN", "YMAX", "ZMIN", "ZMAX"))
+    parser.add_argument("--out", help="save the grid (.npz, OccupancyGrid.load reads it back)")
+    parser.add_argument("--show", action="store_true", help="open a PyVista window with the dwell volume")
+    args = parser.parse_args()
+
+    data = load_imu_array(args.csv_path)
+    if args.smooth:
+        from smoother import smooth_trajectory
+        trajectory = smooth_trajectory(data, args.beta, args.L)
+    else:
+        trajectory = MadgwickFilter(sample_period=data[:, 0].mean(), beta=args.beta).compute_trajectory(data, args.beta, args.L)
+    grid = from_trajectory(trajectory, args.bounds, args.voxel, args.scale)
+    s = grid.summary()
+    print(f"{s['samples']} samples, {s['occupied_voxels']} of {len(grid.counts)} voxels visited "
+          f"({s['coverage']:.1%}), {s['dwell_s']:.1f} s, {s['outside_share']:.1%} of the time outside the bounds")
+    for center, dwell in s["top"]:
+        print(f"  {dwell:8.2f} s at {center}")
+    if args.out:
+        grid.save(args.out)
+        print(f"Saved {args.out}")
+    if args.show:
+        import pyvista as pv
+        plotter = pv.Plotter()
+        OccupancyOverlay(plotter, grid).update()
+        plotter.add_mesh(pv.Box(grid.bounds), style="wireframe", color="blue")
+        plotter.show()
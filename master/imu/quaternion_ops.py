@@ -0,0 +1,143 @@
+# quaternion_ops.py - quaternion / rotation math shared by the Madgwick filter, the EKF, the smoother
+# and the offline exports
+#
+# Quaternions are [w, x, y, z] (Hamilton product) and rotate body-frame vectors into the world
+# frame: v_world = to_rotation_matrix(q) @ v_body = rotate(q, v_body). Every function works on a
+# single quaternion (4,) or on a whole session at once (..., 4) - converting an orientation
+# history is one call, not one Python call per sample.
+import numpy as np
+
+IDENTITY = np.array([1.0, 0.0, 0.0, 0.0])
+
+
+def normalize(q):
+    """ Unit quaternion(s); an all-zero quaternion becomes the identity """
+    q = np.asarray(q, dtype=float)
+    norm = np.linalg.norm(q, axis=-1, keepdims=True)
+    return np.where(norm > 0, q / np.where(norm > 0, norm, 1.0), IDENTITY)
+
+
+def conjugate(q):
+    """ Inverse rotation of a unit quaternion """
+    q = np.asarray(q, dtype=float)
+    return q * np.array([1.0, -1.0, -1.0, -1.0])
+
+
+def multiply(p, q):
+    """ Hamilton product p * q (rotate by q first, then by p), broadcasting over leading axes """
+    p = np.asarray(p, dtype=float)
+    q = np.asarray(q, dtype=float)
+    pw, px, py, pz = p[..., 0], p[..., 1], p[..., 2], p[..., 3]
+    qw, qx, qy, qz = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    return np.stack([
+        pw*qw - px*qx - py*qy - pz*qz,
+        pw*qx + px*qw + py*qz - pz*qy,
+        pw*qy - px*qz + py*qw + pz*qx,
+        pw*qz + px*qy - py*qx + pz*qw,
+    ], axis=-1)
+
+
+def rotate(q, v):
+    """ Body-frame vector(s) v (..., 3) rotated into the world frame by q (..., 4) """
+    q = np.asarray(q, dtype=float)
+    v = np.asarray(v, dtype=float)
+    w = q[..., :1]
+    u = q[..., 1:]
+    # v + 2w (u x v) + 2 u x (u x v), without building the matrices
+    uv = np.cross(u, v)
+    return v + 2.0 * (w * uv + np.cross(u, uv))
+
+
+def to_rotation_matrix(q):
+    """ (..., 4) quaternions -> (..., 3, 3) rotation matrices """
+    q = np.asarray(q, dtype=float)
+    w, x, y, z = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    R = np.empty(q.shape[:-1] + (3, 3))
+    R[..., 0, 0] = 1 - 2*(y*y + z*z)
+    R[..., 0, 1] = 2*(x*y - w*z)
+    R[..., 0, 2] = 2*(x*z + w*y)
+    R[..., 1, 0] = 2*(x*y + w*z)
+    R[..., 1, 1] = 1 - 2*(x*x + z*z)
+    R[..., 1, 2] = 2*(y*z - w*x)
+    R[..., 2, 0] = 2*(x*z - w*y)
+    R[..., 2, 1] = 2*(y*z + w*x)
+    R[..., 2, 2] = 1 - 2*(x*x + y*y)
+    return R
+
+
+def from_rotation_matrix(R):
+    """
+    (..., 3, 3) rotation matrices -> (..., 4) unit quaternions with w >= 0. Per matrix the
+    largest of w, x, y, z is solved for first (Shepperd), which stays accurate near 180 deg.
+    """
+    R = np.asarray(R, dtype=float)
+    m00, m01, m02 = R[..., 0, 0], R[..., 0, 1], R[..., 0, 2]
+    m10, m11, m12 = R[..., 1, 0], R[..., 1, 1], R[..., 1, 2]
+    m20, m21, m22 = R[..., 2, 0], R[..., 2, 1], R[..., 2, 2]
+    # 4 * (w^2, x^2, y^2, z^2)
+    t = np.stack([1 + m00 + m11 + m22, 1 + m00 - m11 - m22, 1 - m00 + m11 - m22, 1 - m00 - m11 + m22], axis=-1)
+    # each row: 4 * largest component * [w, x, y, z]
+    candidates = np.stack([
+        np.stack([t[..., 0], m21 - m12, m02 - m20, m10 - m01], axis=-1),
+        np.stack([m21 - m12, t[..., 1], m01 + m10, m02 + m20], axis=-1),
+        np.stack([m02 - m20, m01 + m10, t[..., 2], m12 + m21], axis=-1),
+        np.stack([m10 - m01, m02 + m20, m12 + m21, t[..., 3]], axis=-1),
+    ], axis=-2)
+    best = np.argmax(t, axis=-1)
+    q = np.take_along_axis(candidates, best[..., None, None], axis=-2)[..., 0, :]
+    q = normalize(q)
+    return np.where(q[..., :1] < 0, -q, q)
+
+
+def to_euler(q, degrees=True):
+    """
+    (..., 4) -> (..., 3) [roll, pitch, yaw]: rotations about x, y, z (z-y-x / aerospace order).
+    Pitch is clipped to +-90 deg instead of turning NaN when rounding pushes it past 1.
+    """
+    q = np.asarray(q, dtype=float)
+    w, x, y, z = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    roll = np.arctan2(2*(w*x + y*z), 1 - 2*(x*x + y*y))
+    pitch = np.arcsin(np.clip(2*(w*y - z*x), -1.0, 1.0))
+    yaw = np.arctan2(2*(w*z + x*y), 1 - 2*(y*y + z*z))
+    angles = np.stack([roll, pitch, yaw], axis=-1)
+    return np.degrees(angles) if degrees else angles
+
+
+def angle_between(p, q):
+    """ Rotation angle (rad) taking orientation p to q, elementwise over leading axes """
+    dots = np.abs(np.sum(np.asarray(p, dtype=float) * np.asarray(q, dtype=float), axis=-1))
+    return 2.0 * np.arccos(np.clip(dots, 0.0, 1.0))
+
+
+def slerp(q0, q1, t):
+    """
+    Spherical linear interpolation from q0 (t = 0) to q1 (t = 1) along the shorter arc.
+    q0, q1 : (..., 4), t : scalar or (...) broadcasting against them
+    """
+    q0 = normalize(q0)
+    q1 = normalize(q1)
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    q1 = np.where(dot < 0, -q1, q1)
+    dot = np.abs(dot)
+    t = np.asarray(t, dtype=float)[..., None]
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    # nearly equal orientations: sin(theta) -> 0, plain lerp is exact enough
+    close = sin_theta < 1e-6
+    safe = np.where(close, 1.0, sin_theta)
+    w0 = np.where(close, 1.0 - t, np.sin((1.0 - t) * theta) / safe)
+    w1 = np.where(close, t, np.sin(t * theta) / safe)
+    return normalize(w0 * q0 + w1 * q1)
+
+
+def resample(t, q, t_new):
+    """ Orientation history q (N, 4) at sorted times t, slerped onto times t_new (clamped at the ends) """
+    t = np.asarray(t, dtype=float)
+    t_new = np.asarray(t_new, dtype=float)
+    q = np.asarray(q, dtype=float)
+    if len(t) == 1:
+        return np.repeat(normalize(q), len(t_new), axis=0)
+    i = np.clip(np.searchsorted(t, t_new, side="right") - 1, 0, len(t) - 2)
+    span = t[i + 1] - t[i]
+    frac = np.clip((t_new - t[i]) / np.where(span > 0, span, 1.0), 0.0, 1.0)
+    return slerp(q[i], q[i + 1], frac)
@@ -0,0 +1,190 @@
+# smoother.py - offline drift-corrected positions for replayed IMU sessions
+#
+# Plain double integration (compute_position, the ekf.py demo loop) drifts within seconds.
+# For recorded sessions we can do better by looking at the whole trial:
+#   1. forward pass: orientation filter (Madgwick or the EKF) -> world-frame acceleration
+#   2. zero-velocity detection: samples where the gyro and accel magnitudes say the
+#      instrument is at rest (ZUPT intervals)
+#   3. backward pass: velocity is forced to 0 inside every ZUPT interval and the velocity
+#      error accumulated between two intervals is removed, then positions are re-integrated.
+#
+# Step 3 is the Rauch-Tung-Striebel smoother for a random-walk velocity model with exact
+# zero-velocity measurements: conditioned on the error at both ends of a moving interval,
+# the smoothed error in between is the straight line joining them (a Brownian bridge), so
+# the whole backward pass is one np.interp + cumsum over the (N, 3) arrays instead of a
+# per-sample Python loop. Only the orientation filter itself runs sample by sample.
+#
+#   python master/imu/smoother.py trial.csv --L 0.1 --out trial_smoothed.csv
+import argparse
+import csv
+
+import numpy as np
+
+import quaternion_ops
+
+GRAVITY = 9.81
+
+
+def forward_orientation(data, beta=0.1, method="madgwick", ekf_args=None):
+    """
+    Quaternion per sample (N, 4) for (N, 10) rows [dt, accel, gyro, mag].
+    ekf_args are passed to OrientationBiasEKF (q_quat, q_bias, r_accmag, r_yaw)
+    """
+    dts = data[:, 0]
+    accel, gyro, mag = data[:, 1:4], data[:, 4:7], data[:, 7:10]
+    q = np.zeros((len(data), 4))
+    if method == "madgwick":
+        from dof9_filter import MadgwickFilter
+        madgwick = MadgwickFilter(sample_period=dts.mean(), beta=beta)
+        mag = madgwick.calibrate_magnetometer(mag.copy())
+        for i in range(len(data)):
+            madgwick.sample_period = dts[i] if dts[i] > 0 else dts.mean()
+            q[i] = madgwick.update(gyro=gyro[i], accel=accel[i], mag=mag[i])
+    elif method == "ekf":
+        from ekf import OrientationBiasEKF
+        orient_ekf = OrientationBiasEKF(**(ekf_args or {}))
+        for i in range(len(data)):
+            orient_ekf.predict(gyro[i], dts[i])
+            q[i] = orient_ekf.update(accel[i], mag[i])
+    else:
+        raise ValueError(f"unknown orientation method {method!r}")
+    return q
+
+
+def _moving_all(mask, window):
+    """ True where every sample in the centered window is True (erodes short blips) """
+    if window <= 1:
+        return mask
+    c = np.concatenate(([0], np.cumsum(~mask)))
+    half = window // 2
+    idx = np.arange(len(mask))
+    lo = np.clip(idx - half, 0, len(mask))
+    hi = np.clip(idx + half + 1, 0, len(mask))
+    return (c[hi] - c[lo]) == 0
+
+
+def detect_stationary(acc_linear, gyro, gyro_thresh=0.1, acc_thresh=0.3, window=30):
+    """
+    ZUPT mask: |gyro| below gyro_thresh (rad/s) and the gravity-free world acceleration
+    below acc_thresh (m/s^2) for a whole centered `window` of samples. The window keeps the
+    brief low-acceleration moment in the middle of a smooth stroke from counting as rest.
+    """
+    gyro_mag = np.linalg.norm(gyro, axis=1)
+    acc_mag = np.linalg.norm(acc_linear, axis=1)
+    mask = (gyro_mag < gyro_thresh) & (acc_mag < acc_thresh)
+    return _moving_all(mask, window)
+
+
+def rest_gravity(accel, gyro, gyro_thresh=0.1):
+    """
+    |accel| at rest: ~GRAVITY on raw data, ~0 on the offset-removed data the IMU sketch sends.
+    Snapped to one of the two so noise doesn't leak into the world-frame acceleration.
+    """
+    still = np.linalg.norm(gyro, axis=1) < gyro_thresh
+    acc_mag = np.linalg.norm(accel[still] if still.any() else accel, axis=1)
+    return GRAVITY if abs(np.median(acc_mag) - GRAVITY) < 2.0 else 0.0
+
+
+def integrate(acc, dt):
+    """ Trapezoidal velocity and position (both (N, 3)) starting from rest at the origin """
+    vel = np.zeros_like(acc)
+    vel[1:] = np.cumsum(0.5 * (acc[1:] + acc[:-1]) * dt[1:, None], axis=0)
+    pos = np.zeros_like(acc)
+    pos[1:] = np.cumsum(0.5 * (vel[1:] + vel[:-1]) * dt[1:, None], axis=0)
+    return vel, pos
+
+
+def backward_correct(vel, stationary, t):
+    """
+    Removes velocity drift: the error measured at every stationary sample (where the true
+    velocity is 0) is interpolated linearly across the moving stretches and subtracted.
+    """
+    if not stationary.any():
+        return vel.copy()
+    t_ref = t[stationary]
+    corrected = np.empty_like(vel)
+    for axis in range(vel.shape[1]):
+        corrected[:, axis] = vel[:, axis] - np.interp(t, t_ref, vel[stationary, axis])
+    corrected[stationary] = 0.0
+    return corrected
+
+
+def smooth_trajectory(data, beta=0.1, L=0.0, method="madgwick", gravity=None,
+                      gyro_thresh=0.1, acc_thresh=0.3, min_still=0.3, ekf_args=None):
+    """
+    Offline forward-backward smoothing of one session.
+
+    Parameters:
+    -----------
+    data : (N, 10) array of [dt, Accel_X-Z, Gyro_X-Z, Mag_X-Z] (see dof9_filter.load_imu_array)
+    gravity : world-frame gravity to subtract (m/s^2). None = detect: GRAVITY if the
+              accelerometer reads ~1 g at rest, 0 if the offsets were already removed.
+    min_still : shortest rest (seconds) that counts as a zero-velocity interval
+    ekf_args : OrientationBiasEKF noise settings when method="ekf"
+
+    Returns:
+    --------
+    dict with time, quaternions, acc_world, stationary, velocity_raw, position_raw,
+    velocity, position, rod_tip_position (all per sample)
+    """
+    data = np.asarray(data, dtype=float).reshape(-1, 10)
+    dt = np.where(data[:, 0] > 0, data[:, 0], data[:, 0].mean())
+    t = np.cumsum(dt) - dt[0]
+    accel, gyro = data[:, 1:4], data[:, 4:7]
+
+    q = forward_orientation(data, beta, method, ekf_args)
+    acc_world = quaternion_ops.rotate(q, accel)
+
+    if gravity is None:
+        gravity = rest_gravity(accel, gyro, gyro_thresh)
+    acc_world[:, 2] -= gravity
+    window = max(1, int(round(min_still / dt.mean())))
+    stationary = detect_stationary(acc_world, gyro, gyro_thresh, acc_thresh, window)
+    # any constant residual (bias, imperfect gravity) shows up as the mean at rest
+    if stationary.any():
+        acc_world -= acc_world[stationary].mean(axis=0)
+
+    vel_raw, pos_raw = integrate(acc_world, dt)
+    vel = backward_correct(vel_raw, stationary, t)
+    pos = np.zeros_like(vel)
+    pos[1:] = np.cumsum(0.5 * (vel[1:] + vel[:-1]) * dt[1:, None], axis=0)
+
+    rod_tip = pos + quaternion_ops.rotate(q, [0.0, 0.0, L])
+    return {
+        "time": t,
+        "dt": dt,
+        "quaternions": q,
+        "acc_world": acc_world,
+        "stationary": stationary,
+        "velocity_raw": vel_raw,
+        "position_raw": pos_raw,
+        "velocity": vel,
+        "position": pos,
+        "rod_tip_position": rod_tip,
+    }
+
+
+if __name__ == "__main__":
+    from dof9_filter import load_imu_array
+
+    parser = argparse.ArgumentParser(description="Drift-corrected offline positions for an IMU csv")
+    parser.add_argument("csv_path")
+    parser.add_argument("--beta", type=float, default=0.1)
+    parser.add_argument("--L", type=float, default=0.0, help="rod length in meters")
+    parser.add_argument("--method", choices=["madgwick", "ekf"], default="madgwick")
+    parser.add_argument("--out", help="write time, stationary, position, rod tip and orientation per sample")
+    args = parser.parse_args()
+
+    result = smooth_trajectory(load_imu_array(args.csv_path), args.beta, args.L, args.method)
+    print(f"samples: {len(result['time'])}, stationary: {result['stationary'].mean():.0%}")
+    print("Final raw position:     ", result["position_raw"][-1].round(4))
+    print("Final smoothed position:", result["position"][-1].round(4))
+    if args.out:
+        with open(args.out, "w", newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["time", "stationary", "pos_x", "pos_y", "pos_z", "tip_x", "tip_y", "tip_z",
+                             "qw", "qx", "qy", "qz", "roll_deg", "pitch_deg", "yaw_deg"])
+            euler = quaternion_ops.to_euler(result["quaternions"])
+            for row in zip(result["time"], result["stationary"].astype(int), *result["position"].T,
+                           *result["rod_tip_position"].T, *result["quaternions"].T, *euler.T):
+                writer.writerow(row)
@@ -1,16 +1,27 @@
 # main.py - this file reads both imu and force simultaneously
-#imports are outdated - need to update from new force sensing data
+# pyvista is imported inside main() so importing this file (or running aeep.py headless) stays fast
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "force_sensing"))
+sys.path.append(os.path.join(HERE, "imu"))
+
 from force_analysis import update_mesh_color
 from force_analysis import force_analysis
-from force_reader_ import read_flex_data
-from master.imu.imu_reader import read_imu_data
-from dof9_filter import MadgwickFilter
-import pyvista as pv
+from force_reader_threading import get_latest_angles as read_flex_data
+from imu_reader import read_imu_data
+from occupancy import OccupancyGrid, OccupancyOverlay, TipFeed
+from metrics import registry
 import numpy as np
 import random
 import time
 
+ROD_LENGTH = 0.1  # m
+MM_PER_M = 1000.0  # filter positions are in m, the mesh in mm
+
 def main():
+    import pyvista as pv
     
     stl_file = r"C:\Users\kayla\.spyder-py3\DT3_Local\bph_mold_combined.stl"
     mesh = pv.read(stl_file)
@@ -43,6 +54,12 @@ def main():
     marker_position = mesh.center
     marker = pv.PolyData(np.array([marker_position]))
     plotter.add_mesh(marker, color="cyan", render_points_as_spheres=True, point_size=20)
+
+    # where the rod tip has been: dwell per voxel, drawn under the marker
+    occupancy = OccupancyGrid(mesh.bounds)
+    occupancy_overlay = OccupancyOverlay(plotter, occupancy, mode="points")
+    # one filter and one integrated position for the whole run, positions in mesh units (mm)
+    tip_feed = TipFeed(occupancy, beta=0.1, L=ROD_LENGTH, scale=MM_PER_M)
     
     # Set window size
     plotter.window_size = [1200, 900]
@@ -62,9 +79,11 @@ def main():
     # force_threshold2 = 10.0
     
     def update_position(current_position):
-        marker.points = np.array([current_position])        
-        mesh_actor.Modified()
-        plotter.update()
+        with registry.timer("render"):
+            marker.points = np.array([current_position])        
+            occupancy_overlay.update()
+            mesh_actor.Modified()
+            plotter.update()
 
     df = []
     time_above_pressure_thresh = 0
@@ -87,46 +106,51 @@ def main():
     plotter.iren.create_timer(300)
     plotter.show(auto_close=False, interactive_update=True)
 
-    while (
-      x_min <= x <= x_max and
-      y_min <= y <= y_max and
-      z_min <= z <= z_max
-    ):
-        print("meowmeowmeowmeow")
-        current_time = time.time()
-        dt = current_time - start_time
-        start_time = current_time
-
-        ax, ay, az, gx, gy, gz, mx, my, mz = read_imu_data()
-        #N, S, E, W = read_flex_data()
-
-        madgwick = MadgwickFilter(sample_period=dt, beta=0.1)
-        position = madgwick.compute_position([dt, ax, ay, az, gx, gy, gz, mx, my, mz], beta=0.1, L=0.1)
+    try:
+        while (
+          x_min <= x <= x_max and
+          y_min <= y <= y_max and
+          z_min <= z <= z_max
+        ):
+            print("meowmeowmeowmeow")
+            current_time = time.time()
+            dt = current_time - start_time
+            start_time = current_time
+
+            with registry.timer("imu.serial_read"):
+                ax, ay, az, gx, gy, gz, mx, my, mz = read_imu_data()
+            registry.incr("imu.samples")
+            #N, S, E, W = read_flex_data()
+
+            with registry.timer("filter"):
+                position, _ = tip_feed.add(dt, (ax, ay, az), (gx, gy, gz), (mx, my, mz))
         
-        # pressure = force_analysis(bend_values)
+            # pressure = force_analysis(bend_values)
 
         
       
-        update_position(position) # update point on minimap
+            update_position(position) # update point on minimap
         
         
-        # 300 milliseconds for better visualization
-        # Show the plotter window
+            # 300 milliseconds for better visualization
+            # Show the plotter window
         
 
-        # force thresholding
+            # force thresholding
 
-        # if pressure > force_threshold:
-        #     time_above_pressure_thresh += dt
-        # else:
-        #     time_above_pressure_thresh = 0
+            # if pressure > force_threshold:
+            #     time_above_pressure_thresh += dt
+            # else:
+            #     time_above_pressure_thresh = 0
 
-        # if time_above_pressure_thresh > time_threshold:
-        #     update_mesh_color(pressure, mesh_actor, plotter, force_threshold1, force_threshold2)
+            # if time_above_pressure_thresh > time_threshold:
+            #     update_mesh_color(pressure, mesh_actor, plotter, force_threshold1, force_threshold2)
 
-        # Set up the timer
+            # Set up the timer
     
-
+    finally:
+        # the loop only ends on Ctrl-C or an error, save the dwell map either way
+        occupancy.save("occupancy.npz")  # OccupancyGrid.load / occupancy.py for the session's dwell map
     N, S, E, W = read_flex_data()
     data = {dt, position, N, S, E, W}
     df.append(data)
@@ -0,0 +1,334 @@
+# multiprocess_pipeline.py - optional multiprocess mode for acquisition
+#
+# Each device reader (flex, conductive sheet, IMU) runs in its own process and pushes rows
+# into a shared-memory ring buffer. A fusion process reads those rings, runs quadrant
+# detection + the Madgwick filter and writes fused rows into another ring, which the main
+# process logs (same csv layout as force_main). Nothing goes through pickling/queues - every
+# process maps the same buffers as NumPy arrays, so the readers don't fight over one GIL.
+#
+# A supervisor restarts any reader/fusion process that dies.
+#
+# run from the repo root:
+#   python master/multiprocess_pipeline.py --flex-port /dev/arduino_flex --sheet-port /dev/arduino_conductive
+#   python master/multiprocess_pipeline.py --imu-port /dev/ttyACM0 ...   (add the IMU stream)
+import argparse
+import csv
+import logging
+import multiprocessing as mp
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "force_sensing"))
+sys.path.append(os.path.join(HERE, "imu"))
+
+from metrics import get_logger, log_event
+
+logger = get_logger("aeep.pipeline")
+
+QUADRANTS = ["Center", "North", "South", "East", "West",
+             "Quadrant 1", "Quadrant 2", "Quadrant 3", "Quadrant 4"]
+
+# row layouts (column 0 is always time.time() when the row was produced)
+FLEX_WIDTH = 1 + 4            # timestamp, N, S, E, W
+SHEET_WIDTH = 1 + 15          # timestamp, Rel0..Rel14
+IMU_WIDTH = 1 + 9             # timestamp, ax, ay, az, gx, gy, gz, mx, my, mz
+FUSED_WIDTH = 1 + 1 + 4 + 4 + 15  # timestamp, quadrant index, N, S, E, W, q0..q3, Rel0..Rel14
+
+
+class SharedRing:
+    """
+    Single-producer ring buffer of float64 rows living in shared memory.
+
+    The block holds a small int64 header (total rows ever written) followed by a
+    (capacity, width) float64 array. The producer writes the row first and bumps the
+    counter after, so a consumer never sees a half written row unless it falls more than
+    `capacity` rows behind (reported as overrun by read_since).
+    """
+    HEADER = 8  # bytes
+
+    def __init__(self, capacity, width, name=None, create=True):
+        self.capacity = capacity
+        self.width = width
+        size = self.HEADER + capacity * width * 8
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, size=size, name=name)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._count = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf, offset=0)
+        self.rows = np.ndarray((capacity, width), dtype=np.float64, buffer=self.shm.buf, offset=self.HEADER)
+        if create:
+            self._count[0] = 0
+
+    @property
+    def spec(self):
+        """ What a child process needs to attach: (name, capacity, width) """
+        return self.shm.name, self.capacity, self.width
+
+    @classmethod
+    def attach(cls, spec):
+        name, capacity, width = spec
+        return cls(capacity, width, name=name, create=False)
+
+    @property
+    def count(self):
+        return int(self._count[0])
+
+    def push(self, row):
+        i = self.count
+        self.rows[i % self.capacity] = row
+        self._count[0] = i + 1
+
+    def latest(self):
+        """ View of the newest row, or None if nothing was written yet """
+        i = self.count
+        if i == 0:
+            return None
+        return self.rows[(i - 1) % self.capacity]
+
+    def read_since(self, start):
+        """
+        Rows written since absolute index `start`.
+        Returns (rows, next_start, overrun) - rows is a zero-copy view unless the range wraps
+        around the end of the buffer; overrun is how many rows were lost by lagging behind.
+        """
+        end = self.count
+        overrun = 0
+        if end - start > self.capacity:
+            overrun = end - start - self.capacity
+            start = end - self.capacity
+        if end == start:
+            return self.rows[:0], end, overrun
+        a, b = start % self.capacity, end % self.capacity
+        if a < b or b == 0:
+            rows = self.rows[a:b if b else self.capacity]
+        else:
+            rows = np.concatenate((self.rows[a:], self.rows[:b]))
+        return rows, end, overrun
+
+    def close(self):
+        # drop our numpy views before closing the mapping
+        del self._count, self.rows
+        try:
+            self.shm.close()
+        except BufferError:
+            # a caller still holds a view from read_since/latest; the mapping goes away with the process
+            pass
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+# ——— reader processes ———
+def _serial_lines(port, baud_rate, timeout, stop, settle=0.0):
+    """ Non empty lines from the port until stop is set, checked after every read / timeout """
+    import serial
+    with serial.Serial(port, baud_rate, timeout=timeout) as arduino:
+        if settle:
+            # opening the port resets the board, drop what it printed while starting up
+            stop.wait(settle)
+            arduino.reset_input_buffer()
+        while not stop.is_set():
+            inline = arduino.readline().decode('utf-8', errors="ignore").strip()
+            if inline:
+                yield inline
+
+
+def flex_reader_process(spec, port, baud_rate, stop):
+    from force_reader_threading import parse
+    ring = SharedRing.attach(spec)
+    row = np.zeros(FLEX_WIDTH)
+    for inline in _serial_lines(port, baud_rate, 0.5, stop):
+        dire = parse(inline)
+        if dire:
+            row[0] = time.time()
+            row[1:] = (dire.get("North", 0.0), dire.get("South", 0.0), dire.get("East", 0.0), dire.get("West", 0.0))
+            ring.push(row)
+
+
+def sheet_reader_process(spec, port, baud_rate, stop):
+    from conductive_reader_threading import parse
+    ring = SharedRing.attach(spec)
+    row = np.zeros(SHEET_WIDTH)
+    for inline in _serial_lines(port, baud_rate, 0.01, stop, settle=2.0):
+        parsed = parse(inline)
+        if parsed:
+            row[0] = time.time()
+            row[1:] = [parsed.get(i, 0.0) for i in range(15)]
+            ring.push(row)
+
+
+def imu_reader_process(spec, port, baud_rate, stop):
+    from imu_reader import parse
+    ring = SharedRing.attach(spec)
+    row = np.zeros(IMU_WIDTH)
+    for inline in _serial_lines(port, baud_rate, 0.1, stop):
+        values = parse(inline)
+        # parse() answers all zeros when a line is incomplete, like ImuReader skip those
+        if not any(values):
+            continue
+        row[0] = time.time()
+        row[1:] = values
+        ring.push(row)
+
+
+# ——— fusion / filter process ———
+def fusion_process(specs, fused_spec, stop, beta=0.1, poll=0.005):
+    """ Combines the newest flex + sheet rows, filters every new IMU row, pushes fused rows """
+    from quadrant_detection import determine_quadrant
+    from dof9_filter import MadgwickFilter
+    rings = {name: SharedRing.attach(spec) for name, spec in specs.items()}
+    fused = SharedRing.attach(fused_spec)
+    madgwick = MadgwickFilter(sample_period=0.01, beta=beta)
+    imu_next = rings["imu"].count if "imu" in rings else 0
+    last_imu_t = None
+    flex_seen = 0
+    row = np.zeros(FUSED_WIDTH)
+    row[6] = 1.0  # identity quaternion until IMU data arrives
+
+    while not stop.is_set():
+        if "imu" in rings:
+            imu_rows, imu_next, _ = rings["imu"].read_since(imu_next)
+            for r in imu_rows:
+                if last_imu_t is not None and r[0] > last_imu_t:
+                    madgwick.sample_period = r[0] - last_imu_t
+                last_imu_t = r[0]
+                # rows are ax, ay, az, gx, gy, gz, mx, my, mz
+                madgwick.update(gyro=r[4:7], accel=r[1:4], mag=r[7:10])
+            row[6:10] = madgwick.q
+
+        flex = rings["flex"]
+        if flex.count == flex_seen:
+            time.sleep(poll)
+            continue
+        flex_seen = flex.count
+        n, s, e, w = flex.latest()[1:5]
+        row[0] = time.time()
+        row[1] = QUADRANTS.index(determine_quadrant(n, s, e, w))
+        row[2:6] = (n, s, e, w)
+        if "sheet" in rings:
+            sheet = rings["sheet"].latest()
+            if sheet is not None:
+                row[10:25] = sheet[1:]
+        fused.push(row)
+
+
+# ——— supervisor ———
+class Supervisor:
+    """ Starts worker processes and restarts any that exit, with a capped backoff """
+
+    def __init__(self, ctx, stop, max_backoff=10.0):
+        self.ctx = ctx
+        self.stop = stop
+        self.max_backoff = max_backoff
+        self.workers = {}  # name -> [target, args, process, restarts, next_start]
+
+    def add(self, name, target, *args):
+        self.workers[name] = [target, args, None, 0, 0.0]
+        self._start(name)
+
+    def _start(self, name):
+        worker = self.workers[name]
+        target, args = worker[0], worker[1]
+        proc = self.ctx.Process(target=target, args=(*args, self.stop), name=name, daemon=True)
+        proc.start()
+        worker[2] = proc
+
+    def check(self):
+        """ Call periodically; restarts dead workers. Returns names restarted this call """
+        restarted = []
+        now = time.monotonic()
+        for name, worker in self.workers.items():
+            proc = worker[2]
+            if proc is not None and proc.is_alive():
+                continue
+            if proc is not None:
+                # just died - schedule a restart with exponential backoff
+                log_event(logger, "worker_restart", logging.WARNING, worker=name, exitcode=proc.exitcode,
+                          restart=worker[3] + 1)
+                worker[4] = now + min(self.max_backoff, 0.5 * 2 ** worker[3])
+                worker[3] += 1
+                worker[2] = None
+            if now >= worker[4]:
+                self._start(name)
+                restarted.append(name)
+        return restarted
+
+    def shutdown(self, timeout=2.0):
+        self.stop.set()
+        for worker in self.workers.values():
+            proc = worker[2]
+            if proc is not None:
+                proc.join(timeout)
+                if proc.is_alive():
+                    proc.terminate()
+
+
+def run(flex_port, sheet_port=None, imu_port=None, capacity=4096, log_dir=".", log_period=0.5):
+    ctx = mp.get_context("spawn")
+    stop = ctx.Event()
+    rings = {"flex": SharedRing(capacity, FLEX_WIDTH)}
+    if sheet_port:
+        rings["sheet"] = SharedRing(capacity, SHEET_WIDTH)
+    if imu_port:
+        rings["imu"] = SharedRing(capacity, IMU_WIDTH)
+    fused = SharedRing(capacity, FUSED_WIDTH)
+    specs = {name: ring.spec for name, ring in rings.items()}
+
+    supervisor = Supervisor(ctx, stop)
+    supervisor.add("flex", flex_reader_process, specs["flex"], flex_port, 9600)
+    if sheet_port:
+        supervisor.add("sheet", sheet_reader_process, specs["sheet"], sheet_port, 115200)
+    if imu_port:
+        supervisor.add("imu", imu_reader_process, specs["imu"], imu_port, 115200)
+    supervisor.add("fusion", fusion_process, specs, fused.spec)
+
+    quadrant_path = os.path.join(log_dir, "quadrant_log.csv")
+    force_path = os.path.join(log_dir, "force_log.csv")
+    new_file_1 = not os.path.exists(quadrant_path)
+    new_file_2 = not os.path.exists(force_path)
+    try:
+        with open(quadrant_path, "a", newline='') as f1, open(force_path, "a", newline='') as f2:
+            quadrant_writer = csv.writer(f1)
+            force_writer = csv.writer(f2)
+            if new_file_1:
+                quadrant_writer.writerow(["timestamp", "quadrant", "bend_angle", "N", "S", "E", "W"])
+            if new_file_2:
+                force_writer.writerow(["timestamp", "force_Array"])
+            next_row = fused.count
+            while True:
+                time.sleep(log_period)
+                supervisor.check()
+                rows, next_row, overrun = fused.read_since(next_row)
+                if overrun:
+                    log_event(logger, "ring_overrun", logging.WARNING, ring="fused", lost=overrun)
+                if len(rows) == 0:
+                    continue
+                # log the newest fused row each period, same cadence as force_main
+                r = rows[-1]
+                quadrant_writer.writerow([r[0], QUADRANTS[int(r[1])], *r[2:6]])
+                force_writer.writerow([r[0], *r[10:25]])
+                f1.flush()
+                f2.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.shutdown()
+        for ring in [*rings.values(), fused]:
+            ring.close()
+            ring.unlink()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run flex/sheet/IMU readers and fusion in separate processes")
+    parser.add_argument("--flex-port", default="/dev/arduino_flex")
+    parser.add_argument("--sheet-port", default="/dev/arduino_conductive", help="empty string to disable")
+    parser.add_argument("--imu-port", default=None)
+    parser.add_argument("--capacity", type=int, default=4096, help="rows per ring buffer")
+    parser.add_argument("--log-dir", default=".")
+    args = parser.parse_args()
+    run(args.flex_port, args.sheet_port or None, args.imu_port, capacity=args.capacity, log_dir=args.log_dir)
@@ -0,0 +1,24 @@
+import gc
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "force_sensing"))
+
+from lod_plot import plot_lod, use_backend
+
+
+def test_zoom_redownsamples_after_gc():
+    plt = use_backend(True)
+    fig, ax = plt.subplots()
+    t = np.linspace(0, 100, 100_000)
+    plot_lod(ax, t, np.sin(t), max_points=200)  # return value dropped, like force_process does
+    gc.collect()
+    line = ax.get_lines()[0]
+    assert line.get_xdata().max() > 99
+    ax.set_xlim(10, 12)
+    x = line.get_xdata()
+    assert x.min() >= 9.99 and x.max() <= 12.01
+    assert len(x) > 100
+    plt.close(fig)
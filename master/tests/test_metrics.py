@@ -0,0 +1,29 @@
+import logging
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "force_sensing"))
+
+from metrics import RateLimitFilter, log_event
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record.getMessage())
+
+
+def test_rate_limit_is_per_worker():
+    logger = logging.getLogger("aeep.test_rate_limit")
+    logger.propagate = False
+    handler = ListHandler()
+    handler.addFilter(RateLimitFilter(interval=60.0))
+    logger.addHandler(handler)
+    log_event(logger, "worker_restart", logging.WARNING, worker="flex", exitcode=1, restart=1)
+    log_event(logger, "worker_restart", logging.WARNING, worker="flex", exitcode=1, restart=2)
+    log_event(logger, "worker_restart", logging.WARNING, worker="sheet", exitcode=1, restart=1)
+    assert handler.records == ["worker_restart worker=flex exitcode=1 restart=1",
+                               "worker_restart worker=sheet exitcode=1 restart=1"]
@@ -0,0 +1,69 @@
+import os
+import sys
+import types
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "imu"))
+
+from dof9_filter import MadgwickFilter
+from occupancy import OccupancyGrid, OccupancyOverlay, TipFeed
+
+
+class StubPlotter:
+    """ Records what OccupancyOverlay asks a PyVista plotter to draw """
+
+    def __init__(self):
+        self.meshes = []
+        self.removed = 0
+
+    def add_mesh(self, mesh, **kwargs):
+        self.meshes.append(mesh)
+        return types.SimpleNamespace(mapper=types.SimpleNamespace(scalar_range=None))
+
+    def remove_actor(self, actor, render=True):
+        self.removed += 1
+
+
+class StubPolyData:
+    def __init__(self, points):
+        self.points = np.asarray(points)
+        self.point_data = {}
+
+    def Modified(self):
+        pass
+
+
+def samples(n=400, dt=0.01):
+    """ Sensor at rest, then pushed along x and braked: [dt, accel, gyro, mag] rows """
+    rows = np.zeros((n, 10))
+    rows[:, 0] = dt
+    rows[:, 3] = 9.81
+    rows[1:n // 2, 1] = 0.01
+    rows[n // 2:, 1] = -0.01
+    rows[:, 7:10] = (120.0, 40.0, 130.0)
+    return rows
+
+
+def test_feed_moves_across_voxels(monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyvista", types.SimpleNamespace(PolyData=StubPolyData))
+    grid = OccupancyGrid()
+    plotter = StubPlotter()
+    overlay = OccupancyOverlay(plotter, grid, mode="points")
+    feed = TipFeed(grid, L=0.03, scale=1000.0)
+    rows = samples()
+    tips = []
+    for row in rows:
+        _, tip = feed.add(row[0], row[1:4], row[4:7], row[7:10])
+        tips.append(tip)
+        overlay.update()
+
+    # one filter across samples: the same path as compute_trajectory over the whole run, in mm
+    reference = MadgwickFilter(sample_period=0.01).compute_trajectory(rows, 0.1, 0.03)["rod_tip_position"] * 1000.0
+    np.testing.assert_allclose(tips, reference, atol=1e-9)
+
+    assert grid.samples == len(rows) and grid.outside == 0
+    assert np.count_nonzero(grid.counts) > 3
+    assert grid.counts.max() < len(rows)  # not every sample in one voxel
+    drawn = plotter.meshes[-1].points
+    assert len(drawn) == np.count_nonzero(grid.counts)
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analysis"))
+
+from phase_segment import FORCE_CHANNELS, OnlineSegmenter
+
+
+def test_min_phase_length_holds_across_rate_change():
+    # 2 Hz for the first minute, then 10 Hz (a /control switch), level changes every 30 s
+    rng = np.random.default_rng(0)
+    ts = np.concatenate([np.arange(0, 60, 0.5), np.arange(60, 180, 0.1)])
+    segmenter = OnlineSegmenter(channels=FORCE_CHANNELS + 4, min_seconds=20.0, scale=np.ones(FORCE_CHANNELS + 4))
+    phases = []
+    for ts_i in ts:
+        values = np.full(FORCE_CHANNELS + 4, 5.0 + 10.0 * (int(ts_i // 30) % 2)) + rng.normal(0, 0.1, FORCE_CHANNELS + 4)
+        phases += segmenter.update(values, ts_i)
+    phases += segmenter.finish()
+    assert len(phases) > 1
+    for start, end in phases:
+        assert end - start >= 19.0
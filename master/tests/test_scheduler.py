@@ -0,0 +1,57 @@
+import json
+import math
+import os
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "force_sensing"))
+
+from metrics import Metrics, start_http_server
+from scheduler import LoopScheduler
+
+
+def test_event_timeout_is_not_an_overrun():
+    scheduler = LoopScheduler(rate_hz=10.0, mode="event", min_rate_hz=10.0)
+    tick = scheduler.wait()
+    assert tick.timeout and not tick.overrun
+    assert scheduler.timeouts == 1 and scheduler.overruns == 0
+
+
+def test_control_switches_running_scheduler():
+    scheduler = LoopScheduler(rate_hz=5.0, mode="fixed")
+    scheduler.wait()
+
+    def control(rate=None, mode=None):
+        scheduler.request(rate_hz=float(rate) if rate else None, mode=mode)
+        return {"ok": True}
+
+    server = start_http_server(port=0, metrics=Metrics(), control=control)
+    try:
+        for rate in ("inf", "nan", "0.5", "1000"):
+            url = f"http://127.0.0.1:{server.server_port}/control?rate={rate}"
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(urllib.request.Request(url, method="POST"))
+            assert error.value.code == 400
+        url = f"http://127.0.0.1:{server.server_port}/control?rate=10&mode=event"
+        with urllib.request.urlopen(urllib.request.Request(url, method="POST")) as r:
+            assert json.load(r) == {"ok": True}
+    finally:
+        server.shutdown()
+    assert scheduler.mode == "fixed"  # applied by the loop, not by the http thread
+    scheduler.min_rate_hz = 10.0
+    scheduler.wait()
+    assert (scheduler.mode, scheduler.rate_hz) == ("event", 10.0)
+
+
+@pytest.mark.parametrize("rate_hz", [math.inf, math.nan, 0.5, 1000.0])
+def test_rate_outside_range_is_rejected(rate_hz):
+    scheduler = LoopScheduler(rate_hz=5.0)
+    with pytest.raises(ValueError):
+        scheduler.request(rate_hz=rate_hz)
+    with pytest.raises(ValueError):
+        scheduler.set_rate(rate_hz)
+    scheduler.wait()
+    assert scheduler.rate_hz == 5.0